@@ -0,0 +1,87 @@
+# benchmarks/fake_gguf.py
+"""
+Writes synthetic GGUF files with a realistic header (metadata, tokenizer
+vocabulary, full tensor table for a llama-style model) and sparse weight
+data, so the header parser and VRAM estimator can be exercised without
+downloading a model.
+"""
+import struct
+
+from core.gguf import GGUF_MAGIC, GGML_TYPES, UINT32, FLOAT32, STRING, ARRAY
+
+ALIGNMENT = 32
+
+def _string(s: str) -> bytes:
+    data = s.encode('utf-8')
+    return struct.pack('<Q', len(data)) + data
+
+def _kv(key: str, value) -> bytes:
+    out = _string(key)
+    if isinstance(value, str):
+        return out + struct.pack('<I', STRING) + _string(value)
+    if isinstance(value, float):
+        return out + struct.pack('<If', FLOAT32, value)
+    if isinstance(value, list):
+        out += struct.pack('<IIQ', ARRAY, STRING, len(value))
+        return out + b"".join(_string(v) for v in value)
+    return out + struct.pack('<II', UINT32, value)
+
+def llama_tensors(blocks: int, n_embd: int, n_ff: int, heads: int, heads_kv: int, vocab: int,
+                  weight_type: int = 12, tied_embeddings: bool = False) -> list[tuple[str, tuple, int]]:
+    """(name, shape, ggml type) for a llama-architecture model; weight_type 12 is Q4_K."""
+    head_dim = n_embd // heads
+    tensors = [('token_embd.weight', (n_embd, vocab), weight_type)]
+    for i in range(blocks):
+        tensors += [
+            (f'blk.{i}.attn_norm.weight', (n_embd,), 0),
+            (f'blk.{i}.attn_q.weight', (n_embd, n_embd), weight_type),
+            (f'blk.{i}.attn_k.weight', (n_embd, head_dim * heads_kv), weight_type),
+            (f'blk.{i}.attn_v.weight', (n_embd, head_dim * heads_kv), 14), # Q6_K, as llama.cpp's Q4_K_M mix does
+            (f'blk.{i}.attn_output.weight', (n_embd, n_embd), weight_type),
+            (f'blk.{i}.ffn_norm.weight', (n_embd,), 0),
+            (f'blk.{i}.ffn_gate.weight', (n_embd, n_ff), weight_type),
+            (f'blk.{i}.ffn_up.weight', (n_embd, n_ff), weight_type),
+            (f'blk.{i}.ffn_down.weight', (n_ff, n_embd), 14),
+        ]
+    tensors.append(('output_norm.weight', (n_embd,), 0))
+    if not tied_embeddings:
+        tensors.append(('output.weight', (n_embd, vocab), 14))
+    return tensors
+
+def write_gguf(path: str, blocks: int = 32, n_embd: int = 4096, n_ff: int = 14336, heads: int = 32,
+               heads_kv: int = 8, vocab: int = 128256, context_length: int = 131072,
+               weight_type: int = 12, tied_embeddings: bool = False) -> int:
+    """Writes a llama-style GGUF (defaults: Llama 3 8B at Q4_K_M) and returns its size in bytes."""
+    metadata = [
+        ('general.architecture', 'llama'),
+        ('general.name', 'synthetic'),
+        ('general.file_type', 15),
+        ('llama.block_count', blocks),
+        ('llama.context_length', context_length),
+        ('llama.embedding_length', n_embd),
+        ('llama.feed_forward_length', n_ff),
+        ('llama.attention.head_count', heads),
+        ('llama.attention.head_count_kv', heads_kv),
+        ('llama.rope.freq_base', 500000.0),
+        ('tokenizer.ggml.model', 'gpt2'),
+        ('tokenizer.ggml.tokens', [f"tok{i}" for i in range(vocab)]),
+    ]
+    tensors = llama_tensors(blocks, n_embd, n_ff, heads, heads_kv, vocab, weight_type, tied_embeddings)
+
+    header = GGUF_MAGIC + struct.pack('<IQQ', 3, len(tensors), len(metadata))
+    header += b"".join(_kv(k, v) for k, v in metadata)
+    offset = 0
+    for name, shape, type_id in tensors:
+        header += _string(name) + struct.pack('<I', len(shape)) + struct.pack(f'<{len(shape)}Q', *shape)
+        header += struct.pack('<IQ', type_id, offset)
+        _, block, size = GGML_TYPES[type_id]
+        elements = 1
+        for d in shape:
+            elements *= d
+        offset += (elements // block * size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+    data_start = (len(header) + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+    with open(path, 'wb') as f:
+        f.write(header)
+        f.truncate(data_start + offset) # Sparse: weights read back as zeros
+    return data_start + offset
@@ -0,0 +1,115 @@
+# benchmarks/fake_pynvml.py
+"""
+Drop-in stand-in for the subset of `pynvml` used by LMM.
+
+Call `install()` before importing `core.hardware` so the module is picked up
+as `pynvml`, then `configure()` to describe the devices and their processes.
+"""
+import sys
+from collections import namedtuple
+
+NVML_TEMP_GPU = 0
+NVML_ERROR_NOT_SUPPORTED = 3
+NVML_ERROR_NOT_FOUND = 6
+
+MemoryInfo = namedtuple('MemoryInfo', ['total', 'free', 'used'])
+Utilization = namedtuple('Utilization', ['gpu', 'memory'])
+ProcessInfo = namedtuple('ProcessInfo', ['pid', 'usedGpuMemory'])
+ProcessUtilizationSample = namedtuple('ProcessUtilizationSample',
+                                      ['pid', 'timeStamp', 'smUtil', 'memUtil', 'encUtil', 'decUtil'])
+
+class NVMLError(Exception):
+    def __init__(self, value=None):
+        super().__init__(value)
+        self.value = value
+
+class FakeDevice:
+    """
+    One emulated GPU. `processes` are (pid, used_bytes) pairs;
+    `process_utilization` maps pid -> (sm, mem, enc, dec) percent for busy
+    processes; `process_sampling=False` emulates a GPU without per-process
+    utilization.
+    """
+    def __init__(self, name="Fake RTX 4090", total_bytes=24 * 1024**3, used_bytes=6 * 1024**3,
+                 utilization=35, temperature=55, compute_processes=None, graphics_processes=None,
+                 process_utilization=None, process_sampling=True):
+        self.name = name
+        self.total_bytes = total_bytes
+        self.used_bytes = used_bytes
+        self.utilization = utilization
+        self.temperature = temperature
+        self.compute_processes = compute_processes or []
+        self.graphics_processes = graphics_processes or []
+        self.process_utilization = process_utilization or {}
+        self.process_sampling = process_sampling
+        self.sample_clock = 0 # Microsecond timestamps of emulated samples
+
+_state = {
+    'initialized': False,
+    'devices': [FakeDevice()],
+    'fail_init': False,
+}
+
+def configure(devices=None, fail_init=False):
+    """Replaces the emulated device list."""
+    _state['devices'] = list(devices) if devices is not None else [FakeDevice()]
+    _state['fail_init'] = fail_init
+
+def install():
+    """Registers this module as `pynvml` in sys.modules."""
+    sys.modules['pynvml'] = sys.modules[__name__]
+
+def _device(handle):
+    if not _state['initialized']:
+        raise NVMLError("Uninitialized")
+    return handle
+
+def nvmlInit():
+    if _state['fail_init']:
+        raise NVMLError("Driver Not Loaded")
+    _state['initialized'] = True
+
+def nvmlShutdown():
+    _state['initialized'] = False
+
+def nvmlDeviceGetCount():
+    return len(_state['devices'])
+
+def nvmlDeviceGetHandleByIndex(index):
+    if not _state['initialized']:
+        raise NVMLError("Uninitialized")
+    try:
+        return _state['devices'][index]
+    except IndexError:
+        raise NVMLError("Invalid Argument")
+
+def nvmlDeviceGetName(handle):
+    return _device(handle).name.encode('utf-8')
+
+def nvmlDeviceGetMemoryInfo(handle):
+    dev = _device(handle)
+    return MemoryInfo(dev.total_bytes, dev.total_bytes - dev.used_bytes, dev.used_bytes)
+
+def nvmlDeviceGetUtilizationRates(handle):
+    return Utilization(_device(handle).utilization, 0)
+
+def nvmlDeviceGetTemperature(handle, sensor):
+    return _device(handle).temperature
+
+def nvmlDeviceGetComputeRunningProcesses(handle):
+    return [ProcessInfo(pid, used) for pid, used in _device(handle).compute_processes]
+
+def nvmlDeviceGetGraphicsRunningProcesses(handle):
+    return [ProcessInfo(pid, used) for pid, used in _device(handle).graphics_processes]
+
+def nvmlDeviceGetProcessUtilization(handle, timeStamp):
+    """Emits one new sample per busy process on each call; only samples newer than `timeStamp` are returned."""
+    dev = _device(handle)
+    if not dev.process_sampling:
+        raise NVMLError(NVML_ERROR_NOT_SUPPORTED)
+    dev.sample_clock += 166_666 # NVML samples about six times a second
+    samples = [ProcessUtilizationSample(pid, dev.sample_clock, *util)
+               for pid, util in dev.process_utilization.items() if dev.sample_clock > timeStamp]
+    if not samples:
+        raise NVMLError(NVML_ERROR_NOT_FOUND)
+    return samples
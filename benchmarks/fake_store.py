@@ -0,0 +1,92 @@
+# benchmarks/fake_store.py
+"""
+Synthetic Ollama model store (manifests/ + blobs/) under a temporary root.
+
+Weight blobs are sparse files, so a store that reports hundreds of GB takes
+almost no real disk. Each family shares one weights blob across its tags, the
+way `ollama cp` or re-tagging shares base weights; every tag also has its own
+small template / params / config blobs.
+
+Sparse blobs have random digests. `add_content_blob()` creates blobs whose
+names match their content, for the integrity verifier.
+"""
+import os
+import json
+import hashlib
+import random
+import shutil
+import tempfile
+
+GB = 1024**3
+
+WEIGHTS_TYPE = "application/vnd.ollama.image.model"
+TEMPLATE_TYPE = "application/vnd.ollama.image.template"
+PARAMS_TYPE = "application/vnd.ollama.image.params"
+CONFIG_TYPE = "application/vnd.docker.container.image.v1+json"
+
+class FakeModelStore:
+    def __init__(self, families: int = 50, tags_per_family: int = 4, weights_gb: float = 4.0, seed: int = 0):
+        self.root = tempfile.mkdtemp(prefix="lmm-store-")
+        self.manifests_dir = os.path.join(self.root, 'manifests', 'registry.ollama.ai', 'library')
+        self.blobs_dir = os.path.join(self.root, 'blobs')
+        os.makedirs(self.manifests_dir)
+        os.makedirs(self.blobs_dir)
+        self._rng = random.Random(seed)
+        self.models = {} # name -> [digests]
+
+        for f in range(families):
+            weights = self.add_blob(int(weights_gb * GB))
+            for t in range(tags_per_family):
+                self.add_model(f"family{f}", f"tag{t}", [
+                    (WEIGHTS_TYPE, weights),
+                    (TEMPLATE_TYPE, self.add_blob(256)),
+                    (PARAMS_TYPE, self.add_blob(64)),
+                ], config=self.add_blob(512))
+
+    def _digest(self) -> str:
+        return "sha256:" + "".join(self._rng.choice("0123456789abcdef") for _ in range(64))
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.blobs_dir, digest.replace(':', '-'))
+
+    def add_blob(self, size: int, digest: str = None, suffix: str = "") -> tuple[str, int]:
+        """Creates a sparse blob file; returns (digest, size)."""
+        digest = digest or self._digest()
+        with open(self.blob_path(digest) + suffix, 'wb') as f:
+            f.truncate(size)
+        return digest, size
+
+    def add_content_blob(self, data: bytes) -> tuple[str, int]:
+        """Creates a blob whose filename matches the SHA-256 of `data` (for integrity checks)."""
+        digest = "sha256:" + hashlib.sha256(data).hexdigest()
+        with open(self.blob_path(digest), 'wb') as f:
+            f.write(data)
+        return digest, len(data)
+
+    def add_model(self, model: str, tag: str, layers: list, config: tuple):
+        manifest = {
+            'schemaVersion': 2,
+            'mediaType': "application/vnd.docker.distribution.manifest.v2+json",
+            'config': {'mediaType': CONFIG_TYPE, 'digest': config[0], 'size': config[1]},
+            'layers': [{'mediaType': t, 'digest': d, 'size': s} for t, (d, s) in layers],
+        }
+        path = os.path.join(self.manifests_dir, model, tag)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(manifest, f)
+        self.models[f"{model}:{tag}"] = [d for _, (d, _) in layers] + [config[0]]
+
+    def remove_model(self, name: str):
+        model, tag = name.split(':')
+        os.remove(os.path.join(self.manifests_dir, model, tag))
+        del self.models[name]
+
+    def cleanup(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cleanup()
+        return False
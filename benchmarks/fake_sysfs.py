@@ -0,0 +1,87 @@
+# benchmarks/fake_sysfs.py
+"""
+Synthetic /sys/class/drm tree for exercising SysfsBackend without an AMD or
+Intel GPU. Values are plain files, so updates made with `FakeSysfsTree.set()`
+are visible to the backend's already-open descriptors on the next pread.
+"""
+import os
+import shutil
+import tempfile
+
+from core.gpu_backends import SysfsBackend
+
+GB = 1024**3
+
+class FakeCard:
+    def __init__(self, driver="amdgpu", product_name="AMD Radeon RX 7900 XTX", pci_id="1002:744C",
+                 vram_total=24 * GB, vram_used=4 * GB, busy_percent=20, temp_c=50):
+        self.driver = driver
+        self.product_name = product_name
+        self.pci_id = pci_id
+        self.vram_total = vram_total
+        self.vram_used = vram_used
+        self.busy_percent = busy_percent
+        self.temp_c = temp_c
+
+class FakeSysfsTree:
+    """
+    Builds cardN/device/... under a temporary root. Attributes set to None are
+    left out, e.g. an Intel iGPU has no mem_info_vram_* or gpu_busy_percent.
+    """
+    def __init__(self, cards=None):
+        self.root = tempfile.mkdtemp(prefix="lmm-sysfs-")
+        self.cards = list(cards) if cards is not None else [FakeCard()]
+        for index, card in enumerate(self.cards):
+            self._build_card(index, card)
+
+    def _device_dir(self, index: int) -> str:
+        return os.path.join(self.root, f"card{index}", "device")
+
+    def _write(self, path: str, value):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Rewrite in place (same inode) so open descriptors see the new value
+        with open(path, 'w') as f:
+            f.write(f"{value}\n")
+
+    def _build_card(self, index: int, card: FakeCard):
+        device_dir = self._device_dir(index)
+        drivers_dir = os.path.join(self.root, "_drivers", card.driver)
+        os.makedirs(drivers_dir, exist_ok=True)
+        os.makedirs(device_dir, exist_ok=True)
+        os.symlink(drivers_dir, os.path.join(device_dir, "driver"))
+        # Connector entries live next to cards in the real tree and must be ignored
+        os.makedirs(os.path.join(self.root, f"card{index}-DP-1"), exist_ok=True)
+
+        if card.product_name:
+            self._write(os.path.join(device_dir, "product_name"), card.product_name)
+        self._write(os.path.join(device_dir, "uevent"), f"DRIVER={card.driver}\nPCI_ID={card.pci_id}")
+        for attr in ('vram_total', 'vram_used', 'busy_percent', 'temp_c'):
+            self.set(index, **{attr: getattr(card, attr)})
+
+    def set(self, index: int, vram_total=None, vram_used=None, busy_percent=None, temp_c=None):
+        """Updates attribute files for card `index`; None leaves a value untouched."""
+        device_dir = self._device_dir(index)
+        if vram_total is not None:
+            self._write(os.path.join(device_dir, "mem_info_vram_total"), vram_total)
+        if vram_used is not None:
+            self._write(os.path.join(device_dir, "mem_info_vram_used"), vram_used)
+        if busy_percent is not None:
+            self._write(os.path.join(device_dir, "gpu_busy_percent"), busy_percent)
+        if temp_c is not None:
+            self._write(os.path.join(device_dir, "hwmon", "hwmon0", "temp1_input"), int(temp_c * 1000))
+
+    def backend(self) -> SysfsBackend:
+        """Returns an initialized SysfsBackend reading this tree."""
+        backend = SysfsBackend(root=self.root)
+        backend.init()
+        return backend
+
+    def cleanup(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cleanup()
+        return False
@@ -0,0 +1,598 @@
+# benchmarks/run_benchmarks.py
+"""
+LMM benchmark suite. Runs on a GPU-less machine using a fake pynvml, a stub
+Ollama server and synthetic psutil process tables.
+
+    python -m benchmarks.run_benchmarks --output results.json
+    python -m benchmarks.run_benchmarks --compare results.json
+
+Results are per-call timings in milliseconds (best and median of several
+rounds) plus the commit, Python version and platform they were taken on, so
+runs from different commits can be compared with --compare.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import shutil
+import argparse
+import platform
+import statistics
+import sqlite3
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import fake_pynvml
+fake_pynvml.install() # Must happen before core.hardware is imported
+
+from benchmarks.stub_ollama import StubOllamaServer, make_model
+from benchmarks.synthetic_procs import make_process_table, patched_process_table
+from benchmarks.fake_sysfs import FakeSysfsTree, FakeCard
+from benchmarks.fake_store import FakeModelStore
+from benchmarks.fake_gguf import write_gguf
+
+PROCESS_TABLE_SIZES = (100, 1000, 10000)
+SLOW_DELAY = 0.1 # Seconds the stub waits before answering in 'slow' mode
+HANG_DELAY = 30 # Seconds the stub waits in 'hanging' cases, well past the sampler's read timeout
+PROXY_OVERHEAD_LIMIT = 0.001 # Seconds of proxy processing per request (median) the proxy_overhead cases allow
+
+class DictConfig:
+    """Minimal stand-in for ConfigManager (settings live in memory only)."""
+    def __init__(self, settings: dict):
+        self.settings = settings
+
+    def get(self, key, default=None):
+        return self.settings.get(key, default)
+
+    def subscribe(self, callback):
+        pass
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=False,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or "unknown"
+    except Exception:
+        return "unknown"
+
+def measure(func, rounds: int, min_time: float) -> dict:
+    """
+    Calls `func` repeatedly. Each round runs for at least `min_time` seconds;
+    returns best / median per-call time across rounds in milliseconds.
+    """
+    func() # Warm-up
+    per_call = []
+    calls = 0
+    for _ in range(rounds):
+        n = 0
+        start = time.perf_counter()
+        while True:
+            func()
+            n += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        per_call.append(elapsed / n * 1000)
+        calls += n
+    return {
+        'best_ms': min(per_call),
+        'median_ms': statistics.median(per_call),
+        'calls': calls,
+    }
+
+def build_cases(stub: StubOllamaServer):
+    """
+    Yields (name, setup) pairs; setup() returns (func, teardown).
+    """
+    from core.hardware import HardwareMonitor
+    from core.sampler import StatusSampler, format_overall_status, loaded_model_record
+    from core.dashboard import build_process_rows
+    from core.matcher import ProcessMatcher
+    from core.model_index import ModelIndex
+    from core.model_store import ModelStore
+    from core.blob_verify import BlobVerifier
+    from core.model_manager import OllamaManager
+    from core.gguf_import import GgufImporter
+    from core.gguf import read_gguf, estimate_vram
+    from core.inference_bench import InferenceBenchmark
+    from core.proxy import MeteringProxy, UsageStore
+    from core.embed_batcher import EmbeddingBatcher
+    from core.scheduler import ModelScheduler
+    from core.alerts import AlertEngine, DEFAULT_RULES
+    from core.telemetry import generate_scenario, ReplaySource, ReplaySampler
+    from core.game_mode import activate_game_mode
+    from utils.log import start_queue_logging
+    from logging.handlers import RotatingFileHandler
+
+    external_models = [
+        {"name": "Handy AI", "process": "handy.exe", "type": "local_gpu"},
+        {"name": "Python Script", "process": "python.exe", "type": "local_cpu"},
+    ]
+
+    def sysfs_case(cards=4):
+        tree = FakeSysfsTree([FakeCard() for _ in range(cards)])
+        monitor = HardwareMonitor(tree.backend())
+
+        def teardown():
+            monitor.backend.shutdown()
+            tree.cleanup()
+        return monitor.get_all_gpu_info, teardown
+    yield "get_all_gpu_info[sysfs,cards=4]", sysfs_case
+
+    def model_index_case(warm=True):
+        cache_dir = tempfile.mkdtemp(prefix="lmm-index-")
+        config = DictConfig({'api_url': stub.url})
+        cache_file = os.path.join(cache_dir, 'model_index.json')
+        if warm:
+            ModelIndex(config, cache_file).refresh()
+
+        def run():
+            if not warm:
+                # Every call starts from an empty cache: one /api/show per model
+                if os.path.exists(cache_file):
+                    os.remove(cache_file)
+            return ModelIndex(config, cache_file).refresh()
+        return run, lambda: shutil.rmtree(cache_dir, ignore_errors=True)
+    yield f"model_index_refresh[models={len(stub.models)},cold]", lambda: model_index_case(warm=False)
+    yield f"model_index_refresh[models={len(stub.models)},cached]", model_index_case
+
+    def store_case(warm=True):
+        store = FakeModelStore(families=100, tags_per_family=4) # 400 models, 400 GB (sparse)
+
+        def run():
+            # A cold run starts from a fresh ModelStore, i.e. no cached listings or manifests
+            return (analyzer if warm else ModelStore(store.root)).analyze()
+        analyzer = ModelStore(store.root)
+        analyzer.analyze()
+        return run, store.cleanup
+    yield "store_analyze[models=400,cold]", lambda: store_case(warm=False)
+    yield "store_analyze[models=400,cached]", store_case
+
+    def store_restart_case():
+        # A fresh ModelStore (as after an app restart) loading the persisted manifest index
+        store = FakeModelStore(families=100, tags_per_family=4)
+        cache_file = os.path.join(store.root, 'index.json')
+        ModelStore(store.root, cache_file).analyze()
+        return lambda: ModelStore(store.root, cache_file).analyze(), store.cleanup
+    yield "store_analyze[models=400,restart]", store_restart_case
+
+    def gc_case():
+        store = FakeModelStore(families=100, tags_per_family=4)
+        for _ in range(50):
+            store.add_blob(1024**2) # Orphans
+        analyzer = ModelStore(store.root)
+        manager = OllamaManager()
+        return lambda: manager.collect_garbage(analyzer, dry_run=True, min_age=0), store.cleanup
+    yield "blob_gc[models=400,dry_run]", gc_case
+
+    def gc_unreadable_case():
+        # One half-written manifest: GC must refuse to run rather than delete that model's blobs
+        store = FakeModelStore(families=10, tags_per_family=2)
+        name, digests = next(iter(store.models.items()))
+        model, tag = name.split(':')
+        path = os.path.join(store.manifests_dir, model, tag)
+        with open(path, 'r+') as f:
+            f.truncate(os.path.getsize(path) // 2)
+        old = time.time() - 86400
+        for digest in digests:
+            os.utime(store.blob_path(digest), (old, old))
+        analyzer = ModelStore(store.root)
+        manager = OllamaManager()
+
+        def run():
+            result = manager.collect_garbage(analyzer, dry_run=False, min_age=0)
+            missing = [d for d in digests if not os.path.exists(store.blob_path(d))]
+            if missing or not result.blocked or result.deleted:
+                raise RuntimeError(f"GC deleted blobs of unreadable manifest {path}: {missing}")
+        return run, store.cleanup
+    yield "blob_gc[unreadable_manifest]", gc_unreadable_case
+
+    def import_case():
+        tmp_dir = tempfile.mkdtemp(prefix="lmm-import-")
+        path = os.path.join(tmp_dir, 'model.gguf')
+        with open(path, 'wb') as f:
+            f.write(b'GGUF' + os.urandom(64 * 1024**2))
+        importer = GgufImporter(DictConfig({'api_url': stub.url})) # No digest cache: hash every run
+
+        def run():
+            stub.blobs.clear() # Force a full upload
+            return importer.import_file(path, "imported:latest")
+
+        def teardown():
+            stub.models[:] = [m for m in stub.models if m['name'] != "imported:latest"]
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return run, teardown
+    yield "gguf_import[64MB,hash+upload]", import_case
+
+    def gguf_header_case():
+        # Llama 3 8B shape: 128k-token vocabulary array and 291 tensors, ~4.8 GB sparse
+        tmp_dir = tempfile.mkdtemp(prefix="lmm-gguf-")
+        path = os.path.join(tmp_dir, 'model.gguf')
+        write_gguf(path)
+
+        def run():
+            return estimate_vram(read_gguf(path), num_ctx=8192)
+        return run, lambda: shutil.rmtree(tmp_dir, ignore_errors=True)
+    yield "gguf_header[llama3-8b,read+estimate]", gguf_header_case
+
+    def inference_bench_case():
+        # Client-side cost of streaming and parsing 4 x 128 tokens; the stub answers instantly
+        tmp_dir = tempfile.mkdtemp(prefix="lmm-bench-")
+        bench = InferenceBenchmark(DictConfig({'api_url': stub.url}), os.path.join(tmp_dir, 'results.json'))
+        model = stub.models[0]
+
+        def run():
+            return bench.run(model['name'], model['digest'], 'stub', num_predict=128)
+
+        def teardown():
+            stub.running = stub.models[:1]
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return run, teardown
+    yield "inference_bench[stub,prompts=3,tokens=128]", inference_bench_case
+
+    def proxy_case(proxied=True, path='/api/ps', payload=None):
+        # Compare the proxied and direct variants: the difference is the proxy's per-request overhead
+        tmp_dir = tempfile.mkdtemp(prefix="lmm-proxy-")
+        store = UsageStore(os.path.join(tmp_dir, 'usage.db'))
+        proxy = MeteringProxy(lambda: stub.url, store, port=0)
+        proxy.start()
+        client = httpx.Client()
+        url = (proxy.url if proxied else stub.url) + path
+        request = (lambda: client.post(url, json=payload)) if payload else (lambda: client.get(url))
+        request() # Open the keep-alive connections outside the timed rounds
+
+        def teardown():
+            client.close()
+            proxy.stop()
+            store.close()
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return request, teardown
+    generate = {'model': stub.models[0]['name'], 'prompt': 'hello', 'options': {'num_predict': 16}}
+    yield "proxy[/api/ps,direct]", lambda: proxy_case(proxied=False)
+    yield "proxy[/api/ps,proxied]", proxy_case
+    yield "proxy[/api/generate,tokens=16,direct]", lambda: proxy_case(False, '/api/generate', generate)
+    yield "proxy[/api/generate,tokens=16,proxied]", lambda: proxy_case(True, '/api/generate', generate)
+
+    def proxy_overhead_case(tokens):
+        # The proxy's own recorded processing time per request, which must stay under PROXY_OVERHEAD_LIMIT
+        tmp_dir = tempfile.mkdtemp(prefix="lmm-proxy-")
+        store = UsageStore(os.path.join(tmp_dir, 'usage.db'))
+        proxy = MeteringProxy(lambda: stub.url, store, port=0)
+        proxy.start()
+        client = httpx.Client()
+        payload = dict(generate, options={'num_predict': tokens})
+        request = lambda: client.post(f"{proxy.url}/api/generate", json=payload)
+        request()
+
+        def teardown():
+            client.close()
+            proxy.stop()
+            store.flush()
+            with sqlite3.connect(store.db_path) as db:
+                overheads = [row[0] for row in db.execute("SELECT overhead FROM requests")]
+            store.close()
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            median = statistics.median(overheads) * 1000
+            print(f"  recorded proxy overhead: median {median:.3f} ms, "
+                  f"p95 {sorted(overheads)[int(0.95 * (len(overheads) - 1))] * 1000:.3f} ms "
+                  f"over {len(overheads)} requests")
+            if median > PROXY_OVERHEAD_LIMIT * 1000:
+                raise RuntimeError(f"proxy overhead {median:.3f} ms per request exceeds "
+                                   f"{PROXY_OVERHEAD_LIMIT * 1000:.0f} ms")
+        return request, teardown
+    for tokens in (16, 128):
+        yield f"proxy_overhead[/api/generate,tokens={tokens}]", lambda tokens=tokens: proxy_overhead_case(tokens)
+
+    def embed_batch_case(max_wait=None, clients=16, requests=4):
+        # One call = every client sending `requests` single-input embeddings through the proxy.
+        # The stub charges a fixed 10 ms per upstream call, so batching trades a short wait for fewer calls.
+        tmp_dir = tempfile.mkdtemp(prefix="lmm-embed-")
+        store = UsageStore(os.path.join(tmp_dir, 'usage.db'))
+        batcher = EmbeddingBatcher(lambda: stub.url, max_batch=32, max_wait=max_wait) if max_wait is not None else None
+        proxy = MeteringProxy(lambda: stub.url, store, port=0, batcher=batcher)
+        proxy.start()
+        stub.embed_request_time, stub.embed_input_time = 0.01, 0.0002
+        pool = ThreadPoolExecutor(clients)
+        http_clients = [httpx.Client() for _ in range(clients)]
+        model = stub.models[0]['name']
+
+        def send(i):
+            for j in range(requests):
+                http_clients[i].post(f"{proxy.url}/api/embed", json={'model': model, 'input': f"doc {i}-{j}"})
+
+        def run():
+            list(pool.map(send, range(clients)))
+
+        def teardown():
+            pool.shutdown()
+            for client in http_clients:
+                client.close()
+            proxy.stop()
+            if batcher:
+                batcher.close()
+            store.close()
+            stub.embed_request_time = stub.embed_input_time = 0.0
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return run, teardown
+    yield "embed_batch[clients=16,requests=64,window=off]", embed_batch_case
+    for window_ms in (1, 5, 20):
+        yield f"embed_batch[clients=16,requests=64,window={window_ms}ms]", \
+            lambda window_ms=window_ms: embed_batch_case(max_wait=window_ms / 1000)
+
+    def scheduler_case(aging=None, clients=4, requests=10):
+        # Clients alternate between two models on a stub that holds one model and runs one request
+        # at a time; every model change costs a 50 ms load. The scheduler groups requests by model.
+        tmp_dir = tempfile.mkdtemp(prefix="lmm-sched-")
+        store = UsageStore(os.path.join(tmp_dir, 'usage.db'))
+        scheduler = ModelScheduler(max_models=1, aging=aging) if aging else None
+        proxy = MeteringProxy(lambda: stub.url, store, port=0, scheduler=scheduler)
+        proxy.start()
+        running = stub.running
+        stub.running = stub.models[:1]
+        stub.max_loaded, stub.load_time, stub.token_interval = 1, 0.05, 0.001
+        stub.set_parallel(1)
+        pool = ThreadPoolExecutor(clients)
+        http_clients = [httpx.Client(timeout=60) for _ in range(clients)]
+        payloads = [{'model': stub.models[i % 2]['name'], 'prompt': 'hello', 'options': {'num_predict': 8}}
+                    for i in range(clients)]
+
+        def send(i):
+            for _ in range(requests):
+                http_clients[i].post(f"{proxy.url}/api/generate", json=payloads[i])
+
+        def run():
+            list(pool.map(send, range(clients)))
+
+        def teardown():
+            pool.shutdown()
+            for client in http_clients:
+                client.close()
+            proxy.stop()
+            store.close()
+            stub.max_loaded, stub.load_time, stub.token_interval = 0, 0.0, 0.0
+            stub.set_parallel(0)
+            stub.running = running
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return run, teardown
+    yield "scheduler[models=2,clients=4,requests=40,off]", scheduler_case
+    yield "scheduler[models=2,clients=4,requests=40,aging=300ms]", lambda: scheduler_case(aging=0.3)
+
+    def alerts_case(history=0):
+        # One call = one snapshot (4 GPUs, 3 models, 2 agents) through the default rules. The values
+        # swing across the thresholds so rules fire and resolve; cost must not grow with `history`.
+        engine = AlertEngine(DEFAULT_RULES, max_per_minute=0)
+        snapshots = [{
+            'timestamp': 1.0, 'ollama_up': True,
+            'gpus': [{'index': i, 'vram_total_bytes': 100, 'vram_used_bytes': 80 + 15 * hot,
+                      'temperature_c': 70 + 20 * hot, 'gpu_utilization_pct': 50} for i in range(4)],
+            'loaded_models': [{'name': f"model-{i}:latest", 'cpu_fraction': 0.1 * hot} for i in range(3)],
+            'external_models': [{'name': ext['name'], 'running': not hot} for ext in external_models],
+        } for hot in (0, 1)]
+        clock = [0.0]
+
+        def run():
+            clock[0] += 1.0
+            return engine.evaluate(snapshots[int(clock[0]) // 60 % 2], now=clock[0])
+        logger = logging.getLogger('LMM')
+        level = logger.level
+        logger.setLevel(logging.CRITICAL) # Keep the alert log lines out of the report
+        for _ in range(history):
+            run()
+        return run, lambda: logger.setLevel(level)
+    yield "alerts_evaluate[rules=6,history=0]", alerts_case
+    yield "alerts_evaluate[rules=6,history=100k]", lambda: alerts_case(history=100_000)
+
+    def replay_case(gpus=8, processes=5000, models=20):
+        # The whole poll -> alerts -> dashboard rows -> tray status path over a synthetic scenario,
+        # one recorded tick per call; no NVML, psutil or HTTP involved
+        tmp_dir = tempfile.mkdtemp(prefix="lmm-replay-")
+        path = os.path.join(tmp_dir, 'scenario.jsonl.gz')
+        generate_scenario(path, gpus, processes, models, ticks=120)
+        monitor = HardwareMonitor('none')
+        sampler = ReplaySampler(DictConfig({'api_url': stub.url, 'external_models': external_models}), monitor,
+                                ReplaySource(path, speed=0))
+        engine = AlertEngine(DEFAULT_RULES, max_per_minute=0)
+        logger = logging.getLogger('LMM')
+        level = logger.level
+        logger.setLevel(logging.CRITICAL)
+
+        def run():
+            snapshot = sampler.poll()
+            engine.evaluate(snapshot)
+            build_process_rows(snapshot['gpus'][0], snapshot['loaded_models'], snapshot['external_models'])
+            return format_overall_status(snapshot, True)
+
+        def teardown():
+            logger.setLevel(level)
+            sampler.close()
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return run, teardown
+    yield "replay_poll[gpus=8,procs=5000,models=20]", replay_case
+
+    def logging_case(queued=True, distinct=False):
+        # Cost to the calling (polling) thread of logging one error line to a rotating log file
+        tmp_dir = tempfile.mkdtemp(prefix="lmm-log-")
+        logger = logging.Logger('lmm-bench-log')
+        handler = RotatingFileHandler(os.path.join(tmp_dir, 'lmm.log'), maxBytes=5 * 1024**2, backupCount=1,
+                                      encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(message)s'))
+        listener = start_queue_logging(logger, [handler]) if queued else logger.addHandler(handler)
+        counter = [0]
+
+        def run():
+            counter[0] += 1
+            logger.error(f"Connection error to Ollama API: [Errno 111] Connection refused"
+                         f"{f' #{counter[0]}' if distinct else ''}")
+
+        def teardown():
+            if listener:
+                listener.stop()
+            handler.close()
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return run, teardown
+    yield "log_error[sync,repeated]", lambda: logging_case(queued=False)
+    yield "log_error[queued,repeated]", logging_case
+    yield "log_error[queued,distinct]", lambda: logging_case(distinct=True)
+
+    def verify_case(force=True):
+        store = FakeModelStore(families=0)
+        for i in range(8):
+            store.add_content_blob(os.urandom(32 * 1024**2))
+        verifier = BlobVerifier(ModelStore(store.root), os.path.join(store.root, 'verified.json'))
+        verifier.verify()
+        return lambda: verifier.verify(force=force), store.cleanup
+    yield "blob_verify[blobs=8x32MB,full]", verify_case
+    yield "blob_verify[blobs=8x32MB,incremental]", lambda: verify_case(force=False)
+
+    for size in PROCESS_TABLE_SIZES:
+        table = make_process_table(size)
+        gpu_pids = [(p.pid, 512 * 1024**2) for p in table[:min(20, size)]]
+
+        def configure_gpus(gpu_pids=gpu_pids):
+            fake_pynvml.configure([fake_pynvml.FakeDevice(
+                compute_processes=gpu_pids,
+                process_utilization={pid: (25, 10, 0, 0) for pid, _ in gpu_pids}
+            )])
+
+        def gpu_info_case(table=table):
+            configure_gpus()
+            ctx = patched_process_table(table)
+            ctx.__enter__()
+            monitor = HardwareMonitor('nvml')
+            return monitor.get_gpu_info, lambda: ctx.__exit__(None, None, None)
+        yield f"get_gpu_info[procs={size}]", gpu_info_case
+
+        def overall_status_case(table=table, mode='normal', delay=0.0, tripped=False):
+            configure_gpus()
+            stub.set_mode(mode, delay)
+            ctx = patched_process_table(table)
+            ctx.__enter__()
+            monitor = HardwareMonitor('nvml')
+            sampler = StatusSampler(DictConfig({'api_url': stub.url, 'external_models': external_models}), monitor)
+            if tripped:
+                # As after three polls that hit the read timeout; polls now skip the API until a trial is due
+                for _ in range(sampler.ollama_health.threshold):
+                    sampler.ollama_health.record_failure("timed out")
+
+            def run():
+                return format_overall_status(sampler.poll(), monitor.gpu_available)
+
+            def teardown():
+                sampler.close()
+                stub.set_mode('normal')
+                ctx.__exit__(None, None, None)
+            return run, teardown
+        yield f"get_overall_status[procs={size}]", overall_status_case
+        yield f"get_overall_status[procs={size},ollama=offline]", \
+            lambda table=table: overall_status_case(table, 'offline')
+        if size == PROCESS_TABLE_SIZES[0]:
+            yield f"get_overall_status[procs={size},ollama=slow]", \
+                lambda table=table: overall_status_case(table, 'slow', SLOW_DELAY)
+            yield f"get_overall_status[procs={size},ollama=hanging]", \
+                lambda table=table: overall_status_case(table, 'slow', HANG_DELAY, tripped=True)
+
+        def dashboard_case(table=table):
+            configure_gpus()
+            ctx = patched_process_table(table)
+            ctx.__enter__()
+            monitor = HardwareMonitor('nvml')
+            gpu_info = monitor.get_gpu_info()
+            matcher = ProcessMatcher(external_models)
+            external_status = matcher.match(matcher.scan())
+            loaded_models = [loaded_model_record(m) for m in stub.running]
+
+            def run():
+                return build_process_rows(gpu_info, loaded_models, external_status)
+            return run, lambda: ctx.__exit__(None, None, None)
+        yield f"dashboard_rows[procs={size}]", dashboard_case
+
+        def game_mode_case(table=table):
+            ctx = patched_process_table(table)
+            ctx.__enter__()
+            return activate_game_mode, lambda: ctx.__exit__(None, None, None)
+        yield f"activate_game_mode[procs={size}]", game_mode_case
+
+def run_suite(rounds: int, min_time: float, name_filter: str = "") -> dict:
+    stub = StubOllamaServer(models=[make_model(i) for i in range(20)])
+    stub.running = stub.models[:3]
+    stub.start()
+    results = {}
+    try:
+        for name, setup in build_cases(stub):
+            if name_filter and name_filter not in name:
+                continue
+            func, teardown = setup()
+            try:
+                results[name] = measure(func, rounds, min_time)
+            finally:
+                teardown()
+            print(f"{name:<55} best {results[name]['best_ms']:10.3f} ms   median {results[name]['median_ms']:10.3f} ms")
+    finally:
+        stub.stop()
+
+    return {
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.time(),
+        'results': results,
+    }
+
+def compare(current: dict, baseline: dict, threshold: float) -> int:
+    """
+    Prints per-case change in median time. Returns the number of cases slower
+    than `threshold` (fractional, e.g. 0.15 = 15%).
+    """
+    regressions = 0
+    print(f"\nComparing {current['revision']} against {baseline.get('revision', '?')}:")
+    for name, res in current['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if not base:
+            print(f"  {name:<55} (new)")
+            continue
+        change = (res['median_ms'] - base['median_ms']) / base['median_ms'] if base['median_ms'] else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"  {name:<55} {base['median_ms']:10.3f} -> {res['median_ms']:10.3f} ms ({change:+.1%}){flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="LMM benchmark suite")
+    parser.add_argument('--rounds', type=int, default=5, help="Rounds per case (default 5)")
+    parser.add_argument('--min-time', type=float, default=0.2, help="Minimum seconds per round (default 0.2)")
+    parser.add_argument('--filter', default="", help="Only run cases whose name contains this text")
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    parser.add_argument('--compare', help="Baseline JSON from a previous run")
+    parser.add_argument('--threshold', type=float, default=0.15, help="Regression threshold for --compare (default 0.15)")
+    args = parser.parse_args()
+
+    # Keep LMM's own logging out of the measurements
+    lmm_logger = logging.getLogger('LMM')
+    lmm_logger.addHandler(logging.NullHandler())
+    lmm_logger.propagate = False
+
+    report = run_suite(args.rounds, args.min_time, args.filter)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.threshold):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+# benchmarks/stub_ollama.py
+"""
+Local stub of the Ollama HTTP API for benchmarks on machines without Ollama.
+
+Emulates /api/ps, /api/tags, /api/show, /api/blobs/:digest and streaming
+/api/pull, /api/create and /api/generate, plus /api/embed, with modes:
+    'normal'  - answer immediately
+    'slow'    - sleep `delay` seconds before answering
+    'error'   - answer 500
+    'offline' - stop listening (connection refused)
+"""
+import json
+import time
+import hashlib
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+GB = 1024**3
+
+def make_model(i: int, size_gb: float = 4.0, vram_fraction: float = 1.0) -> dict:
+    """A synthetic model record shaped like the entries of /api/ps and /api/tags."""
+    size = int(size_gb * GB)
+    digest = f"{i:064x}"
+    return {
+        'name': f"model-{i}:latest",
+        'model': f"model-{i}:latest",
+        'size': size,
+        'size_vram': int(size * vram_fraction),
+        'digest': digest,
+        'modified_at': "2025-01-01T00:00:00Z",
+        'expires_at': "2099-01-01T00:00:00Z",
+        'details': {
+            'format': 'gguf',
+            'family': 'llama',
+            'parameter_size': '8B',
+            'quantization_level': 'Q4_K_M',
+        },
+    }
+
+def make_show(model: dict) -> dict:
+    """An /api/show response for a record from make_model()."""
+    return {
+        'modelfile': f"FROM {model['name']}",
+        'parameters': 'stop "<|eot_id|>"',
+        'template': "{{ if .System }}<|system|>{{ .System }}{{ end }}<|user|>{{ .Prompt }}<|assistant|>",
+        'details': model['details'],
+        'model_info': {
+            'general.architecture': 'llama',
+            'general.parameter_count': 8_030_261_248,
+            'llama.context_length': 131072,
+            'llama.embedding_length': 4096,
+            'llama.block_count': 32,
+        },
+        'capabilities': ['completion'],
+    }
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Send headers and body in one segment; otherwise Nagle + delayed ACK adds ~40 ms per request
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self) -> dict:
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return {}
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream_ndjson(self, chunks, interval=0.0):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for chunk in chunks:
+            data = (json.dumps(chunk) + "\n").encode('utf-8')
+            self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+            self.wfile.flush()
+            if interval:
+                time.sleep(interval)
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _prologue(self) -> bool:
+        stub = self.server.stub
+        stub.request_count += 1
+        if stub.mode == 'offline':
+            # A keep-alive connection from before the stop: drop it, as a server shutting down would
+            self.close_connection = True
+            return False
+        if stub.mode == 'slow':
+            time.sleep(stub.delay)
+        if stub.mode == 'error':
+            self._send_json({'error': 'stub error'}, status=500)
+            return False
+        return True
+
+    def do_HEAD(self):
+        if not self._prologue():
+            return
+        path = self.path.split('?', 1)[0]
+        found = path.startswith('/api/blobs/') and path[len('/api/blobs/'):] in self.server.stub.blobs
+        self.send_response(200 if found else 404)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def _receive_blob(self, digest: str):
+        # Hash the body as it arrives, like Ollama does, without keeping it
+        remaining = int(self.headers.get('Content-Length') or 0)
+        h = hashlib.sha256()
+        while remaining:
+            data = self.rfile.read(min(remaining, 1024 * 1024))
+            if not data:
+                break
+            h.update(data)
+            remaining -= len(data)
+        if f"sha256:{h.hexdigest()}" != digest:
+            self._send_json({'error': 'digest mismatch'}, status=400)
+            return
+        self.server.stub.blobs.add(digest)
+        self.send_response(201)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_GET(self):
+        if not self._prologue():
+            return
+        stub = self.server.stub
+        path = self.path.split('?', 1)[0]
+        if path == '/api/ps':
+            self._send_json({'models': stub.running})
+        elif path == '/api/tags':
+            self._send_json({'models': stub.models})
+        elif path in ('/', '/api/version'):
+            self._send_json({'version': '0.0.0-stub'})
+        else:
+            self._send_json({'error': 'not found'}, status=404)
+
+    def do_POST(self):
+        if not self._prologue():
+            return
+        stub = self.server.stub
+        path = self.path.split('?', 1)[0]
+        if path.startswith('/api/blobs/'):
+            self._receive_blob(path[len('/api/blobs/'):])
+            return
+        body = self._read_body()
+        if path == '/api/pull':
+            name = body.get('model') or body.get('name', '')
+            total = stub.pull_total
+            steps = max(1, stub.pull_steps)
+            chunks = [{'status': 'pulling manifest'}]
+            chunks += [
+                {'status': f'pulling {name}', 'digest': 'sha256:' + '0' * 64,
+                 'total': total, 'completed': total * (i + 1) // steps}
+                for i in range(steps)
+            ]
+            chunks += [{'status': 'verifying sha256 digest'}, {'status': 'success'}]
+            self._stream_ndjson(chunks, stub.pull_interval)
+        elif path == '/api/create':
+            name = body.get('model') or body.get('name', '')
+            missing = [d for d in (body.get('files') or {}).values() if d not in stub.blobs]
+            if missing:
+                self._send_json({'error': f"blob {missing[0]} not found"}, status=400)
+                return
+            model = make_model(len(stub.models))
+            model.update(name=name, model=name)
+            stub.models.append(model)
+            self._stream_ndjson([{'status': 'parsing GGUF'}, {'status': 'writing manifest'}, {'status': 'success'}])
+        elif path == '/api/generate':
+            self._generate(body)
+        elif path == '/api/embed':
+            self._embed(body)
+        elif path == '/api/show':
+            name = body.get('model') or body.get('name', '')
+            model = next((m for m in stub.models if m['name'] == name), None)
+            if model:
+                self._send_json(make_show(model))
+            else:
+                self._send_json({'error': f"model '{name}' not found"}, status=404)
+        else:
+            self._send_json({'error': 'not found'}, status=404)
+
+    def _generate(self, body: dict):
+        stub = self.server.stub
+        name = body.get('model', '')
+        model = next((m for m in stub.models if m['name'] == name), None)
+        if model is None:
+            self._send_json({'error': f"model '{name}' not found"}, status=404)
+            return
+        loaded = any(m['name'] == name for m in stub.running)
+        if not body.get('prompt') and body.get('keep_alive') == 0:
+            # Unload request
+            stub.running = [m for m in stub.running if m['name'] != name]
+            self._send_json({'model': name, 'response': '', 'done': True, 'done_reason': 'unload'})
+            return
+
+        start = time.perf_counter()
+        slots = stub.slots
+        if slots:
+            slots.acquire() # Requests beyond `parallel` queue, as with OLLAMA_NUM_PARALLEL
+        try:
+            # Check again once admitted: a request queued ahead of this one may have loaded or evicted it
+            loaded = any(m['name'] == name for m in stub.running)
+            self._generate_stream(body, model, loaded, start)
+        finally:
+            if slots:
+                slots.release()
+
+    def _generate_stream(self, body: dict, model: dict, loaded: bool, start: float):
+        stub = self.server.stub
+        name = model['name']
+        load_duration = 0.0
+        if not loaded:
+            time.sleep(stub.load_time)
+            load_duration = stub.load_time
+            stub.loads += 1
+            running = stub.running + [model]
+            # Evict the least recently loaded models, as when VRAM only holds `max_loaded` of them
+            stub.running = running[-stub.max_loaded:] if stub.max_loaded else running
+        prompt_tokens = max(1, len(body.get('prompt', '').split()))
+        time.sleep(prompt_tokens * stub.prompt_token_time)
+        eval_count = int((body.get('options') or {}).get('num_predict') or 16)
+
+        ns = lambda seconds: int(seconds * 1e9)
+        chunks = [{'model': name, 'response': f" tok{i}", 'done': False} for i in range(eval_count)]
+        chunks.append({
+            'model': name, 'response': '', 'done': True, 'done_reason': 'length',
+            'total_duration': ns(time.perf_counter() - start + eval_count * stub.token_interval),
+            'load_duration': ns(load_duration),
+            'prompt_eval_count': prompt_tokens,
+            'prompt_eval_duration': ns(prompt_tokens * stub.prompt_token_time),
+            'eval_count': eval_count,
+            'eval_duration': ns(eval_count * stub.token_interval),
+        })
+        self._stream_ndjson(chunks, stub.token_interval)
+
+    def _embed(self, body: dict):
+        stub = self.server.stub
+        name = body.get('model', '')
+        if not any(m['name'] == name for m in stub.models):
+            self._send_json({'error': f"model '{name}' not found"}, status=404)
+            return
+        inputs = body.get('input', [])
+        inputs = inputs if isinstance(inputs, list) else [inputs]
+        start = time.perf_counter()
+        # One runner: requests are processed one at a time, each paying a fixed cost plus a cost per input
+        with stub.embed_lock:
+            time.sleep(stub.embed_request_time + len(inputs) * stub.embed_input_time)
+        embeddings = []
+        for text in inputs:
+            digest = hashlib.sha256(str(text).encode('utf-8')).digest()
+            embeddings.append([b / 255 for b in digest[:stub.embed_dim]])
+        self._send_json({
+            'model': name,
+            'embeddings': embeddings,
+            'total_duration': int((time.perf_counter() - start) * 1e9),
+            'load_duration': 0,
+            'prompt_eval_count': sum(max(1, len(str(text).split())) for text in inputs),
+        })
+
+class _StubServer(ThreadingHTTPServer):
+    request_queue_size = 128 # Load tests connect many clients at once
+
+class StubOllamaServer:
+    """
+    Threaded stub server. Use `url` as the LMM `api_url`.
+    """
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, models=None, running=None):
+        self.host = host
+        self.port = port
+        self.models = models if models is not None else [make_model(i) for i in range(3)]
+        self.running = running if running is not None else self.models[:1]
+        self.mode = 'normal'
+        self.delay = 0.0
+        self.pull_total = 4 * GB
+        self.pull_steps = 100
+        self.pull_interval = 0.0
+        self.request_count = 0
+        self.blobs = set() # Digests uploaded through /api/blobs
+        self.load_time = 0.0 # Seconds to "load" a model that is not running
+        self.prompt_token_time = 0.0 # Seconds per prompt token
+        self.token_interval = 0.0 # Seconds between generated tokens
+        self.slots = None # Semaphore limiting concurrent generations; see set_parallel()
+        self.max_loaded = 0 # Models that fit at once (0 = unlimited); loading another evicts the oldest
+        self.loads = 0
+        self.embed_request_time = 0.0 # Seconds per /api/embed call
+        self.embed_input_time = 0.0 # Additional seconds per input of an /api/embed call
+        self.embed_dim = 8
+        self.embed_lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        if self._server:
+            return self
+        self._server = _StubServer((self.host, self.port), _StubHandler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def set_parallel(self, parallel: int):
+        """Serves at most `parallel` generations at once (0 = unlimited); the rest wait."""
+        self.slots = threading.Semaphore(parallel) if parallel else None
+
+    def set_mode(self, mode: str, delay: float = 0.0):
+        """Switches between 'normal', 'slow', 'error' and 'offline'."""
+        self.mode = mode
+        self.delay = delay
+        if mode == 'offline':
+            self.stop()
+        else:
+            self.start()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
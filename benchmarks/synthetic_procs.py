@@ -0,0 +1,72 @@
+# benchmarks/synthetic_procs.py
+"""
+Synthetic process tables patched into psutil for benchmarks.
+"""
+import random
+from contextlib import contextmanager
+
+import psutil
+
+COMMON_NAMES = [
+    "svchost.exe", "chrome.exe", "explorer.exe", "code.exe", "conhost.exe",
+    "RuntimeBroker.exe", "python.exe", "powershell.exe", "steam.exe", "discord.exe",
+]
+AI_NAMES = ["ollama_llama_server.exe", "ollama.exe", "handy.exe"]
+
+class FakeProcess:
+    __slots__ = ('pid', 'info', '_cmdline', 'terminated')
+
+    def __init__(self, pid: int, name: str, cmdline=None):
+        self.pid = pid
+        self.info = {'pid': pid, 'name': name}
+        self._cmdline = cmdline or [name]
+        self.terminated = False
+
+    def name(self):
+        return self.info['name']
+
+    def cmdline(self):
+        return self._cmdline
+
+    def terminate(self):
+        self.terminated = True
+
+def make_process_table(count: int, ai_fraction: float = 0.01, seed: int = 1234) -> list[FakeProcess]:
+    """
+    Builds `count` processes; roughly `ai_fraction` of them carry AI process names.
+    Seeded so the same table is produced on every run.
+    """
+    rng = random.Random(seed)
+    table = []
+    for i in range(count):
+        pid = 1000 + i * 4
+        if rng.random() < ai_fraction:
+            name = rng.choice(AI_NAMES)
+        else:
+            name = rng.choice(COMMON_NAMES)
+        cmdline = [name, f"script_{i}.py"] if name == "python.exe" else [name]
+        table.append(FakeProcess(pid, name, cmdline))
+    return table
+
+@contextmanager
+def patched_process_table(table: list[FakeProcess]):
+    """Routes psutil.process_iter / psutil.Process to `table` for the duration."""
+    by_pid = {p.pid: p for p in table}
+    orig_iter, orig_process = psutil.process_iter, psutil.Process
+
+    def fake_process_iter(attrs=None, ad_value=None):
+        return iter(table)
+
+    def fake_process(pid=None):
+        try:
+            return by_pid[pid]
+        except KeyError:
+            raise psutil.NoSuchProcess(pid)
+
+    psutil.process_iter = fake_process_iter
+    psutil.Process = fake_process
+    try:
+        yield table
+    finally:
+        psutil.process_iter = orig_iter
+        psutil.Process = orig_process
@@ -0,0 +1,274 @@
+# core/alerts.py
+import time
+import queue
+import logging
+import operator
+import threading
+from typing import Callable, Iterable, Optional
+
+import httpx
+
+logger = logging.getLogger('LMM')
+
+def _gpu_series(key: str):
+    def extract(snapshot: dict):
+        for gpu in snapshot.get('gpus', []):
+            if gpu.get(key) is not None:
+                yield f"GPU {gpu.get('index', 0)}", gpu[key]
+    return extract
+
+def _vram_pct(snapshot: dict):
+    for gpu in snapshot.get('gpus', []):
+        total, used = gpu.get('vram_total_bytes'), gpu.get('vram_used_bytes')
+        if total:
+            yield f"GPU {gpu.get('index', 0)}", used / total * 100
+
+def _model_cpu_pct(snapshot: dict):
+    # Share of a loaded model that did not fit in VRAM and runs on the CPU
+    for model in snapshot.get('loaded_models', []):
+        yield model['name'], model['cpu_fraction'] * 100
+
+def _external_up(snapshot: dict):
+    for ext in snapshot.get('external_models', []):
+        yield ext['name'], 1 if ext.get('running') else 0
+
+def _ollama_up(snapshot: dict):
+    if snapshot.get('timestamp'):
+        yield "Ollama", 1 if snapshot.get('ollama_up') else 0
+
+def _models_loaded(snapshot: dict):
+    if snapshot.get('ollama_up'):
+        yield "Ollama", len(snapshot.get('loaded_models', []))
+
+# metric -> (label, unit, extractor yielding (subject, value) from a sampler snapshot); label None = 0/1 state
+METRICS = {
+    'vram_pct': ("VRAM", "%", _vram_pct),
+    'temperature_c': ("temperature", " °C", _gpu_series('temperature_c')),
+    'gpu_util_pct': ("utilization", "%", _gpu_series('gpu_utilization_pct')),
+    'model_cpu_pct': ("share on CPU", "%", _model_cpu_pct),
+    'external_up': (None, "", _external_up),
+    'ollama_up': (None, "", _ollama_up),
+    'models_loaded': ("models loaded", "", _models_loaded),
+}
+
+OPERATORS = {'>': operator.gt, '>=': operator.ge, '<': operator.lt, '<=': operator.le}
+
+DEFAULT_RULES = [
+    {'name': "VRAM nearly full", 'metric': 'vram_pct', 'op': '>', 'threshold': 90, 'clear': 85, 'for_s': 30},
+    {'name': "GPU hot", 'metric': 'temperature_c', 'op': '>', 'threshold': 83, 'clear': 78, 'for_s': 10},
+    {'name': "Model spilled to CPU", 'metric': 'model_cpu_pct', 'op': '>', 'threshold': 0},
+    {'name': "External agent stopped", 'metric': 'external_up', 'op': '<', 'threshold': 1, 'after_ok': True},
+    {'name': "Ollama unreachable", 'metric': 'ollama_up', 'op': '<', 'threshold': 1, 'for_s': 5,
+     'severity': 'error'},
+    {'name': "Model loaded", 'metric': 'models_loaded', 'op': '>', 'threshold': 0, 'severity': 'info',
+     'notify_resolved': False},
+]
+
+def merge_rules(overrides: Iterable[dict]) -> list[dict]:
+    """
+    DEFAULT_RULES with user rules applied: a rule with the name of a default
+    changes only the fields it sets (e.g. {'name': ..., 'enabled': False}),
+    any other rule is added.
+    """
+    rules = {rule['name']: dict(rule) for rule in DEFAULT_RULES}
+    for rule in overrides:
+        if isinstance(rule, dict) and rule.get('name'):
+            rules.setdefault(rule['name'], {}).update(rule)
+    return list(rules.values())
+
+class AlertRule:
+    """
+    One threshold rule. Fires once `metric op threshold` has held for `for_s`
+    seconds and resolves once `metric op clear` no longer holds, so a value
+    hovering at the threshold does not flap (`clear` defaults to the
+    threshold). While firing it is re-sent every `repeat_s` seconds (0 =
+    never). With `after_ok`, a subject must first be seen healthy, so e.g.
+    an agent that was never started does not count as stopped.
+    """
+    def __init__(self, name: str, metric: str, op: str = '>', threshold: float = 0, clear: Optional[float] = None,
+                 for_s: float = 0, repeat_s: float = 0, severity: str = 'warning', after_ok: bool = False,
+                 notify_resolved: bool = True, enabled: bool = True):
+        if metric not in METRICS:
+            raise ValueError(f"unknown metric {metric!r}")
+        if op not in OPERATORS:
+            raise ValueError(f"unknown operator {op!r}")
+        self.name = name
+        self.metric = metric
+        self.op = op
+        self.threshold = threshold
+        self.clear = threshold if clear is None else clear
+        self.for_s = for_s
+        self.repeat_s = repeat_s
+        self.severity = severity
+        self.after_ok = after_ok
+        self.notify_resolved = notify_resolved
+        self.enabled = enabled
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'AlertRule':
+        return cls(**data)
+
+class _RuleState:
+    __slots__ = ('pending_since', 'firing', 'last_sent', 'seen_ok')
+
+    def __init__(self):
+        self.pending_since = None # When the condition started to hold
+        self.firing = False
+        self.last_sent = 0.0
+        self.seen_ok = False
+
+class AlertEngine:
+    """
+    Evaluates AlertRules against each sampler snapshot.
+
+    Each (rule, subject) pair - a GPU, a loaded model, an external agent -
+    keeps a fixed-size state, so evaluating a snapshot costs the same no
+    matter how long the engine has run. Events go to every sink; at most
+    `max_per_minute` are sent per minute across all rules (token bucket),
+    the rest are only logged.
+    """
+    def __init__(self, rules: Iterable[dict], sinks: Optional[list[Callable[[dict], None]]] = None,
+                 max_per_minute: int = 6):
+        self.rules = []
+        for data in rules:
+            try:
+                self.rules.append(AlertRule.from_dict(data))
+            except (TypeError, ValueError) as e:
+                logger.error(f"Ignoring alert rule {data.get('name', data) if isinstance(data, dict) else data}: {e}")
+        self.sinks = sinks or []
+        self.max_per_minute = max_per_minute
+        self._tokens = float(max_per_minute)
+        self._tokens_at = time.monotonic()
+        self._states = {} # (rule name, subject) -> _RuleState
+        self.active = {} # (rule name, subject) -> firing event, for display
+
+    def evaluate(self, snapshot: dict, now: Optional[float] = None) -> list[dict]:
+        """Updates every rule with one snapshot; returns the events it raised."""
+        now = time.monotonic() if now is None else now
+        events = []
+        for rule in self.rules:
+            if not rule.enabled:
+                continue
+            extract = METRICS[rule.metric][2]
+            seen = set()
+            for subject, value in extract(snapshot):
+                key = (rule.name, subject)
+                seen.add(key)
+                state = self._states.get(key)
+                if state is None:
+                    state = self._states[key] = _RuleState()
+                event = self._step(rule, state, subject, value, now)
+                if event:
+                    events.append(event)
+            # Subjects that disappeared (model unloaded, GPU gone) resolve and are forgotten
+            for key in [k for k in self._states if k[0] == rule.name and k not in seen]:
+                state = self._states.pop(key)
+                if state.firing:
+                    events.append(self._event(rule, key[1], None, 'resolved'))
+        for event in events:
+            self._dispatch(event)
+        return events
+
+    def _step(self, rule: AlertRule, state: _RuleState, subject: str, value: float, now: float) -> Optional[dict]:
+        compare = OPERATORS[rule.op]
+        if state.firing:
+            if not compare(value, rule.clear):
+                state.firing = False
+                state.pending_since = None
+                state.seen_ok = True
+                return self._event(rule, subject, value, 'resolved')
+            if rule.repeat_s and now - state.last_sent >= rule.repeat_s:
+                state.last_sent = now
+                return self._event(rule, subject, value, 'firing')
+            return None
+        if not compare(value, rule.threshold):
+            state.pending_since = None
+            state.seen_ok = True
+            return None
+        if rule.after_ok and not state.seen_ok:
+            return None
+        if state.pending_since is None:
+            state.pending_since = now
+        if now - state.pending_since < rule.for_s:
+            return None
+        state.firing = True
+        state.last_sent = now
+        return self._event(rule, subject, value, 'firing')
+
+    def _event(self, rule: AlertRule, subject: str, value: Optional[float], state: str) -> dict:
+        label, unit, _ = METRICS[rule.metric]
+        if state == 'firing' and label is None:
+            message = f"{rule.name}: {subject}"
+        elif state == 'firing':
+            shown = f"{value:.0f}" if abs(value) >= 1 or value == 0 else f"{value:.1g}" # Small shares are not "0%"
+            message = f"{rule.name}: {subject} {label} {shown}{unit} (limit {rule.op} {rule.threshold}{unit})"
+        else:
+            message = f"Resolved: {rule.name} ({subject})"
+        event = {'rule': rule.name, 'subject': subject, 'metric': rule.metric, 'state': state, 'value': value,
+                 'threshold': rule.threshold, 'severity': rule.severity, 'message': message, 'time': time.time(),
+                 'notify': state == 'firing' or rule.notify_resolved}
+        key = (rule.name, subject)
+        if state == 'firing':
+            self.active[key] = event
+        else:
+            self.active.pop(key, None)
+        return event
+
+    def _take_token(self) -> bool:
+        now = time.monotonic()
+        self._tokens = min(self.max_per_minute, self._tokens + (now - self._tokens_at) * self.max_per_minute / 60)
+        self._tokens_at = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def _dispatch(self, event: dict):
+        level = {'info': logging.INFO, 'error': logging.ERROR}.get(event['severity'], logging.WARNING)
+        if event['state'] == 'resolved':
+            level = logging.INFO
+        logger.log(level, f"Alert {event['message']}")
+        if not event['notify']:
+            return
+        if not self._take_token():
+            logger.debug(f"Alert rate limit reached; not notifying: {event['message']}")
+            return
+        for sink in self.sinks:
+            try:
+                sink(event)
+            except Exception as e:
+                logger.error(f"Alert sink {getattr(sink, '__name__', sink)} failed: {e}")
+
+class WebhookSink:
+    """
+    POSTs each event as JSON to `url` from a background thread, so a slow
+    endpoint never delays the poll loop.
+    """
+    TIMEOUT = 5 # Seconds
+
+    def __init__(self, url: str):
+        self.url = url
+        self._queue = queue.Queue(maxsize=100)
+        self._thread = threading.Thread(target=self._run, name='lmm-alert-webhook', daemon=True)
+        self._thread.start()
+
+    def __call__(self, event: dict):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            logger.warning(f"Alert webhook backlog full; dropping: {event['message']}")
+
+    def _run(self):
+        with httpx.Client(timeout=self.TIMEOUT) as client:
+            while True:
+                event = self._queue.get()
+                if event is None:
+                    return
+                try:
+                    client.post(self.url, json=event).raise_for_status()
+                except httpx.HTTPError as e:
+                    logger.warning(f"Alert webhook {self.url} failed: {e}")
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(timeout=self.TIMEOUT)
@@ -0,0 +1,204 @@
+# core/blob_verify.py
+import os
+import sys
+import json
+import mmap
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Optional
+
+import psutil
+
+from core.model_store import ModelStore, blob_digest
+
+logger = logging.getLogger('LMM')
+
+CHUNK_SIZE = 16 * 1024 * 1024 # Bytes per hashlib.update(); large enough to release the GIL for long stretches
+
+def hash_file(path: str, algorithm: str = 'sha256', chunk_size: int = CHUNK_SIZE,
+              on_progress: Optional[Callable[[int], None]] = None) -> str:
+    """
+    Hex digest of a file, read through a memory map in `chunk_size` slices.
+    `on_progress` receives the number of bytes hashed so far after each slice.
+    """
+    h = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return h.hexdigest() # mmap can't map an empty file
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                for offset in range(0, size, chunk_size):
+                    h.update(view[offset:offset + chunk_size])
+                    if on_progress:
+                        on_progress(min(offset + chunk_size, size))
+            finally:
+                view.release()
+    return h.hexdigest()
+
+def _lower_priority():
+    """Pool initializer: idle I/O and below-normal CPU priority, where the OS supports it."""
+    try:
+        p = psutil.Process()
+        if sys.platform == 'win32':
+            p.nice(psutil.BELOW_NORMAL_PRIORITY_CLASS)
+            p.ionice(psutil.IOPRIO_VERYLOW)
+        else:
+            p.nice(10)
+            if hasattr(psutil, 'IOPRIO_CLASS_IDLE'):
+                p.ionice(psutil.IOPRIO_CLASS_IDLE)
+    except (psutil.Error, OSError, AttributeError) as e:
+        logger.debug(f"Could not lower verifier priority: {e}")
+
+def _verify_one(path: str, digest: str) -> tuple[str, bool, str]:
+    """Worker: returns (digest, ok, error)."""
+    algorithm, _, expected = digest.partition(':')
+    try:
+        return digest, hash_file(path, algorithm) == expected, ""
+    except (OSError, ValueError) as e:
+        return digest, False, str(e)
+
+class VerifyReport:
+    """Outcome of one verification run."""
+    def __init__(self):
+        self.checked = 0 # Blobs hashed this run
+        self.skipped = 0 # Unchanged since a previous successful check
+        self.bytes_hashed = 0
+        self.duration = 0.0
+        self.corrupt = [] # [(digest, path, error)]
+        self.cancelled = False
+
+    @property
+    def throughput(self) -> float:
+        """Bytes per second hashed."""
+        return self.bytes_hashed / self.duration if self.duration else 0.0
+
+    def __repr__(self):
+        return (f"VerifyReport(checked={self.checked}, skipped={self.skipped}, corrupt={len(self.corrupt)}, "
+                f"{self.bytes_hashed / 1024**2:.0f} MB in {self.duration:.1f}s, "
+                f"{self.throughput / 1024**2:.0f} MB/s)")
+
+class BlobVerifier:
+    """
+    Re-hashes model blobs against their `sha256-<hex>` filenames.
+
+    Every blob that hashes correctly is remembered with its (size, mtime,
+    inode), so later runs only hash blobs that are new or changed on disk.
+    Hashing runs on a process pool at idle I/O priority; biggest blobs are
+    submitted first so one large file doesn't finish last on its own.
+    """
+    def __init__(self, store: ModelStore, state_file: str, workers: Optional[int] = None):
+        self.store = store
+        self.state_file = state_file
+        self.workers = workers or max(1, min(4, (os.cpu_count() or 2) - 1))
+        self._verified = {} # digest -> [size, mtime_ns, inode]
+        self._cancel = threading.Event()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.state_file, 'r') as f:
+                self._verified = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.error(f"Ignoring unreadable verification state {self.state_file}: {e}")
+
+    def _save(self):
+        tmp_file = f"{self.state_file}.tmp"
+        try:
+            with open(tmp_file, 'w') as f:
+                json.dump(self._verified, f)
+            os.replace(tmp_file, self.state_file)
+        except OSError as e:
+            logger.error(f"Error saving verification state: {e}")
+
+    def cancel(self):
+        """Stops submitting blobs; hashes already running finish."""
+        self._cancel.set()
+
+    def pending(self) -> tuple[list[tuple[str, str, int, list]], set]:
+        """
+        Returns ([(digest, path, size, fingerprint)] of blobs that need hashing,
+        set of all blob digests present).
+        """
+        todo, present = [], set()
+        with os.scandir(self.store.blobs_dir) as it:
+            for entry in it:
+                digest = blob_digest(entry.name)
+                if not digest or not entry.is_file(follow_symlinks=False):
+                    continue
+                present.add(digest)
+                st = entry.stat(follow_symlinks=False)
+                # entry.inode() is filled in on Windows too, where a DirEntry stat reports st_ino 0
+                fingerprint = [st.st_size, st.st_mtime_ns, entry.inode()]
+                if self._verified.get(digest) != fingerprint:
+                    todo.append((digest, entry.path, st.st_size, fingerprint))
+        return todo, present
+
+    def verify(self, force: bool = False, low_priority: bool = True,
+               on_progress: Optional[Callable[[int, int, int, int], None]] = None) -> VerifyReport:
+        """
+        Hashes new or changed blobs (all of them with `force`).
+
+        Args:
+            on_progress: Called as (blobs done, blobs total, bytes done, bytes total) after each blob.
+        """
+        self._cancel.clear()
+        if force:
+            self._verified.clear()
+        report = VerifyReport()
+        start = time.perf_counter()
+
+        try:
+            todo, present = self.pending()
+        except OSError as e:
+            logger.error(f"Cannot list blobs in {self.store.blobs_dir}: {e}")
+            return report
+        report.skipped = len(present) - len(todo)
+
+        todo.sort(key=lambda item: item[2], reverse=True)
+        total_bytes = sum(size for _, _, size, _ in todo)
+        by_digest = {digest: (path, size, fp) for digest, path, size, fp in todo}
+        logger.info(f"Verifying {len(todo)} blobs ({total_bytes / 1024**3:.2f} GB), skipping {report.skipped} unchanged.")
+
+        with ProcessPoolExecutor(max_workers=self.workers,
+                                 initializer=_lower_priority if low_priority else None) as pool:
+            futures = []
+            for digest, path, _, _ in todo:
+                if self._cancel.is_set():
+                    report.cancelled = True
+                    break
+                futures.append(pool.submit(_verify_one, path, digest))
+
+            for future in as_completed(futures):
+                if self._cancel.is_set() and not report.cancelled:
+                    report.cancelled = True
+                    for f in futures:
+                        f.cancel()
+                if future.cancelled():
+                    continue
+                digest, ok, error = future.result()
+                path, size, fingerprint = by_digest[digest]
+                report.checked += 1
+                report.bytes_hashed += size
+                if ok:
+                    self._verified[digest] = fingerprint
+                else:
+                    self._verified.pop(digest, None)
+                    report.corrupt.append((digest, path, error or "hash mismatch"))
+                    logger.error(f"Blob {digest} failed verification: {error or 'hash mismatch'}")
+                if on_progress:
+                    on_progress(report.checked, len(todo), report.bytes_hashed, total_bytes)
+
+        # Drop state for blobs that no longer exist
+        self._verified = {d: fp for d, fp in self._verified.items() if d in present}
+        self._save()
+
+        report.duration = time.perf_counter() - start
+        logger.info(f"Blob verification finished: {report}")
+        return report
@@ -0,0 +1,302 @@
+# core/commands.py
+import os
+import sys
+import time
+import base64
+import itertools
+import logging
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable, Optional
+
+from core.instrumentation import timings
+
+logger = logging.getLogger('LMM')
+
+CREATE_NO_WINDOW = 0x08000000
+_CREATION_FLAGS = CREATE_NO_WINDOW if sys.platform == 'win32' else 0
+
+LineCallback = Callable[[str], None]
+
+class CommandResult:
+    """Outcome of one command: exit code, captured output and timing."""
+    def __init__(self, argv, returncode: Optional[int], stdout: str = "", stderr: str = "",
+                 duration: float = 0.0, timed_out: bool = False, error: str = ""):
+        self.argv = argv
+        self.returncode = returncode # None if the process never started
+        self.stdout = stdout
+        self.stderr = stderr
+        self.duration = duration
+        self.timed_out = timed_out
+        self.error = error # Launch failure (e.g. executable not found)
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0 and not self.timed_out
+
+    @property
+    def output(self) -> str:
+        """stdout and stderr combined, for display."""
+        return "\n".join(part for part in (self.stdout, self.stderr, self.error) if part)
+
+    def __repr__(self):
+        return (f"CommandResult(argv={self.argv!r}, returncode={self.returncode}, "
+                f"timed_out={self.timed_out}, duration={self.duration:.3f}s)")
+
+def _stage_name(argv) -> str:
+    exe = os.path.splitext(os.path.basename(argv[0]))[0].lower() if argv else "?"
+    sub = argv[1] if len(argv) > 1 and not argv[1].startswith('-') else ""
+    return f"cmd.{exe}.{sub}" if sub else f"cmd.{exe}"
+
+def _pump(stream, sink: list, callback: Optional[LineCallback]):
+    for line in iter(stream.readline, ''):
+        line = line.rstrip('\r\n')
+        sink.append(line)
+        if callback:
+            try:
+                callback(line)
+            except Exception as e:
+                logger.error(f"Error in command output callback: {e}")
+    stream.close()
+
+def run_command(argv: list[str], timeout: Optional[float] = None,
+                on_stdout: Optional[LineCallback] = None, on_stderr: Optional[LineCallback] = None,
+                cwd: Optional[str] = None, env: Optional[dict] = None) -> CommandResult:
+    """
+    Runs an executable directly (no shell) and waits for it.
+
+    Args:
+        argv: Executable and arguments; never interpolated into a shell string.
+        timeout: Seconds before the process is killed; None waits indefinitely.
+        on_stdout / on_stderr: Called with each output line as it arrives.
+    """
+    argv = [str(a) for a in argv]
+    start = time.perf_counter()
+    stage = _stage_name(argv)
+    logger.debug(f"Running command: {argv}")
+
+    try:
+        proc = subprocess.Popen(
+            argv,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding='utf-8',
+            errors='replace',
+            cwd=cwd,
+            env=env,
+            creationflags=_CREATION_FLAGS
+        )
+    except (OSError, ValueError) as e:
+        logger.error(f"Failed to start command {argv}: {e}")
+        timings.note_error(stage, str(e))
+        return CommandResult(argv, None, duration=time.perf_counter() - start, error=str(e))
+
+    stdout_lines, stderr_lines = [], []
+    readers = [
+        threading.Thread(target=_pump, args=(proc.stdout, stdout_lines, on_stdout), daemon=True),
+        threading.Thread(target=_pump, args=(proc.stderr, stderr_lines, on_stderr), daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
+
+    timed_out = False
+    try:
+        proc.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        timed_out = True
+        proc.kill()
+        proc.wait()
+        logger.error(f"Command timed out after {timeout}s and was killed: {argv}")
+    for reader in readers:
+        # A killed process's children can hold the pipes open; don't wait on them forever
+        reader.join(timeout=5 if timed_out else None)
+
+    duration = time.perf_counter() - start
+    timings.record(stage, duration)
+    result = CommandResult(
+        argv, proc.returncode,
+        stdout="\n".join(stdout_lines).strip(),
+        stderr="\n".join(stderr_lines).strip(),
+        duration=duration,
+        timed_out=timed_out
+    )
+    if not result.ok:
+        timings.note_error(stage, "timeout" if timed_out else f"exit {result.returncode}: {result.stderr[:200]}")
+        if not timed_out:
+            logger.error(f"Command failed with exit code {result.returncode}: {argv}\nError: {result.stderr}")
+    else:
+        logger.debug(f"Command finished in {duration:.3f}s: {argv}")
+    return result
+
+# Shared pool so callers on the Tk thread never block on a subprocess. Only for short
+# calls: a job that can run for minutes goes through submit_long_task instead.
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='lmm-cmd')
+_long_task_ids = itertools.count(1)
+
+def submit_task(func, *args, **kwargs) -> Future:
+    """Runs a short blocking call (e.g. an OllamaManager method) on the shared worker pool."""
+    return _executor.submit(func, *args, **kwargs)
+
+def submit_long_task(func, *args, **kwargs) -> Future:
+    """
+    Runs a long job (pull, import, verify, benchmark...) on its own daemon
+    thread, so it never holds a shared pool worker that short calls wait for.
+    """
+    future = Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+    threading.Thread(target=run, name=f"lmm-long-{next(_long_task_ids)}", daemon=True).start()
+    return future
+
+def submit_command(argv: list[str], **kwargs) -> Future:
+    """run_command() on a background worker. Returns a Future resolving to a CommandResult."""
+    return submit_task(run_command, argv, **kwargs)
+
+class PersistentShell:
+    """
+    A long-lived hidden PowerShell session for the rare commands that truly
+    need a shell (pipelines, cmdlets). Avoids paying PowerShell start-up on
+    every call. Commands run one at a time; a command that times out kills
+    the session, and the next command starts a fresh one.
+    """
+    SENTINEL = "__LMM_CMD_DONE__"
+
+    def __init__(self, executable: str = "powershell.exe"):
+        self.executable = executable
+        self._proc: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+        self._lines = None
+        self._line_event = threading.Condition()
+
+    def _start(self):
+        self._proc = subprocess.Popen(
+            [self.executable, "-NoProfile", "-NoLogo", "-NonInteractive", "-Command", "-"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding='utf-8',
+            errors='replace',
+            bufsize=1,
+            creationflags=_CREATION_FLAGS
+        )
+        self._lines = []
+        threading.Thread(target=self._read_loop, args=(self._proc,), daemon=True).start()
+        logger.info(f"Started persistent shell session ({self.executable}, PID {self._proc.pid}).")
+
+    def _read_loop(self, proc):
+        for line in iter(proc.stdout.readline, ''):
+            with self._line_event:
+                self._lines.append(line.rstrip('\r\n'))
+                self._line_event.notify_all()
+        with self._line_event:
+            self._line_event.notify_all()
+
+    def _alive(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+
+    def run(self, command: str, timeout: Optional[float] = 60, on_line: Optional[LineCallback] = None) -> CommandResult:
+        """Runs a PowerShell command in the session. stderr is merged into stdout."""
+        start = time.perf_counter()
+        with self._lock:
+            if not self._alive():
+                try:
+                    self._start()
+                except OSError as e:
+                    logger.error(f"Failed to start persistent shell: {e}")
+                    return CommandResult([self.executable, command], None, error=str(e))
+
+            # Base64 (UTF-16LE) so quotes and newlines in `command` survive the stdin protocol
+            encoded = base64.b64encode(command.encode('utf-16-le')).decode('ascii')
+            script = (
+                "$global:LASTEXITCODE = 0; $__ok = $true; "
+                "try { & { Invoke-Expression ([Text.Encoding]::Unicode.GetString([Convert]::FromBase64String('"
+                + encoded +
+                "'))) } 2>&1 | ForEach-Object { \"$_\" }; $__ok = $? } catch { \"$_\"; $__ok = $false }; "
+                "$__code = if ($LASTEXITCODE) { $LASTEXITCODE } elseif ($__ok) { 0 } else { 1 }; "
+                f"\"{self.SENTINEL} $__code\""
+            )
+
+            with self._line_event:
+                self._lines.clear()
+            try:
+                self._proc.stdin.write(script + "\n")
+                self._proc.stdin.flush()
+            except OSError as e:
+                self.close()
+                return CommandResult([self.executable, command], None, error=str(e))
+
+            output, returncode, consumed = [], None, 0
+            deadline = None if timeout is None else time.monotonic() + timeout
+            with self._line_event:
+                while returncode is None:
+                    while consumed < len(self._lines):
+                        line = self._lines[consumed]
+                        consumed += 1
+                        if line.startswith(self.SENTINEL):
+                            returncode = int(line.split()[-1]) if line.split()[-1].lstrip('-').isdigit() else 1
+                            break
+                        output.append(line)
+                        if on_line:
+                            on_line(line)
+                    if returncode is not None:
+                        break
+                    if not self._alive():
+                        break
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        break
+                    self._line_event.wait(remaining if remaining is not None else 1.0)
+
+            duration = time.perf_counter() - start
+            timings.record('shell', duration)
+            if returncode is None:
+                timed_out = self._alive()
+                logger.error(f"Persistent shell command {'timed out' if timed_out else 'lost its session'}: {command}")
+                timings.note_error('shell', "timeout" if timed_out else "session exited")
+                self.close()
+                return CommandResult([self.executable, command], None, "\n".join(output),
+                                     duration=duration, timed_out=timed_out)
+
+            if returncode != 0:
+                timings.note_error('shell', f"exit {returncode}")
+            return CommandResult([self.executable, command], returncode, "\n".join(output).strip(), duration=duration)
+
+    def close(self):
+        if self._proc:
+            try:
+                self._proc.kill()
+                self._proc.wait(timeout=2)
+            except Exception: pass
+            self._proc = None
+
+_shell: Optional[PersistentShell] = None
+_shell_lock = threading.Lock()
+
+def get_shell() -> PersistentShell:
+    """The process-wide PersistentShell, created on first use."""
+    global _shell
+    with _shell_lock:
+        if _shell is None:
+            _shell = PersistentShell()
+        return _shell
+
+def shutdown():
+    """Stops the persistent shell and the worker pool (call on exit)."""
+    global _shell
+    with _shell_lock:
+        if _shell is not None:
+            _shell.close()
+            _shell = None
+    _executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,68 @@
+# core/dashboard.py
+import time
+from typing import Optional
+
+OLLAMA_ROW_ID = 'API' # pid column of loaded-model rows; their name column is the exact model name
+
+def _pct(value) -> str:
+    return f"{value}%" if value is not None else '-'
+
+def format_expiry(expires_at: Optional[float], now: float) -> str:
+    """Countdown to a loaded model's keep_alive expiry, e.g. "4m 05s"."""
+    if expires_at is None:
+        return "never"
+    remaining = int(expires_at - now)
+    if remaining <= 0:
+        return "unloading"
+    hours, rest = divmod(remaining, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}h {minutes:02d}m" if hours else f"{minutes}m {seconds:02d}s"
+
+def format_health(health: dict) -> str:
+    """One line for the sampler's Ollama circuit breaker state."""
+    if health['state'] == 'closed':
+        return "Ollama API: reachable" if not health['failures'] else f"Ollama API: {health['failures']} failed polls"
+    if health['state'] == 'half_open':
+        return "Ollama API: retrying..."
+    return f"Ollama API: down ({health['last_error']}), next check in {health['retry_in']:.0f} s"
+
+def build_process_rows(gpu_info: dict, loaded_models: list[dict], external_models: list[dict],
+                       now: Optional[float] = None) -> list[tuple]:
+    """
+    Builds the rows of the dashboard "Active AI Processes" tree as
+    (pid, name, vram, sm, mem, enc, cpu, expires, type) tuples; sm / mem / enc are the
+    process's share of the GPU's SM, memory controller and encoder. Kept free of Tkinter so the data path
+    can be exercised and benchmarked without a display.
+
+    Args:
+        loaded_models: The sampler's `loaded_models` records; each becomes a row with its VRAM
+            footprint, share offloaded to the CPU (cpu) and keep_alive countdown (expires).
+        external_models: The sampler's matched records ({name, process, running, pids}),
+            so rendering never walks the process table itself.
+    """
+    now = time.time() if now is None else now
+    rows = []
+    # Keep track of what we've seen to avoid dupes (PID based)
+    seen_pids = set()
+
+    # 1. Add every loaded Ollama model (from the API), largest first
+    for m in sorted(loaded_models, key=lambda m: m['size_vram'], reverse=True):
+        rows.append((OLLAMA_ROW_ID, m['name'], m['size_vram'] // 1024**2, '-', '-', '-',
+                     f"{m['cpu_fraction'] * 100:.0f}%", format_expiry(m['expires_at'], now),
+                     f"Ollama {m['digest'][:12]}".rstrip()))
+
+    # 2. Add GPU Processes (from Hardware Monitor)
+    for p in gpu_info.get('processes', []):
+        rows.append((p['pid'], p['name'], p.get('vram_used_mb', '?'), _pct(p.get('sm_util_pct')),
+                     _pct(p.get('mem_util_pct')), _pct(p.get('enc_util_pct')), '-', '-', p['type']))
+        seen_pids.add(p['pid'])
+
+    # 3. Add External Models (from Process Watcher)
+    # This finds things NOT on GPU (or not seen by NVML)
+    for em in external_models:
+        for pid in em.get('pids', []):
+            if pid not in seen_pids:
+                rows.append((pid, em.get('name', em.get('process', '')), '-', '-', '-', '-', '-', '-', 'External (CPU/Other)'))
+                seen_pids.add(pid)
+
+    return rows
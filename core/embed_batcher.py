@@ -0,0 +1,168 @@
+# core/embed_batcher.py
+import json
+import logging
+import threading
+from typing import Callable, Optional
+from contextlib import nullcontext
+
+import httpx
+
+from core.instrumentation import timings
+from core.sampler import create_http_client
+from core.scheduler import QUEUE_TIMEOUT
+
+logger = logging.getLogger('LMM')
+
+UPSTREAM_TIMEOUT = 600 # Seconds; a cold model load can take minutes
+# Seconds a caller waits for the batch it joined; the leader's slot wait plus its upstream call, with margin
+FOLLOWER_TIMEOUT = QUEUE_TIMEOUT + UPSTREAM_TIMEOUT + 30
+
+class _Batch:
+    __slots__ = ('inputs', 'counts', 'full', 'done', 'status', 'payload', 'queue_wait')
+
+    def __init__(self):
+        self.inputs = [] # Inputs of all callers, in arrival order
+        self.counts = [] # Number of inputs per caller
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.status = 502
+        self.payload = {}
+        self.queue_wait = None # Seconds the batch waited for a scheduler slot
+
+def _batch_key(request: dict) -> str:
+    """Requests can share a batch when everything except `input` is equal."""
+    return json.dumps({k: v for k, v in request.items() if k != 'input'}, sort_keys=True, separators=(',', ':'))
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent /api/embed requests into batched upstream calls.
+
+    The first request for a model (and set of options) opens a batch and
+    waits up to `max_wait` seconds; requests arriving meanwhile join it until
+    it holds `max_batch` inputs. The opening caller's thread then sends all
+    inputs as one `input` array and every caller gets back its own slice of
+    `embeddings`. No dispatcher thread is involved, so an idle batcher costs
+    nothing. `prompt_eval_count` of the batch is split across callers in
+    proportion to their number of inputs; durations are those of the whole
+    batch. With a ModelScheduler, each batch waits for a slot as one request
+    with the priority of the caller that opened it.
+    """
+    def __init__(self, api_url_provider: Callable[[], str], max_batch: int = 32, max_wait: float = 0.005,
+                 scheduler=None):
+        self.api_url_provider = api_url_provider
+        self.scheduler = scheduler
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait)
+        self._lock = threading.Lock()
+        self._open = {} # batch key -> _Batch still accepting inputs
+        self._client: Optional[httpx.Client] = None
+        self._client_url = None
+        self.stats = {'requests': 0, 'batches': 0, 'inputs': 0}
+
+    def _http(self, api_url: str) -> httpx.Client:
+        # One pooled client shared by all callers; httpx.Client is thread-safe
+        with self._lock:
+            if self._client is None or self._client_url != api_url:
+                if self._client:
+                    self._client.close()
+                self._client = create_http_client(api_url, timeout=httpx.Timeout(10, read=UPSTREAM_TIMEOUT))
+                self._client_url = api_url
+            return self._client
+
+    def embed(self, request: dict, priority: str = 'interactive') -> tuple[int, dict, Optional[float]]:
+        """
+        Embeds the inputs of one /api/embed request. Returns (HTTP status, response
+        payload, seconds its batch queued in the scheduler or None without one).
+        """
+        inputs = request.get('input', [])
+        inputs = inputs if isinstance(inputs, list) else [inputs]
+        with self._lock:
+            self.stats['requests'] += 1
+        if not inputs or len(inputs) >= self.max_batch:
+            # Nothing to gain from waiting; send it as it is
+            batch = _Batch()
+            batch.inputs, batch.counts = list(inputs), [len(inputs)]
+            self._send(request, batch, priority)
+            return *self._result(batch, 0), batch.queue_wait
+
+        key = _batch_key(request)
+        with self._lock:
+            batch = self._open.get(key)
+            if batch is not None and len(batch.inputs) + len(inputs) > self.max_batch:
+                # Does not fit: send the open batch now and start the next one
+                del self._open[key]
+                batch.full.set()
+                batch = None
+            leader = batch is None
+            if leader:
+                batch = self._open[key] = _Batch()
+            index = len(batch.counts)
+            batch.inputs.extend(inputs)
+            batch.counts.append(len(inputs))
+            if len(batch.inputs) >= self.max_batch:
+                del self._open[key]
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(self.max_wait)
+            with self._lock:
+                if self._open.get(key) is batch:
+                    del self._open[key]
+            self._send(request, batch, priority)
+        elif not batch.done.wait(FOLLOWER_TIMEOUT):
+            logger.error(f"Gave up after {FOLLOWER_TIMEOUT} s waiting for a batched embedding")
+            return 504, {'error': "timed out waiting for the batched embedding request"}, None
+        return *self._result(batch, index), batch.queue_wait
+
+    def _send(self, request: dict, batch: _Batch, priority: str):
+        payload = dict(request, input=batch.inputs)
+        api_url = self.api_url_provider()
+        slot = self.scheduler.slot(request.get('model', ''), priority) if self.scheduler else nullcontext()
+        try:
+            with slot as queued, timings.timed('embed.batch'):
+                batch.queue_wait = queued
+                response = self._http(api_url).post(f'{api_url}/api/embed', json=payload)
+            batch.status = response.status_code
+            batch.payload = response.json()
+            if not isinstance(batch.payload, dict):
+                raise ValueError("unexpected response")
+        except (httpx.HTTPError, ValueError, TimeoutError) as e:
+            logger.debug(f"Batched embedding of {len(batch.inputs)} inputs failed: {e}")
+            batch.status, batch.payload = 502, {'error': f"upstream error: {e}"}
+        except Exception as e:
+            # E.g. the client was closed by an api_url change mid-request; the batch must still finish
+            logger.error(f"Batched embedding of {len(batch.inputs)} inputs failed: {e}")
+            batch.status, batch.payload = 502, {'error': f"embedding failed: {e}"}
+        finally:
+            with self._lock:
+                self.stats['batches'] += 1
+                self.stats['inputs'] += len(batch.inputs)
+            # Followers are waiting on this whatever happened above
+            batch.done.set()
+
+    def _result(self, batch: _Batch, index: int) -> tuple[int, dict]:
+        payload = batch.payload
+        embeddings = payload.get('embeddings')
+        if batch.status != 200 or not isinstance(embeddings, list) or len(embeddings) != len(batch.inputs):
+            if batch.status == 200:
+                return 502, {'error': f"upstream returned {len(embeddings or [])} embeddings "
+                                      f"for {len(batch.inputs)} inputs"}
+            return batch.status, payload
+        offset = sum(batch.counts[:index])
+        count = batch.counts[index]
+        result = dict(payload, embeddings=embeddings[offset:offset + count])
+        if 'prompt_eval_count' in payload and len(batch.counts) > 1:
+            result['prompt_eval_count'] = round(payload['prompt_eval_count'] * count / len(batch.inputs))
+        return 200, result
+
+    def usage(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        stats['mean_batch'] = stats['inputs'] / stats['batches'] if stats['batches'] else 0.0
+        return stats
+
+    def close(self):
+        with self._lock:
+            if self._client:
+                self._client.close()
+                self._client = None
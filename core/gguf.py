@@ -0,0 +1,271 @@
+# core/gguf.py
+import os
+import mmap
+import struct
+import logging
+from typing import Optional
+
+logger = logging.getLogger('LMM')
+
+GGUF_MAGIC = b"GGUF"
+
+# Metadata value types
+UINT8, INT8, UINT16, INT16, UINT32, INT32, FLOAT32, BOOL, STRING, ARRAY, UINT64, INT64, FLOAT64 = range(13)
+
+_SCALARS = {
+    UINT8: struct.Struct('<B'), INT8: struct.Struct('<b'),
+    UINT16: struct.Struct('<H'), INT16: struct.Struct('<h'),
+    UINT32: struct.Struct('<I'), INT32: struct.Struct('<i'),
+    FLOAT32: struct.Struct('<f'), BOOL: struct.Struct('<?'),
+    UINT64: struct.Struct('<Q'), INT64: struct.Struct('<q'),
+    FLOAT64: struct.Struct('<d'),
+}
+_U32 = struct.Struct('<I')
+_U64 = struct.Struct('<Q')
+
+# ggml tensor types: id -> (name, elements per block, bytes per block)
+GGML_TYPES = {
+    0: ('F32', 1, 4), 1: ('F16', 1, 2), 2: ('Q4_0', 32, 18), 3: ('Q4_1', 32, 20),
+    6: ('Q5_0', 32, 22), 7: ('Q5_1', 32, 24), 8: ('Q8_0', 32, 34), 9: ('Q8_1', 32, 36),
+    10: ('Q2_K', 256, 84), 11: ('Q3_K', 256, 110), 12: ('Q4_K', 256, 144), 13: ('Q5_K', 256, 176),
+    14: ('Q6_K', 256, 210), 15: ('Q8_K', 256, 292), 16: ('IQ2_XXS', 256, 66), 17: ('IQ2_XS', 256, 74),
+    18: ('IQ3_XXS', 256, 98), 19: ('IQ1_S', 256, 50), 20: ('IQ4_NL', 32, 18), 21: ('IQ3_S', 256, 110),
+    22: ('IQ2_S', 256, 82), 23: ('IQ4_XS', 256, 136), 24: ('I8', 1, 1), 25: ('I16', 1, 2),
+    26: ('I32', 1, 4), 27: ('I64', 1, 8), 28: ('F64', 1, 8), 29: ('IQ1_M', 256, 56),
+    30: ('BF16', 1, 2), 34: ('TQ1_0', 256, 54), 35: ('TQ2_0', 256, 66),
+}
+
+KV_BYTES = {'f16': 2.0, 'q8_0': 34 / 32, 'q4_0': 18 / 32} # Per element, by OLLAMA_KV_CACHE_TYPE
+
+class GgufError(ValueError):
+    pass
+
+class SkippedArray:
+    """Placeholder for long metadata arrays (e.g. the tokenizer vocabulary), which are walked but not kept."""
+    def __init__(self, value_type: int, count: int):
+        self.value_type = value_type
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __repr__(self):
+        return f"<array of {self.count}>"
+
+class Tensor:
+    __slots__ = ('name', 'shape', 'type', 'offset')
+
+    def __init__(self, name: str, shape: tuple, type_id: int, offset: int):
+        self.name = name
+        self.shape = shape
+        self.type = type_id
+        self.offset = offset
+
+    @property
+    def type_name(self) -> str:
+        return GGML_TYPES.get(self.type, (f"type{self.type}",))[0]
+
+    @property
+    def elements(self) -> int:
+        n = 1
+        for d in self.shape:
+            n *= d
+        return n
+
+    @property
+    def nbytes(self) -> int:
+        _, block, size = GGML_TYPES.get(self.type, ('', 1, 0))
+        return self.elements // block * size
+
+class GgufInfo:
+    """Header of a GGUF file: metadata key/values and the tensor table, no weights."""
+    def __init__(self, version: int, metadata: dict, tensors: list[Tensor]):
+        self.version = version
+        self.metadata = metadata
+        self.tensors = tensors
+
+    @property
+    def architecture(self) -> str:
+        return self.metadata.get('general.architecture', '')
+
+    def arch_value(self, key: str, default=None):
+        """`<architecture>.<key>`, e.g. arch_value('block_count')."""
+        return self.metadata.get(f"{self.architecture}.{key}", default)
+
+    @property
+    def block_count(self) -> int:
+        return int(self.arch_value('block_count', 0))
+
+    @property
+    def context_length(self) -> int:
+        return int(self.arch_value('context_length', 0))
+
+    @property
+    def embedding_length(self) -> int:
+        return int(self.arch_value('embedding_length', 0))
+
+    @property
+    def head_count(self) -> int:
+        value = self.arch_value('attention.head_count', 0)
+        return int(max(value) if isinstance(value, list) else value)
+
+    @property
+    def head_count_kv(self) -> int:
+        value = self.arch_value('attention.head_count_kv', self.head_count)
+        return int(max(value) if isinstance(value, list) else value)
+
+    @property
+    def vocab_size(self) -> int:
+        tokens = self.metadata.get('tokenizer.ggml.tokens')
+        return len(tokens) if tokens is not None else int(self.arch_value('vocab_size', 0))
+
+    @property
+    def weights_bytes(self) -> int:
+        return sum(t.nbytes for t in self.tensors)
+
+    def quantization(self) -> dict:
+        """{ggml type name: bytes}, largest first."""
+        by_type = {}
+        for t in self.tensors:
+            by_type[t.type_name] = by_type.get(t.type_name, 0) + t.nbytes
+        return dict(sorted(by_type.items(), key=lambda kv: kv[1], reverse=True))
+
+    def layer_bytes(self) -> list[int]:
+        """Weight bytes per repeating block (blk.N.*)."""
+        layers = [0] * self.block_count
+        for t in self.tensors:
+            if t.name.startswith('blk.'):
+                index = int(t.name.split('.', 2)[1])
+                if index < len(layers):
+                    layers[index] += t.nbytes
+        return layers
+
+class _Reader:
+    def __init__(self, buf):
+        self.buf = buf
+        self.pos = 0
+
+    def scalar(self, value_type: int):
+        s = _SCALARS[value_type]
+        value = s.unpack_from(self.buf, self.pos)[0]
+        self.pos += s.size
+        return value
+
+    def u32(self) -> int:
+        value = _U32.unpack_from(self.buf, self.pos)[0]
+        self.pos += 4
+        return value
+
+    def u64(self) -> int:
+        value = _U64.unpack_from(self.buf, self.pos)[0]
+        self.pos += 8
+        return value
+
+    def string(self) -> str:
+        n = self.u64()
+        value = bytes(self.buf[self.pos:self.pos + n]).decode('utf-8', 'replace')
+        self.pos += n
+        return value
+
+    def skip_string(self):
+        self.pos += 8 + _U64.unpack_from(self.buf, self.pos)[0]
+
+    def value(self, value_type: int, max_array: int):
+        if value_type == STRING:
+            return self.string()
+        if value_type == ARRAY:
+            item_type = self.u32()
+            count = self.u64()
+            if count > max_array:
+                if item_type == STRING:
+                    for _ in range(count):
+                        self.skip_string()
+                elif item_type in _SCALARS:
+                    self.pos += count * _SCALARS[item_type].size
+                else:
+                    raise GgufError(f"unsupported nested array type {item_type}")
+                return SkippedArray(item_type, count)
+            return [self.value(item_type, max_array) for _ in range(count)]
+        if value_type not in _SCALARS:
+            raise GgufError(f"unknown metadata type {value_type}")
+        return self.scalar(value_type)
+
+def read_gguf(path: str, max_array: int = 1024) -> GgufInfo:
+    """
+    Parses the header of a GGUF file through a read-only memory map. Only the
+    pages holding metadata and the tensor table are touched; weights are never read.
+    Arrays longer than `max_array` are skipped and kept as SkippedArray.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise GgufError(f"{path} is empty") # mmap cannot map an empty file
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    with mm:
+        if mm[:4] != GGUF_MAGIC:
+            raise GgufError(f"{path} is not a GGUF file")
+        r = _Reader(mm)
+        r.pos = 4
+        version = r.u32()
+        if version == 1:
+            raise GgufError("GGUF v1 files are not supported")
+        try:
+            tensor_count = r.u64()
+            kv_count = r.u64()
+            metadata = {}
+            for _ in range(kv_count):
+                key = r.string()
+                metadata[key] = r.value(r.u32(), max_array)
+            tensors = []
+            for _ in range(tensor_count):
+                name = r.string()
+                n_dims = r.u32()
+                shape = tuple(r.u64() for _ in range(n_dims))
+                tensors.append(Tensor(name, shape, r.u32(), r.u64()))
+        except struct.error as e:
+            raise GgufError(f"truncated GGUF header: {e}") from e
+    return GgufInfo(version, metadata, tensors)
+
+def estimate_vram(info: GgufInfo, num_ctx: int = 4096, gpu_layers: Optional[int] = None,
+                  kv_cache_type: str = 'f16', num_batch: int = 512, flash_attention: bool = False) -> dict:
+    """
+    Predicts VRAM for running `info` with llama.cpp-style offload: the first
+    `gpu_layers` blocks (default all) plus the output layer once every block is
+    offloaded. Returns bytes for weights, KV cache and compute graph, and their total.
+
+    This is an estimate: backend buffers, CUDA context and padding are not modeled.
+    """
+    blocks = info.block_count
+    gpu_layers = blocks + 1 if gpu_layers is None else max(0, min(gpu_layers, blocks + 1))
+    offloaded_blocks = min(gpu_layers, blocks)
+
+    layer_bytes = info.layer_bytes()
+    weights = sum(layer_bytes[:offloaded_blocks])
+    if gpu_layers > blocks:
+        names = {t.name: t for t in info.tensors}
+        # Models with tied embeddings reuse token_embd as the output matrix
+        output = names.get('output.weight') or names.get('token_embd.weight')
+        weights += output.nbytes if output else 0
+        weights += sum(t.nbytes for n, t in names.items() if n.startswith('output_norm'))
+
+    head_count = info.head_count or 1
+    head_dim = info.embedding_length // head_count if info.embedding_length else 0
+    key_length = int(info.arch_value('attention.key_length', head_dim))
+    value_length = int(info.arch_value('attention.value_length', head_dim))
+    kv_per_token_layer = info.head_count_kv * (key_length + value_length) * KV_BYTES.get(kv_cache_type, 2.0)
+    kv_cache = int(num_ctx * offloaded_blocks * kv_per_token_layer)
+
+    graph = 0
+    if gpu_layers:
+        # Logits plus activations for one batch; attention scores are materialized without flash attention
+        graph = 4 * num_batch * (info.vocab_size + 4 * info.embedding_length)
+        if not flash_attention:
+            graph += 4 * num_batch * num_ctx * head_count
+
+    return {
+        'gpu_layers': gpu_layers,
+        'layers': blocks + 1,
+        'weights': weights,
+        'kv_cache': kv_cache,
+        'graph': graph,
+        'total': weights + kv_cache + graph,
+    }
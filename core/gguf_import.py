@@ -0,0 +1,214 @@
+# core/gguf_import.py
+import os
+import json
+import time
+import logging
+import http.client
+from typing import Callable, Optional
+
+import httpx
+
+from core.blob_verify import hash_file
+from core.instrumentation import timings
+from core.sampler import create_http_client, create_raw_connection
+
+logger = logging.getLogger('LMM')
+
+SEND_SLICE = 64 * 1024 * 1024 # Bytes per sendfile() call, between progress updates
+UPLOAD_TIMEOUT = 60 # Seconds without progress before the upload is abandoned
+
+ProgressCallback = Callable[[str, int, int], None] # (phase, done, total); phase is 'hash', 'upload' or a create status
+
+def build_modelfile(digest: str, template: str = "", system: str = "", parameters: Optional[dict] = None) -> str:
+    """A Modelfile that builds a model from an already uploaded blob."""
+    lines = [f"FROM @{digest}"]
+    if template:
+        lines.append(f'TEMPLATE """{template}"""')
+    if system:
+        lines.append(f'SYSTEM """{system}"""')
+    for key, value in (parameters or {}).items():
+        for v in (value if isinstance(value, list) else [value]):
+            lines.append(f"PARAMETER {key} {json.dumps(v) if isinstance(v, str) else v}")
+    return "\n".join(lines) + "\n"
+
+class ImportResult:
+    """Outcome of GgufImporter.import_file()."""
+    def __init__(self, name: str, path: str):
+        self.name = name
+        self.path = path
+        self.digest = ""
+        self.hashed = False # False when the digest came from the cache
+        self.uploaded = False # False when Ollama already had the blob
+        self.modelfile = ""
+        self.duration = 0.0
+        self.error = ""
+
+    @property
+    def ok(self) -> bool:
+        return not self.error
+
+    def __repr__(self):
+        return (f"ImportResult(name={self.name!r}, ok={self.ok}, digest={self.digest[:19]!r}, "
+                f"hashed={self.hashed}, uploaded={self.uploaded}, duration={self.duration:.1f}s, error={self.error!r})")
+
+class GgufImporter:
+    """
+    Imports a local GGUF file as an Ollama model: hash, upload to
+    /api/blobs/<digest>, then /api/create from a generated Modelfile.
+
+    The blob endpoint needs the digest in its URL, so the file is hashed
+    before it is sent. To keep disk reads down, the hash pass is a memory-mapped
+    sequential read, digests are remembered per (path, size, mtime, inode), and
+    the upload is skipped when Ollama already has the blob. The upload itself uses
+    socket.sendfile(), so the kernel copies file pages straight to the socket
+    (usually from the page cache the hash pass just filled) without passing
+    through Python buffers.
+    """
+    def __init__(self, config, state_file: Optional[str] = None):
+        self.config = config
+        self.state_file = state_file
+        self._digests = {} # path -> [size, mtime_ns, inode, digest]
+        self._load()
+
+    def _load(self):
+        if not self.state_file:
+            return
+        try:
+            with open(self.state_file, 'r') as f:
+                self._digests = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.error(f"Ignoring unreadable import digest cache {self.state_file}: {e}")
+
+    def _save(self):
+        if not self.state_file:
+            return
+        tmp_file = f"{self.state_file}.tmp"
+        try:
+            with open(tmp_file, 'w') as f:
+                json.dump(self._digests, f)
+            os.replace(tmp_file, self.state_file)
+        except OSError as e:
+            logger.error(f"Error saving import digest cache: {e}")
+
+    # --- Steps ---
+
+    def file_digest(self, path: str, on_progress: Optional[ProgressCallback] = None) -> tuple[str, bool]:
+        """Returns ('sha256:<hex>', hashed); hashed is False when the cached digest was still valid."""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        fingerprint = [st.st_size, st.st_mtime_ns, st.st_ino]
+        cached = self._digests.get(path)
+        if cached and cached[:3] == fingerprint:
+            return cached[3], False
+
+        with timings.timed('import.hash'):
+            hex_digest = hash_file(path, on_progress=(lambda done: on_progress('hash', done, st.st_size)) if on_progress else None)
+        digest = f"sha256:{hex_digest}"
+        self._digests[path] = fingerprint + [digest]
+        self._save()
+        return digest, True
+
+    def _connection(self) -> tuple[http.client.HTTPConnection, str, dict]:
+        """Raw connection for the upload (httpx cannot hand a file to sendfile)."""
+        return create_raw_connection(self.config.get('api_url'), UPLOAD_TIMEOUT)
+
+    def blob_exists(self, digest: str) -> bool:
+        conn, base_path, headers = self._connection()
+        try:
+            conn.request('HEAD', f"{base_path}/api/blobs/{digest}", headers=headers)
+            response = conn.getresponse()
+            response.read()
+            return response.status == 200
+        finally:
+            conn.close()
+
+    def upload_blob(self, path: str, digest: str, on_progress: Optional[ProgressCallback] = None):
+        """Streams the file to /api/blobs/<digest>. Raises on failure."""
+        size = os.path.getsize(path)
+        conn, base_path, headers = self._connection()
+        try:
+            with timings.timed('import.upload'), open(path, 'rb') as f:
+                conn.putrequest('POST', f"{base_path}/api/blobs/{digest}")
+                for key, value in headers.items():
+                    conn.putheader(key, value)
+                conn.putheader('Content-Type', 'application/octet-stream')
+                conn.putheader('Content-Length', str(size))
+                conn.endheaders()
+                sent = 0
+                while sent < size:
+                    chunk = conn.sock.sendfile(f, offset=sent, count=min(SEND_SLICE, size - sent))
+                    if not chunk:
+                        # The file shrank since it was hashed; the server would wait for the rest forever
+                        raise RuntimeError(f"{path} changed during upload ({sent} of {size} bytes sent)")
+                    sent += chunk
+                    if on_progress:
+                        on_progress('upload', sent, size)
+                response = conn.getresponse()
+                body = response.read().decode('utf-8', 'replace')
+            if response.status not in (200, 201):
+                raise RuntimeError(f"blob upload failed ({response.status}): {body.strip()}")
+        finally:
+            conn.close()
+
+    def create_model(self, name: str, digest: str, filename: str, modelfile: str,
+                     template: str = "", system: str = "", parameters: Optional[dict] = None,
+                     on_progress: Optional[ProgressCallback] = None):
+        """POST /api/create, streaming its status lines. Raises on failure."""
+        api_url = self.config.get('api_url')
+        payload = {
+            'model': name,
+            'files': {filename: digest},
+            'stream': True,
+            # Older servers build from the Modelfile; newer ones use the fields above and below
+            'name': name,
+            'modelfile': modelfile,
+        }
+        if template:
+            payload['template'] = template
+        if system:
+            payload['system'] = system
+        if parameters:
+            payload['parameters'] = parameters
+
+        with create_http_client(api_url, timeout=httpx.Timeout(10, read=None)) as client, \
+                timings.timed('import.create'):
+            with client.stream('POST', f'{api_url}/api/create', json=payload) as response:
+                if response.status_code != 200:
+                    response.read()
+                    raise RuntimeError(f"create failed ({response.status_code}): {response.text.strip()}")
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    status = json.loads(line)
+                    if status.get('error'):
+                        raise RuntimeError(status['error'])
+                    if on_progress:
+                        on_progress(status.get('status', ''), 0, 0)
+
+    # --- Whole flow ---
+
+    def import_file(self, path: str, name: str, template: str = "", system: str = "",
+                    parameters: Optional[dict] = None, on_progress: Optional[ProgressCallback] = None) -> ImportResult:
+        result = ImportResult(name, path)
+        start = time.perf_counter()
+        try:
+            result.digest, result.hashed = self.file_digest(path, on_progress)
+            if self.blob_exists(result.digest):
+                logger.info(f"Ollama already has {result.digest}; skipping upload.")
+            else:
+                self.upload_blob(path, result.digest, on_progress)
+                result.uploaded = True
+            result.modelfile = build_modelfile(result.digest, template, system, parameters)
+            logger.debug(f"Generated Modelfile for {name}:\n{result.modelfile}")
+            self.create_model(name, result.digest, os.path.basename(path), result.modelfile,
+                              template, system, parameters, on_progress)
+        except (OSError, ValueError, RuntimeError, http.client.HTTPException, httpx.HTTPError) as e:
+            result.error = str(e)
+            logger.error(f"Failed to import {path} as {name}: {e}")
+        result.duration = time.perf_counter() - start
+        if result.ok:
+            logger.info(f"Imported {path} as {name} in {result.duration:.1f}s "
+                        f"(hashed={result.hashed}, uploaded={result.uploaded}).")
+        return result
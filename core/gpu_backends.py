@@ -0,0 +1,329 @@
+# core/gpu_backends.py
+import os
+import re
+import logging
+from typing import Optional
+
+try:
+    # Correct import for nvidia-ml-py
+    import pynvml
+    _nvml_available = True
+except ImportError:
+    _nvml_available = False
+    logging.warning("nvidia-ml-py (pynvml) not installed. NVIDIA GPU monitoring will be disabled.")
+except Exception as error: # Catch generic exception during import/init
+    _nvml_available = False
+    logging.warning(f"Failed to import pynvml: {error}. NVIDIA GPU monitoring will be disabled.")
+
+logger = logging.getLogger('LMM')
+
+class GpuBackend:
+    """
+    Interface for GPU telemetry sources used by HardwareMonitor.
+
+    Readers return raw values (bytes, percent, degrees C) or None when the
+    device does not expose them. Methods may raise; HardwareMonitor handles
+    errors per device.
+    """
+    name = "none"
+
+    def init(self) -> bool:
+        """Prepares the backend. Returns False if it cannot be used on this machine."""
+        return False
+
+    def shutdown(self):
+        pass
+
+    def device_count(self) -> int:
+        return 0
+
+    def device_name(self, index: int) -> str:
+        return "N/A"
+
+    def memory(self, index: int) -> Optional[tuple[int, int]]:
+        """Returns (total_bytes, used_bytes)."""
+        return None
+
+    def utilization(self, index: int) -> Optional[int]:
+        return None
+
+    def temperature(self, index: int) -> Optional[int]:
+        return None
+
+    def processes(self, index: int) -> list[tuple[int, int, str]]:
+        """Returns (pid, used_bytes, type) for processes using the device."""
+        return []
+
+    def process_utilization(self, index: int) -> Optional[dict[int, tuple[int, int, int, int]]]:
+        """
+        Returns pid -> (sm, memory, encoder, decoder) percent since the previous
+        call; processes missing from the dict were idle. None when the device
+        cannot report per-process utilization.
+        """
+        return None
+
+class NvmlBackend(GpuBackend):
+    """NVIDIA GPUs through nvidia-ml-py."""
+    name = "nvml"
+
+    def __init__(self):
+        self._handles = []
+        self._sample_timestamps = {} # device index -> newest process utilization sample seen (us)
+        self._no_process_utilization = set() # device indexes that returned NOT_SUPPORTED
+
+    def init(self) -> bool:
+        if not _nvml_available:
+            return False
+        try:
+            pynvml.nvmlInit()
+            count = pynvml.nvmlDeviceGetCount()
+            self._handles = [pynvml.nvmlDeviceGetHandleByIndex(i) for i in range(count)]
+        except pynvml.NVMLError as error:
+            logger.error(f"Failed to initialize NVML: {error}. NVIDIA GPU monitoring disabled.")
+            self.shutdown()
+            return False
+        if not self._handles:
+            # Driver present but no devices; let 'auto' try the next backend
+            logger.info("NVML initialized but found no NVIDIA GPUs.")
+            self.shutdown()
+            return False
+        logger.info(f"NVML initialized. Found {count} NVIDIA GPUs.")
+        return True
+
+    def shutdown(self):
+        try:
+            pynvml.nvmlShutdown()
+        except: pass
+
+    def device_count(self) -> int:
+        return len(self._handles)
+
+    def device_name(self, index: int) -> str:
+        # Name - Decode bytes if necessary
+        raw_name = pynvml.nvmlDeviceGetName(self._handles[index])
+        if isinstance(raw_name, bytes):
+            return raw_name.decode('utf-8')
+        return raw_name
+
+    def memory(self, index: int) -> Optional[tuple[int, int]]:
+        mem_info = pynvml.nvmlDeviceGetMemoryInfo(self._handles[index])
+        return mem_info.total, mem_info.used
+
+    def utilization(self, index: int) -> Optional[int]:
+        try:
+            return pynvml.nvmlDeviceGetUtilizationRates(self._handles[index]).gpu
+        except pynvml.NVMLError:
+            return None
+
+    def temperature(self, index: int) -> Optional[int]:
+        try:
+            return pynvml.nvmlDeviceGetTemperature(self._handles[index], pynvml.NVML_TEMP_GPU)
+        except pynvml.NVMLError:
+            return None
+
+    def processes(self, index: int) -> list[tuple[int, int, str]]:
+        handle = self._handles[index]
+        procs = []
+        for getter, type_name in (
+            (pynvml.nvmlDeviceGetComputeRunningProcesses, "Compute"),
+            (pynvml.nvmlDeviceGetGraphicsRunningProcesses, "Graphics"),
+        ):
+            try:
+                for proc in getter(handle):
+                    procs.append((proc.pid, proc.usedGpuMemory or 0, type_name))
+            except pynvml.NVMLError: pass
+        return procs
+
+    def process_utilization(self, index: int) -> Optional[dict[int, tuple[int, int, int, int]]]:
+        if index in self._no_process_utilization:
+            return None
+        try:
+            # Only samples newer than the last one seen; NVML keeps a short ring buffer per device
+            samples = pynvml.nvmlDeviceGetProcessUtilization(
+                self._handles[index], self._sample_timestamps.get(index, 0)
+            )
+        except pynvml.NVMLError as error:
+            code = getattr(error, 'value', None)
+            if code == pynvml.NVML_ERROR_NOT_FOUND:
+                return {} # No process has run a kernel since the last sample
+            if code == pynvml.NVML_ERROR_NOT_SUPPORTED:
+                logger.info(f"GPU {index} does not report per-process utilization.")
+                self._no_process_utilization.add(index)
+            else:
+                logger.debug(f"Process utilization of GPU {index} unavailable: {error}")
+            return None
+        # Several samples per process when polled slower than NVML samples; average them
+        totals = {}
+        newest = self._sample_timestamps.get(index, 0)
+        for sample in samples:
+            newest = max(newest, sample.timeStamp)
+            total = totals.setdefault(sample.pid, [0, 0, 0, 0, 0])
+            total[0] += sample.smUtil
+            total[1] += sample.memUtil
+            total[2] += sample.encUtil
+            total[3] += sample.decUtil
+            total[4] += 1
+        self._sample_timestamps[index] = newest
+        return {pid: tuple(round(v / t[4]) for v in t[:4]) for pid, t in totals.items()}
+
+class _SysfsCard:
+    """Open file descriptors for one /sys/class/drm/cardN device."""
+    def __init__(self, path: str, name: str, fds: dict):
+        self.path = path
+        self.name = name
+        self.fds = fds # attribute -> fd (missing attributes are absent)
+
+class SysfsBackend(GpuBackend):
+    """
+    AMD (amdgpu) and Intel (i915 / xe) GPUs on Linux via the DRM sysfs tree.
+
+    Attribute files are opened once at init and re-read with os.pread, so a
+    poll costs one syscall per value rather than an open/read/close each.
+    `root` can point at a synthetic tree for tests.
+    """
+    name = "sysfs"
+
+    # attribute -> path relative to cardN/device
+    ATTRIBUTES = {
+        'vram_total': 'mem_info_vram_total',
+        'vram_used': 'mem_info_vram_used',
+        'busy_percent': 'gpu_busy_percent',
+    }
+    SUPPORTED_DRIVERS = ('amdgpu', 'i915', 'xe', 'radeon')
+
+    _CARD_RE = re.compile(r'^card(\d+)$')
+
+    def __init__(self, root: str = "/sys/class/drm"):
+        self.root = root
+        self.cards: list[_SysfsCard] = []
+
+    def _open(self, path: str) -> Optional[int]:
+        try:
+            return os.open(path, os.O_RDONLY)
+        except OSError:
+            return None
+
+    def _read_text(self, path: str) -> Optional[str]:
+        try:
+            with open(path, 'r') as f:
+                return f.read().strip()
+        except OSError:
+            return None
+
+    def _card_name(self, device_dir: str, driver: str) -> str:
+        product = self._read_text(os.path.join(device_dir, 'product_name'))
+        if product:
+            return product
+        pci_id = None
+        uevent = self._read_text(os.path.join(device_dir, 'uevent')) or ""
+        for line in uevent.splitlines():
+            if line.startswith('PCI_ID='):
+                pci_id = line.split('=', 1)[1]
+        vendor = {'amdgpu': 'AMD', 'radeon': 'AMD', 'i915': 'Intel', 'xe': 'Intel'}.get(driver, driver)
+        return f"{vendor} GPU ({pci_id})" if pci_id else f"{vendor} GPU"
+
+    def _temp_path(self, device_dir: str) -> Optional[str]:
+        hwmon_dir = os.path.join(device_dir, 'hwmon')
+        try:
+            entries = sorted(os.listdir(hwmon_dir))
+        except OSError:
+            return None
+        for entry in entries:
+            path = os.path.join(hwmon_dir, entry, 'temp1_input')
+            if os.path.exists(path):
+                return path
+        return None
+
+    def init(self) -> bool:
+        try:
+            entries = sorted(
+                (e for e in os.listdir(self.root) if self._CARD_RE.match(e)),
+                key=lambda e: int(self._CARD_RE.match(e).group(1))
+            )
+        except OSError:
+            return False
+
+        for entry in entries:
+            device_dir = os.path.join(self.root, entry, 'device')
+            driver_link = os.path.join(device_dir, 'driver')
+            driver = os.path.basename(os.path.realpath(driver_link)) if os.path.exists(driver_link) else ""
+            if driver not in self.SUPPORTED_DRIVERS:
+                continue
+
+            fds = {}
+            for attr, filename in self.ATTRIBUTES.items():
+                fd = self._open(os.path.join(device_dir, filename))
+                if fd is not None:
+                    fds[attr] = fd
+            temp_path = self._temp_path(device_dir)
+            if temp_path:
+                fd = self._open(temp_path)
+                if fd is not None:
+                    fds['temp'] = fd
+
+            self.cards.append(_SysfsCard(device_dir, self._card_name(device_dir, driver), fds))
+
+        if self.cards:
+            logger.info(f"DRM sysfs initialized. Found {len(self.cards)} GPUs: {', '.join(c.name for c in self.cards)}")
+        return bool(self.cards)
+
+    def shutdown(self):
+        for card in self.cards:
+            for fd in card.fds.values():
+                try:
+                    os.close(fd)
+                except OSError: pass
+            card.fds = {}
+        self.cards = []
+
+    def _pread_int(self, index: int, attr: str) -> Optional[int]:
+        fd = self.cards[index].fds.get(attr)
+        if fd is None:
+            return None
+        try:
+            return int(os.pread(fd, 32, 0).strip() or 0)
+        except (OSError, ValueError):
+            return None
+
+    def device_count(self) -> int:
+        return len(self.cards)
+
+    def device_name(self, index: int) -> str:
+        return self.cards[index].name
+
+    def memory(self, index: int) -> Optional[tuple[int, int]]:
+        total = self._pread_int(index, 'vram_total')
+        used = self._pread_int(index, 'vram_used')
+        if total is None or used is None:
+            return None
+        return total, used
+
+    def utilization(self, index: int) -> Optional[int]:
+        return self._pread_int(index, 'busy_percent')
+
+    def temperature(self, index: int) -> Optional[int]:
+        millidegrees = self._pread_int(index, 'temp')
+        return millidegrees // 1000 if millidegrees is not None else None
+
+BACKENDS = {
+    'nvml': NvmlBackend,
+    'sysfs': SysfsBackend,
+}
+
+def create_backend(preference: str = "auto") -> GpuBackend:
+    """
+    Returns an initialized backend. 'auto' tries NVML first, then DRM sysfs;
+    falls back to the no-op GpuBackend when nothing is usable.
+    """
+    names = list(BACKENDS) if preference == "auto" else [preference]
+    for name in names:
+        backend_cls = BACKENDS.get(name)
+        if backend_cls is None:
+            if name != "none":
+                logger.warning(f"Unknown GPU backend '{name}'. GPU monitoring disabled.")
+            continue
+        backend = backend_cls()
+        if backend.init():
+            return backend
+    logger.warning("No usable GPU backend found. GPU monitoring disabled.")
+    return GpuBackend()
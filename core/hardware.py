@@ -2,53 +2,48 @@
 import logging
 import psutil
 
-try:
-    # Correct import for nvidia-ml-py
-    import pynvml
-    _nvml_available = True
-except ImportError:
-    _nvml_available = False
-    logging.warning("nvidia-ml-py (pynvml) not installed. GPU monitoring will be disabled.")
-except Exception as error: # Catch generic exception during import/init
-    _nvml_available = False
-    logging.warning(f"Failed to import pynvml: {error}. GPU monitoring will be disabled.")
+from core.instrumentation import timings
+from core.gpu_backends import GpuBackend, NvmlBackend, create_backend
 
 class HardwareMonitor:
-    def __init__(self):
+    def __init__(self, backend: str | GpuBackend = "auto"):
+        """
+        Args:
+            backend: 'auto', 'nvml', 'sysfs', 'none' or a ready GpuBackend instance.
+        """
         self.logger = logging.getLogger('LMM')
-        self.nvml_initialized = False
-        if _nvml_available:
-            try:
-                pynvml.nvmlInit()
-                self.nvml_initialized = True
-                self.device_count = pynvml.nvmlDeviceGetCount()
-                self.logger.info(f"NVML initialized. Found {self.device_count} NVIDIA GPUs.")
-            except pynvml.NVMLError as error:
-                self.logger.error(f"Failed to initialize NVML: {error}. GPU monitoring disabled.")
-                self.nvml_initialized = False
+        if isinstance(backend, GpuBackend):
+            self.backend = backend
         else:
-            self.logger.warning("pynvml not available. GPU monitoring disabled.")
-
-    def get_gpu_processes(self) -> list[dict]:
+            self.backend = create_backend(backend)
+        self.device_count = self.backend.device_count()
+        self.gpu_available = self.device_count > 0
+        self.nvml_initialized = isinstance(self.backend, NvmlBackend)
+        if self.gpu_available:
+            self.logger.info(f"GPU monitoring via '{self.backend.name}' backend ({self.device_count} devices).")
+
+    def get_gpu_processes(self, index: int = 0) -> list[dict]:
         """
-        Retrieves a list of processes currently using the GPU.
+        Retrieves a list of processes currently using the GPU, with their
+        SM / memory / encoder / decoder utilization since the previous call
+        (None where the backend cannot tell).
         """
         processes = []
-        if not self.nvml_initialized:
+        if not self.gpu_available:
             return processes
 
         try:
-            handle = pynvml.nvmlDeviceGetHandleByIndex(0)
-            
-            # Helper to add process
-            def add_procs(procs, type_name):
-                for proc in procs:
-                    if any(p['pid'] == proc.pid for p in processes): continue
+            with timings.timed('gpu.processes'):
+                seen_pids = set()
+                utilization = self.backend.process_utilization(index)
+                for pid, used_bytes, type_name in self.backend.processes(index):
+                    if pid in seen_pids: continue
+                    seen_pids.add(pid)
                     try:
-                        p_obj = psutil.Process(proc.pid)
+                        p_obj = psutil.Process(pid)
                         name = p_obj.name()
                         # Try to get command line for python/powershell to be more specific
-                        if name.lower() in ['python.exe', 'powershell.exe', 'pwsh.exe', 'cmd.exe']:
+                        if name.lower() in ['python.exe', 'python', 'python3', 'powershell.exe', 'pwsh.exe', 'cmd.exe']:
                             try:
                                 cmdline = p_obj.cmdline()
                                 if len(cmdline) > 1:
@@ -57,84 +52,96 @@ class HardwareMonitor:
                             except: pass
                     except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
                         name = "Unknown"
-                    
+
+                    if utilization is None:
+                        sm = mem = enc = dec = None
+                    else:
+                        sm, mem, enc, dec = utilization.get(pid, (0, 0, 0, 0))
                     processes.append({
-                        "pid": proc.pid,
+                        "pid": pid,
                         "name": name,
-                        "vram_used_mb": int(proc.usedGpuMemory / (1024**2)) if proc.usedGpuMemory else 0,
-                        "type": type_name
+                        "vram_used_mb": int(used_bytes / (1024**2)) if used_bytes else 0,
+                        "vram_used_bytes": used_bytes,
+                        "type": type_name,
+                        "sm_util_pct": sm,
+                        "mem_util_pct": mem,
+                        "enc_util_pct": enc,
+                        "dec_util_pct": dec
                     })
 
-            try:
-                add_procs(pynvml.nvmlDeviceGetComputeRunningProcesses(handle), "Compute")
-            except pynvml.NVMLError: pass
-
-            try:
-                add_procs(pynvml.nvmlDeviceGetGraphicsRunningProcesses(handle), "Graphics")
-            except pynvml.NVMLError: pass
-
         except Exception as e:
             self.logger.error(f"Error getting GPU processes: {e}")
 
         return processes
 
-    def get_gpu_info(self) -> dict:
+    def get_gpu_info(self, index: int = 0) -> dict:
         """
         Retrieves GPU information including Temp and decoded Name.
+        Display strings are paired with raw numeric fields (None when unknown)
+        for consumers such as the metrics exporter.
         """
         info = {
+            "index": index,
             "vram_total": "N/A",
             "vram_used": "N/A",
             "vram_free": "N/A",
             "gpu_utilization": "N/A",
             "temperature": "N/A",
             "name": "N/A",
+            "vram_total_bytes": None,
+            "vram_used_bytes": None,
+            "gpu_utilization_pct": None,
+            "temperature_c": None,
             "processes": []
         }
 
-        if not self.nvml_initialized:
+        if not self.gpu_available:
             return info
 
         try:
-            handle = pynvml.nvmlDeviceGetHandleByIndex(0)
-            
-            # Name - Decode bytes if necessary
-            raw_name = pynvml.nvmlDeviceGetName(handle)
-            if isinstance(raw_name, bytes):
-                info["name"] = raw_name.decode('utf-8')
-            else:
-                info["name"] = raw_name
-
-            # Memory
-            mem_info = pynvml.nvmlDeviceGetMemoryInfo(handle)
-            info["vram_total"] = f"{mem_info.total / (1024**3):.2f} GB"
-            info["vram_used"] = f"{mem_info.used / (1024**3):.2f} GB"
-            info["vram_free"] = f"{mem_info.free / (1024**3):.2f} GB"
-
-            # Utilization
-            try:
-                utilization = pynvml.nvmlDeviceGetUtilizationRates(handle)
-                info["gpu_utilization"] = f"{utilization.gpu}%"
-            except pynvml.NVMLError:
-                info["gpu_utilization"] = "N/A"
-
-            # Temperature
-            try:
-                temp = pynvml.nvmlDeviceGetTemperature(handle, pynvml.NVML_TEMP_GPU)
-                info["temperature"] = f"{temp} C"
-            except pynvml.NVMLError:
-                info["temperature"] = "N/A"
+            with timings.timed('gpu.device'):
+                info["name"] = self.backend.device_name(index)
+
+                # Memory
+                memory = self.backend.memory(index)
+                if memory is not None:
+                    total, used = memory
+                    info["vram_total"] = f"{total / (1024**3):.2f} GB"
+                    info["vram_used"] = f"{used / (1024**3):.2f} GB"
+                    info["vram_free"] = f"{(total - used) / (1024**3):.2f} GB"
+                    info["vram_total_bytes"] = total
+                    info["vram_used_bytes"] = used
+
+                # Utilization
+                utilization = self.backend.utilization(index)
+                if utilization is not None:
+                    info["gpu_utilization"] = f"{utilization}%"
+                    info["gpu_utilization_pct"] = utilization
+
+                # Temperature
+                temp = self.backend.temperature(index)
+                if temp is not None:
+                    info["temperature"] = f"{temp} C"
+                    info["temperature_c"] = temp
 
             # Processes
-            info["processes"] = self.get_gpu_processes()
+            info["processes"] = self.get_gpu_processes(index)
 
         except Exception as e:
             self.logger.error(f"Unexpected error in get_gpu_info: {e}")
-        
+
         return info
 
+    def get_all_gpu_info(self) -> list[dict]:
+        """
+        Retrieves get_gpu_info() for every detected device.
+        Returns a single placeholder entry when no GPU backend is available.
+        """
+        if not self.gpu_available:
+            return [self.get_gpu_info(0)]
+        return [self.get_gpu_info(i) for i in range(self.device_count)]
+
     def __del__(self):
-        if self.nvml_initialized:
-            try:
-                pynvml.nvmlShutdown()
-            except: pass
\ No newline at end of file
+        try:
+            self.backend.shutdown()
+        except: pass
@@ -0,0 +1,106 @@
+# core/health.py
+import time
+import socket
+import logging
+import threading
+from typing import Callable, Optional
+from urllib.parse import urlparse
+
+logger = logging.getLogger('LMM')
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+PORT_PROBE_TIMEOUT = 0.25 # Seconds; a stopped local server refuses at once
+
+def port_open(api_url: str, timeout: float = PORT_PROBE_TIMEOUT) -> bool:
+    """Whether a TCP connection to the API's host and port is accepted (says nothing about the server answering)."""
+    parsed = urlparse(api_url)
+    port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+    try:
+        with socket.create_connection((parsed.hostname or 'localhost', port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+class CircuitBreaker:
+    """
+    Health state of one upstream, so callers fail fast while it is down.
+
+    Closed: every call goes through. After `threshold` consecutive failures
+    the circuit opens and calls are refused without touching the network.
+    While open, one trial call (half-open) is let through after `backoff`
+    seconds, doubling up to `max_backoff` after each failed trial. A
+    `quick_check` passed to allow() - e.g. a TCP connect to a server that was
+    refusing connections - lets the trial through early, so a restarted
+    server is picked up on the next poll rather than after the backoff.
+    A success closes the circuit.
+    """
+    def __init__(self, name: str, threshold: int = 3, backoff: float = 1.0, max_backoff: float = 30.0):
+        self.name = name
+        self.threshold = max(1, threshold)
+        self.base_backoff = backoff
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0 # Consecutive
+        self.backoff = backoff
+        self.retry_at = 0.0 # Monotonic time of the next trial while open
+        self.last_error = ""
+        self.last_success = 0.0 # Wall-clock time
+        self.refused = False # Last failure was a refused connection; quick checks can detect recovery
+
+    def allow(self, quick_check: Optional[Callable[[], bool]] = None) -> bool:
+        """Whether to make the call now. A True while not closed is the single trial; report its outcome."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN:
+                return False # Another thread's trial is in flight
+            due = time.monotonic() >= self.retry_at
+            refused = self.refused
+        if not due and not (quick_check and refused and quick_check()):
+            return False
+        with self._lock:
+            if self.state != OPEN:
+                return False
+            self.state = HALF_OPEN
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                down_for = f" after {self.failures} failed attempts" if self.failures else ""
+                logger.info(f"{self.name} is reachable again{down_for}")
+            self.state = CLOSED
+            self.failures = 0
+            self.backoff = self.base_backoff
+            self.refused = False
+            self.last_success = time.time()
+
+    def record_failure(self, error: str, refused: bool = False):
+        with self._lock:
+            self.failures += 1
+            self.last_error = error
+            self.refused = refused
+            if self.state == HALF_OPEN:
+                self.backoff = min(self.backoff * 2, self.max_backoff)
+            elif self.state == CLOSED and self.failures >= self.threshold:
+                logger.warning(f"{self.name} unreachable ({error}); failing fast, retrying every "
+                               f"{self.base_backoff:.0f}-{self.max_backoff:.0f} s")
+            else:
+                return
+            self.state = OPEN
+            self.retry_at = time.monotonic() + self.backoff
+
+    def reset(self):
+        """Back to closed, e.g. after the upstream's address changed."""
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self.backoff = self.base_backoff
+            self.refused = False
+
+    def status(self) -> dict:
+        with self._lock:
+            retry_in = max(0.0, self.retry_at - time.monotonic()) if self.state == OPEN else 0.0
+            return {'state': self.state, 'failures': self.failures, 'last_error': self.last_error,
+                    'retry_in': retry_in, 'last_success': self.last_success}
@@ -0,0 +1,207 @@
+# core/inference_bench.py
+import os
+import json
+import time
+import logging
+import platform
+import threading
+import statistics
+from typing import Callable, Optional
+
+import httpx
+
+from core.instrumentation import timings
+from core.sampler import create_http_client
+
+logger = logging.getLogger('LMM')
+
+DEFAULT_PROMPTS = [
+    "Write one sentence about the ocean.",
+    "Explain in a short paragraph how a hash table handles collisions.",
+    "Summarize the plot of a detective story in which the narrator turns out to be the culprit, "
+    "then list three clues a careful reader could have noticed, each with a one-line explanation.",
+]
+DEFAULT_NUM_PREDICT = 128
+UNLOAD_TIMEOUT = 30 # Seconds
+LOAD_TIMEOUT = 600 # Seconds before the first token; a cold load of a large model can take minutes
+
+ProgressCallback = Callable[[str, int, int], None] # (model, run done, runs total)
+
+def hardware_key(gpus: list[dict]) -> str:
+    """Identifies the machine a result was measured on: GPU models and VRAM, then CPU."""
+    parts = []
+    for gpu in gpus:
+        if gpu.get('name') not in (None, 'N/A'):
+            total = gpu.get('vram_total_bytes')
+            parts.append(f"{gpu['name']} {total / (1024**3):.0f}GB" if total else gpu['name'])
+    parts.append(f"{platform.processor() or platform.machine()} x{os.cpu_count()}")
+    return " + ".join(parts)
+
+def _rate(count: int, duration_ns: int) -> Optional[float]:
+    return count / (duration_ns / 1e9) if count and duration_ns else None
+
+def _median(values) -> Optional[float]:
+    values = [v for v in values if v is not None]
+    return statistics.median(values) if values else None
+
+class InferenceBenchmark:
+    """
+    Measures models through streamed /api/generate calls.
+
+    Each model is unloaded first, so the first prompt measures a cold load
+    (`load_duration`); the remaining runs go through every prompt against the
+    loaded model. Time to first token is wall-clock from sending the request
+    to the first generated text; prompt and generation speeds come from the
+    `prompt_eval_*` and `eval_*` counters of the final chunk. Results are kept
+    per model digest and hardware, so a re-tagged model shares its numbers
+    and results from another GPU are never mixed in.
+    """
+    def __init__(self, config, results_file: Optional[str] = None):
+        self.config = config
+        self.results_file = results_file or os.path.join(
+            os.path.dirname(config.settings_file), 'inference_benchmarks.json'
+        )
+        self._results = {} # digest -> {hardware key: result}
+        self._cancel = threading.Event()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.results_file, 'r') as f:
+                self._results = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.error(f"Ignoring unreadable benchmark results {self.results_file}: {e}")
+
+    def _save(self):
+        tmp_file = f"{self.results_file}.tmp"
+        try:
+            with open(tmp_file, 'w') as f:
+                json.dump(self._results, f, indent=1)
+            os.replace(tmp_file, self.results_file)
+        except OSError as e:
+            logger.error(f"Error saving benchmark results: {e}")
+
+    def results_for(self, digest: str) -> dict:
+        """{hardware key: result} for a model digest."""
+        return self._results.get(digest, {})
+
+    def cancel(self):
+        """Stops after the current prompt."""
+        self._cancel.set()
+
+    # --- Requests ---
+
+    def _unload(self, client: httpx.Client, api_url: str, name: str):
+        """Unloads the model so the first run is cold. A keep_alive 0 request for a model that is not loaded would load it first."""
+        response = client.get(f'{api_url}/api/ps', timeout=UNLOAD_TIMEOUT)
+        response.raise_for_status()
+        if not any(name in (m.get('name'), m.get('model')) for m in response.json().get('models') or []):
+            return
+        response = client.post(f'{api_url}/api/generate', json={'model': name, 'keep_alive': 0},
+                               timeout=UNLOAD_TIMEOUT)
+        response.raise_for_status()
+
+    def _generate(self, client: httpx.Client, api_url: str, name: str, prompt: str, num_predict: int) -> dict:
+        """One streamed generation; returns its timings. Raises on HTTP or API errors."""
+        payload = {
+            'model': name,
+            'prompt': prompt,
+            'stream': True,
+            # Fixed seed and temperature so every run generates comparable text
+            'options': {'num_predict': num_predict, 'temperature': 0, 'seed': 0},
+        }
+        start = time.perf_counter()
+        ttft = None
+        final = {}
+        with client.stream('POST', f'{api_url}/api/generate', json=payload) as response:
+            if response.status_code != 200:
+                response.read()
+                raise RuntimeError(f"generate failed ({response.status_code}): {response.text.strip()}")
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get('error'):
+                    raise RuntimeError(chunk['error'])
+                if ttft is None and (chunk.get('response') or chunk.get('thinking')):
+                    ttft = time.perf_counter() - start
+                if chunk.get('done'):
+                    final = chunk
+        return {
+            'wall_time': time.perf_counter() - start,
+            'ttft': ttft,
+            'load_time': final.get('load_duration', 0) / 1e9,
+            'prompt_tokens': final.get('prompt_eval_count', 0),
+            'prompt_tps': _rate(final.get('prompt_eval_count', 0), final.get('prompt_eval_duration', 0)),
+            'eval_tokens': final.get('eval_count', 0),
+            'eval_tps': _rate(final.get('eval_count', 0), final.get('eval_duration', 0)),
+        }
+
+    # --- Runs ---
+
+    def run(self, name: str, digest: str, hardware: str, prompts: Optional[list[str]] = None,
+            num_predict: int = DEFAULT_NUM_PREDICT, on_progress: Optional[ProgressCallback] = None) -> dict:
+        """
+        Benchmarks one model and stores the result under (digest, hardware).
+        Returns the result; it has an 'error' entry if the run failed or was cancelled.
+        """
+        prompts = prompts or DEFAULT_PROMPTS
+        api_url = self.config.get('api_url')
+        result = {'model': name, 'digest': digest, 'hardware': hardware, 'timestamp': time.time(),
+                  'prompts': len(prompts), 'num_predict': num_predict, 'runs': [], 'error': ''}
+        total = len(prompts) + 1
+        timeout = httpx.Timeout(10, read=LOAD_TIMEOUT)
+        try:
+            with create_http_client(api_url, timeout=timeout) as client, timings.timed('bench.model'):
+                self._unload(client, api_url, name)
+                # Cold run on the first prompt, then every prompt warm. Each run gets its own
+                # prefix so Ollama's prompt cache never serves a warm run from the one before.
+                for i, prompt in enumerate([prompts[0]] + prompts):
+                    if self._cancel.is_set():
+                        result['error'] = "Cancelled"
+                        break
+                    run = self._generate(client, api_url, name, f"[Run {i + 1}] {prompt}", num_predict)
+                    run['cold'] = i == 0
+                    result['runs'].append(run)
+                    if on_progress:
+                        on_progress(name, i + 1, total)
+        except (httpx.HTTPError, ValueError, RuntimeError) as e:
+            result['error'] = str(e)
+            logger.error(f"Benchmark of {name} failed: {e}")
+
+        cold = [r for r in result['runs'] if r['cold']]
+        warm = [r for r in result['runs'] if not r['cold']]
+        result.update(
+            load_time=cold[0]['load_time'] if cold else None,
+            cold_ttft=cold[0]['ttft'] if cold else None,
+            ttft=_median(r['ttft'] for r in warm),
+            prompt_tps=_median(r['prompt_tps'] for r in warm),
+            eval_tps=_median(r['eval_tps'] for r in warm),
+        )
+        if not result['error']:
+            self._results.setdefault(digest, {})[hardware] = result
+            self._save()
+            logger.info(f"Benchmarked {name}: {format_result(result)}")
+        return result
+
+    def run_many(self, models: list[tuple[str, str]], hardware: str, prompts: Optional[list[str]] = None,
+                 num_predict: int = DEFAULT_NUM_PREDICT, on_progress: Optional[ProgressCallback] = None) -> list[dict]:
+        """Benchmarks (name, digest) pairs one after another; models never share the GPU during a run."""
+        self._cancel.clear()
+        results = []
+        for name, digest in models:
+            if self._cancel.is_set():
+                break
+            results.append(self.run(name, digest, hardware, prompts, num_predict, on_progress))
+        return results
+
+def format_result(result: dict) -> str:
+    """One-line summary of a benchmark result."""
+    def fmt(value, spec, unit):
+        return f"{value:{spec}}{unit}" if value is not None else "?"
+    return (f"load {fmt(result.get('load_time'), '.2f', ' s')}, "
+            f"TTFT {fmt(result.get('ttft') and result['ttft'] * 1000, '.0f', ' ms')}, "
+            f"prompt {fmt(result.get('prompt_tps'), '.0f', ' tok/s')}, "
+            f"generation {fmt(result.get('eval_tps'), '.1f', ' tok/s')}")
@@ -0,0 +1,138 @@
+# core/instrumentation.py
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import nullcontext
+
+logger = logging.getLogger('LMM')
+
+DEFAULT_WINDOW = 256 # Samples kept per stage for percentiles
+
+_NULL_TIMER = nullcontext()
+
+class _StageTimer:
+    __slots__ = ('registry', 'name', 'start')
+
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.record(self.name, time.perf_counter() - self.start)
+        if exc_type is not None:
+            self.registry.note_error(self.name, f"{exc_type.__name__}: {exc}")
+        return False
+
+class _StageStats:
+    __slots__ = ('count', 'last', 'samples', 'errors', 'last_error')
+
+    def __init__(self, window):
+        self.count = 0
+        self.last = 0.0
+        self.samples = deque(maxlen=window)
+        self.errors = 0
+        self.last_error = ""
+
+class TimingRegistry:
+    """
+    Collects durations for named stages (sampling stages, Ollama / CLI calls).
+
+    Keeps count, last value and a rolling window per stage; percentiles are
+    only computed when `stats()` is read. When disabled, `timed()` returns a
+    shared no-op context manager and `record()` returns immediately.
+    """
+    def __init__(self, window: int = DEFAULT_WINDOW, enabled: bool = False):
+        self.window = window
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def timed(self, name: str):
+        """Context manager timing the enclosed block as stage `name`."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _StageTimer(self, name)
+
+    def _stage(self, name):
+        stage = self._stages.get(name)
+        if stage is None:
+            stage = self._stages[name] = _StageStats(self.window)
+        return stage
+
+    def record(self, name: str, seconds: float):
+        if not self.enabled:
+            return
+        with self._lock:
+            stage = self._stage(name)
+            stage.count += 1
+            stage.last = seconds
+            stage.samples.append(seconds)
+
+    def note_error(self, name: str, message: str):
+        """Counts a failure for a stage (including errors the caller swallowed)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            stage = self._stage(name)
+            stage.errors += 1
+            stage.last_error = message
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+
+    def stats(self) -> dict:
+        """
+        Returns {stage: {count, last, p50, p95, max, errors, last_error}} in seconds.
+        """
+        with self._lock:
+            raw = {
+                name: (s.count, s.last, list(s.samples), s.errors, s.last_error)
+                for name, s in self._stages.items()
+            }
+
+        result = {}
+        for name, (count, last, samples, errors, last_error) in sorted(raw.items()):
+            samples.sort()
+            n = len(samples)
+            result[name] = {
+                'count': count,
+                'last': last,
+                'p50': samples[int(0.50 * (n - 1))] if n else 0.0,
+                'p95': samples[int(0.95 * (n - 1))] if n else 0.0,
+                'max': samples[-1] if n else 0.0,
+                'errors': errors,
+                'last_error': last_error,
+            }
+        return result
+
+    def log_summary(self):
+        """Writes the current stats table to the LMM log."""
+        stats = self.stats()
+        if not stats:
+            logger.info(f"Timing diagnostics: no samples recorded (timing enabled: {self.enabled}).")
+            return
+        logger.info(f"Timing diagnostics ({self.window}-sample window, ms):")
+        for name, s in stats.items():
+            logger.info(
+                f"  {name:<24} count={s['count']:<6} last={s['last']*1000:8.2f} "
+                f"p50={s['p50']*1000:8.2f} p95={s['p95']*1000:8.2f} max={s['max']*1000:8.2f} "
+                f"errors={s['errors']}" + (f" last_error={s['last_error']}" if s['last_error'] else "")
+            )
+
+# Shared registry used across core modules and the Diagnostics tab
+timings = TimingRegistry()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    timings.enabled = True
+    for i in range(20):
+        with timings.timed('demo.sleep'):
+            time.sleep(0.001 * (i % 5))
+    timings.note_error('demo.sleep', "example failure")
+    timings.log_summary()
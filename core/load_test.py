@@ -0,0 +1,313 @@
+# core/load_test.py
+import json
+import time
+import queue
+import random
+import logging
+import threading
+import statistics
+from typing import Callable, Optional
+
+import httpx
+
+from core.instrumentation import timings
+from core.sampler import create_http_client
+
+logger = logging.getLogger('LMM')
+
+PROMPT_WORDS = {'short': 32, 'medium': 512, 'long': 2048}
+DEFAULT_MIX = {'short': 0.5, 'medium': 0.35, 'long': 0.15}
+DEFAULT_NUM_PREDICT = 128
+SWEEP_LEVELS = (1, 2, 4, 8)
+GPU_SAMPLE_INTERVAL = 0.5 # Seconds
+REQUEST_TIMEOUT = 600 # Seconds; queued requests on a busy server can wait minutes
+
+_FILLER = ("the quick brown fox jumps over the lazy dog while a patient engineer measures "
+           "latency under load and writes down every number twice").split()
+
+ProgressCallback = Callable[[int, int, float], None] # (requests done, errors, seconds elapsed)
+
+def make_prompt(words: int, rng: random.Random) -> str:
+    """A prompt of about `words` words with a random prefix, so Ollama's prompt cache never hits."""
+    body = " ".join(_FILLER[i % len(_FILLER)] for i in range(words))
+    return f"[{rng.getrandbits(64):016x}] Continue this text: {body}"
+
+def percentile(values: list, q: float) -> Optional[float]:
+    """Nearest-rank percentile, as the Diagnostics tab computes them; None for no samples."""
+    values = sorted(v for v in values if v is not None)
+    return values[int(q * (len(values) - 1))] if values else None
+
+class LoadReport:
+    """Per-request records and GPU samples from one load test run."""
+    def __init__(self, mode: str, concurrency: int, rate: Optional[float]):
+        self.mode = mode
+        self.concurrency = concurrency
+        self.rate = rate
+        self.requests = [] # One dict per finished request
+        self.gpu_samples = [] # (seconds since start, VRAM used bytes, utilization %)
+        self.unsent = 0 # Open loop: arrivals still queued when the run ended
+        self.elapsed = 0.0
+        self.cancelled = False
+
+    def summary(self) -> dict:
+        done = [r for r in self.requests if not r['error']]
+        errors = len(self.requests) - len(done)
+        elapsed = self.elapsed or 1e-9
+
+        def pcts(key, qs=(0.5, 0.9, 0.99)):
+            values = [r[key] for r in done]
+            return {f"p{int(q * 100)}": percentile(values, q) for q in qs}
+
+        per_model = {}
+        for r in self.requests:
+            m = per_model.setdefault(r['model'], {'requests': 0, 'errors': 0, 'ttft': [], 'eval_tps': []})
+            m['requests'] += 1
+            m['errors'] += bool(r['error'])
+            if not r['error']:
+                m['ttft'].append(r['ttft'])
+                m['eval_tps'].append(r['eval_tps'])
+        for m in per_model.values():
+            m['ttft_p50'] = percentile(m.pop('ttft'), 0.5)
+            m['eval_tps_p50'] = percentile(m.pop('eval_tps'), 0.5)
+
+        vram = [s[1] for s in self.gpu_samples if s[1] is not None]
+        util = [s[2] for s in self.gpu_samples if s[2] is not None]
+        return {
+            'mode': self.mode,
+            'concurrency': self.concurrency,
+            'rate': self.rate,
+            'elapsed': self.elapsed,
+            'requests': len(self.requests),
+            'errors': errors,
+            'error_rate': errors / len(self.requests) if self.requests else 0.0,
+            'unsent': self.unsent,
+            'throughput': len(done) / elapsed, # Requests per second
+            'tokens_per_s': sum(r['eval_count'] for r in done) / elapsed, # Generated, all clients together
+            'latency': pcts('latency'),
+            'ttft': pcts('ttft'),
+            'queue': pcts('queue', (0.5, 0.9)), # Server-side wait for a free slot
+            'client_wait': pcts('client_wait', (0.5, 0.9)), # Open loop: wait for a free client
+            'per_model': per_model,
+            'vram_peak': max(vram) if vram else None,
+            'vram_mean': statistics.fmean(vram) if vram else None,
+            'util_mean': statistics.fmean(util) if util else None,
+            'util_peak': max(util) if util else None,
+            'cancelled': self.cancelled,
+        }
+
+class LoadTester:
+    """
+    Drives the configured Ollama API with concurrent streaming /api/generate clients.
+
+    Closed loop: `concurrency` clients each send their next request as soon as
+    the previous one finishes, which measures capacity. Open loop: requests
+    arrive at `rate` per second (Poisson) whatever the server does, and
+    `concurrency` clients serve them; arrivals that find every client busy
+    wait, which shows up as `client_wait`. Queueing inside Ollama (requests
+    beyond OLLAMA_NUM_PARALLEL) is the part of `total_duration` not spent
+    loading, evaluating the prompt or generating.
+
+    GPUs are sampled through the HardwareMonitor during the run, so
+    throughput can be read against VRAM and utilization.
+    """
+    def __init__(self, config, hardware_monitor=None):
+        self.config = config
+        self.hardware_monitor = hardware_monitor
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        """Stops sending; requests in flight finish."""
+        self._cancel.set()
+
+    def _request(self, client: httpx.Client, api_url: str, model: str, size: str, prompt: str,
+                 num_predict: int) -> dict:
+        record = {'model': model, 'size': size, 'ttft': None, 'latency': None, 'queue': None,
+                  'eval_count': 0, 'eval_tps': None, 'client_wait': 0.0, 'error': ''}
+        payload = {'model': model, 'prompt': prompt, 'stream': True, 'options': {'num_predict': num_predict}}
+        start = time.perf_counter()
+        final = {}
+        try:
+            with timings.timed('loadtest.request'), \
+                    client.stream('POST', f'{api_url}/api/generate', json=payload) as response:
+                if response.status_code != 200:
+                    response.read()
+                    raise RuntimeError(f"HTTP {response.status_code}: {response.text.strip()[:200]}")
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get('error'):
+                        raise RuntimeError(chunk['error'])
+                    if record['ttft'] is None and (chunk.get('response') or chunk.get('thinking')):
+                        record['ttft'] = time.perf_counter() - start
+                    if chunk.get('done'):
+                        final = chunk
+        except (httpx.HTTPError, ValueError, RuntimeError) as e:
+            record['error'] = str(e) or type(e).__name__
+        record['latency'] = time.perf_counter() - start
+        if final:
+            ns = {k: final.get(k, 0) / 1e9 for k in ('total_duration', 'load_duration',
+                                                      'prompt_eval_duration', 'eval_duration')}
+            record['queue'] = max(0.0, ns['total_duration'] - ns['load_duration']
+                                  - ns['prompt_eval_duration'] - ns['eval_duration'])
+            record['eval_count'] = final.get('eval_count', 0)
+            if ns['eval_duration']:
+                record['eval_tps'] = record['eval_count'] / ns['eval_duration']
+        return record
+
+    def _sample_gpus(self, report: LoadReport, start: float, stop: threading.Event):
+        while not stop.is_set():
+            try:
+                gpus = self.hardware_monitor.get_all_gpu_info()
+            except Exception as e:
+                logger.debug(f"Load test GPU sample failed: {e}")
+                gpus = []
+            vram = [g['vram_used_bytes'] for g in gpus if g.get('vram_used_bytes') is not None]
+            util = [g['gpu_utilization_pct'] for g in gpus if g.get('gpu_utilization_pct') is not None]
+            report.gpu_samples.append((time.perf_counter() - start, sum(vram) if vram else None,
+                                       max(util) if util else None))
+            stop.wait(GPU_SAMPLE_INTERVAL)
+
+    def run(self, models: list[str], concurrency: int = 4, duration: float = 60.0, mode: str = 'closed',
+            rate: Optional[float] = None, mix: Optional[dict] = None, num_predict: int = DEFAULT_NUM_PREDICT,
+            seed: int = 0, on_progress: Optional[ProgressCallback] = None) -> LoadReport:
+        """
+        Runs for `duration` seconds and returns the report. `models` are picked
+        uniformly per request and prompt sizes by the `mix` weights
+        ({'short', 'medium', 'long'} -> weight). Open loop needs `rate`.
+        """
+        if not models:
+            raise ValueError("no models to test")
+        if mode == 'open' and not rate:
+            raise ValueError("open-loop mode needs a request rate")
+        mix = mix or DEFAULT_MIX
+        sizes, weights = list(mix), list(mix.values())
+        api_url = self.config.get('api_url')
+        report = LoadReport(mode, concurrency, rate if mode == 'open' else None)
+        self._cancel.clear()
+        lock = threading.Lock()
+        stop_sampling = threading.Event()
+        arrivals = queue.Queue()
+        start = time.perf_counter()
+        deadline = start + duration
+
+        def finish(record):
+            with lock:
+                report.requests.append(record)
+                done = len(report.requests)
+                errors = sum(1 for r in report.requests if r['error'])
+            if on_progress:
+                on_progress(done, errors, time.perf_counter() - start)
+
+        def next_request(rng):
+            size = rng.choices(sizes, weights)[0]
+            return rng.choice(models), size, make_prompt(PROMPT_WORDS[size], rng)
+
+        def closed_worker(index):
+            rng = random.Random(seed * 1000 + index)
+            while time.perf_counter() < deadline and not self._cancel.is_set():
+                finish(self._request(client, api_url, *next_request(rng), num_predict))
+
+        def open_worker(index):
+            rng = random.Random(seed * 1000 + index)
+            while True:
+                arrival = arrivals.get()
+                if arrival is None or self._cancel.is_set():
+                    return
+                wait = time.perf_counter() - arrival
+                record = self._request(client, api_url, *next_request(rng), num_predict)
+                record['client_wait'] = wait
+                finish(record)
+
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        timeout = httpx.Timeout(10, read=REQUEST_TIMEOUT)
+        with create_http_client(api_url, timeout=timeout, limits=limits) as client:
+            sampler = None
+            if self.hardware_monitor is not None:
+                sampler = threading.Thread(target=self._sample_gpus, args=(report, start, stop_sampling),
+                                           name='lmm-loadtest-gpu', daemon=True)
+                sampler.start()
+            target = open_worker if mode == 'open' else closed_worker
+            workers = [threading.Thread(target=target, args=(i,), name=f'lmm-loadtest-{i}', daemon=True)
+                       for i in range(concurrency)]
+            for w in workers:
+                w.start()
+
+            if mode == 'open':
+                rng = random.Random(seed)
+                next_arrival = start
+                while not self._cancel.is_set():
+                    next_arrival += rng.expovariate(rate)
+                    if next_arrival >= deadline:
+                        break
+                    self._cancel.wait(max(0.0, next_arrival - time.perf_counter()))
+                    arrivals.put(next_arrival)
+                report.unsent = arrivals.qsize()
+                # Drop the backlog; requests already taken by a client finish
+                while True:
+                    try:
+                        arrivals.get_nowait()
+                    except queue.Empty:
+                        break
+                for _ in workers:
+                    arrivals.put(None)
+
+            for w in workers:
+                w.join()
+            stop_sampling.set()
+            if sampler:
+                sampler.join()
+
+        report.elapsed = time.perf_counter() - start
+        report.cancelled = self._cancel.is_set()
+        logger.info(f"Load test finished: {format_summary(report.summary())}")
+        return report
+
+    def sweep(self, models: list[str], levels=SWEEP_LEVELS, duration: float = 30.0,
+              on_level: Optional[Callable[[dict], None]] = None, **kwargs) -> list[dict]:
+        """Closed-loop runs at each concurrency level; returns their summaries."""
+        summaries = []
+        for level in levels:
+            if summaries and self._cancel.is_set():
+                break
+            summary = self.run(models, concurrency=level, duration=duration, mode='closed', **kwargs).summary()
+            summaries.append(summary)
+            if on_level:
+                on_level(summary)
+        return summaries
+
+def suggest_parallel(summaries: list[dict], ttft_target: Optional[float] = None,
+                     saturation: float = 0.9) -> Optional[int]:
+    """
+    Smallest concurrency reaching `saturation` of the best aggregate tokens/s
+    with no errors (and p90 TTFT within `ttft_target` seconds, if given): a
+    starting point for OLLAMA_NUM_PARALLEL. None if no level qualifies.
+    """
+    ok = [s for s in summaries if not s['errors'] and not s['cancelled']
+          and (ttft_target is None or (s['ttft']['p90'] or 0) <= ttft_target)]
+    if not ok:
+        return None
+    best = max(s['tokens_per_s'] for s in ok)
+    return min(s['concurrency'] for s in ok if s['tokens_per_s'] >= saturation * best)
+
+def format_summary(s: dict) -> str:
+    """Multi-line text for a LoadReport summary."""
+    def ms(value):
+        return f"{value * 1000:.0f}" if value is not None else "?"
+
+    mode = f"open loop, {s['rate']:g} req/s" if s['mode'] == 'open' else "closed loop"
+    lines = [
+        f"{s['concurrency']} clients, {mode}, {s['elapsed']:.0f} s{' (cancelled)' if s['cancelled'] else ''}",
+        f"{s['requests']} requests, {s['errors']} errors ({s['error_rate']:.1%}), "
+        f"{s['throughput']:.2f} req/s, {s['tokens_per_s']:.1f} tok/s generated",
+        f"Latency p50/p90/p99: {ms(s['latency']['p50'])} / {ms(s['latency']['p90'])} / {ms(s['latency']['p99'])} ms",
+        f"TTFT p50/p90/p99: {ms(s['ttft']['p50'])} / {ms(s['ttft']['p90'])} / {ms(s['ttft']['p99'])} ms",
+        f"Server queue p50/p90: {ms(s['queue']['p50'])} / {ms(s['queue']['p90'])} ms",
+    ]
+    if s['mode'] == 'open':
+        lines.append(f"Client wait p50/p90: {ms(s['client_wait']['p50'])} / {ms(s['client_wait']['p90'])} ms, "
+                     f"{s['unsent']} arrivals never sent")
+    if s['vram_peak'] is not None:
+        util = f", GPU util mean {s['util_mean']:.0f}% / peak {s['util_peak']}%" if s['util_mean'] is not None else ""
+        lines.append(f"VRAM peak {s['vram_peak'] / (1024**3):.2f} GB{util}")
+    return "\n".join(lines)
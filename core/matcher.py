@@ -0,0 +1,40 @@
+# core/matcher.py
+import psutil
+
+class ProcessMatcher:
+    """
+    Matches the configured external models (the Process Watcher list) against
+    the running process table. Targets are pre-lowered once per settings
+    change instead of on every poll.
+    """
+    def __init__(self, external_models: list[dict] = None):
+        self.update(external_models or [])
+
+    def update(self, external_models: list[dict]):
+        # Build a new tuple and swap it in, so a poll on another thread sees either the old or new list
+        self.targets = tuple(
+            (m.get('name', 'Unknown'), m.get('process', ''), m.get('process', '').lower())
+            for m in external_models
+        )
+
+    def scan(self) -> dict:
+        """Returns {lowercase process name: [pids]} for the whole process table."""
+        pids_by_name = {}
+        for p in psutil.process_iter(['pid', 'name']):
+            name = p.info['name']
+            if name:
+                pids_by_name.setdefault(name.lower(), []).append(p.info['pid'])
+        return pids_by_name
+
+    def match(self, pids_by_name: dict) -> list[dict]:
+        """One record per configured model: name, process, running and pids."""
+        results = []
+        for name, process, process_lower in self.targets:
+            pids = pids_by_name.get(process_lower, [])
+            results.append({
+                'name': name,
+                'process': process,
+                'running': bool(pids),
+                'pids': pids,
+            })
+        return results
@@ -0,0 +1,158 @@
+# core/metrics.py
+import logging
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Callable, Optional
+
+logger = logging.getLogger('LMM')
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def _escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(**labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in labels.items()) + "}"
+
+def render_metrics(snapshot: dict) -> str:
+    """
+    Renders a sampler snapshot in the Prometheus text exposition format.
+    Only reads the snapshot; never touches NVML, psutil or the Ollama API.
+    """
+    families = []  # (name, type, help, [(labels, value)])
+
+    def family(name, mtype, help_text):
+        samples = []
+        families.append((name, mtype, help_text, samples))
+        return samples
+
+    vram_total = family("lmm_gpu_vram_total_bytes", "gauge", "Total GPU memory.")
+    vram_used = family("lmm_gpu_vram_used_bytes", "gauge", "Used GPU memory.")
+    gpu_util = family("lmm_gpu_utilization_percent", "gauge", "GPU core utilization.")
+    gpu_temp = family("lmm_gpu_temperature_celsius", "gauge", "GPU core temperature.")
+    proc_vram = family("lmm_gpu_process_vram_bytes", "gauge", "GPU memory used per process.")
+    proc_sm = family("lmm_gpu_process_sm_utilization_percent", "gauge", "SM utilization per process since the last poll.")
+
+    for gpu in snapshot.get('gpus', []):
+        gpu_labels = _labels(gpu=gpu.get('index', 0), name=gpu.get('name', 'N/A'))
+        if gpu.get('vram_total_bytes') is not None:
+            vram_total.append((gpu_labels, gpu['vram_total_bytes']))
+        if gpu.get('vram_used_bytes') is not None:
+            vram_used.append((gpu_labels, gpu['vram_used_bytes']))
+        if gpu.get('gpu_utilization_pct') is not None:
+            gpu_util.append((gpu_labels, gpu['gpu_utilization_pct']))
+        if gpu.get('temperature_c') is not None:
+            gpu_temp.append((gpu_labels, gpu['temperature_c']))
+        for p in gpu.get('processes', []):
+            proc_labels = _labels(gpu=gpu.get('index', 0), pid=p['pid'], name=p['name'], type=p['type'])
+            proc_vram.append((proc_labels, p.get('vram_used_bytes', 0)))
+            if p.get('sm_util_pct') is not None:
+                proc_sm.append((proc_labels, p['sm_util_pct']))
+
+    ollama_up = family("lmm_ollama_up", "gauge", "Whether the Ollama API answered the last poll.")
+    ollama_up.append(("", 1 if snapshot.get('ollama_up') else 0))
+
+    model_size = family("lmm_ollama_model_size_bytes", "gauge", "Total size of each loaded Ollama model.")
+    model_vram = family("lmm_ollama_model_vram_bytes", "gauge", "VRAM held by each loaded Ollama model.")
+    model_expiry = family("lmm_ollama_model_expires_timestamp_seconds", "gauge",
+                          "Unix time each loaded Ollama model is unloaded at (absent if kept loaded indefinitely).")
+    for model in snapshot.get('loaded_models', []):
+        model_labels = _labels(model=model['name'], digest=model['digest'])
+        model_size.append((model_labels, model['size']))
+        model_vram.append((model_labels, model['size_vram']))
+        if model['expires_at'] is not None:
+            model_expiry.append((model_labels, model['expires_at']))
+
+    ext_up = family("lmm_external_agent_up", "gauge", "Whether a configured external agent process is running.")
+    for ext in snapshot.get('external_models', []):
+        ext_up.append((_labels(name=ext['name'], process=ext['process']), 1 if ext['running'] else 0))
+
+    poll_dur = family("lmm_poll_duration_seconds", "gauge", "Duration of each stage of the last poll.")
+    for stage, seconds in snapshot.get('poll_durations', {}).items():
+        poll_dur.append((_labels(stage=stage), seconds))
+
+    last_poll = family("lmm_last_poll_timestamp_seconds", "gauge", "Unix time of the last completed poll.")
+    last_poll.append(("", snapshot.get('timestamp', 0.0)))
+
+    lines = []
+    for name, mtype, help_text, samples in families:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {mtype}")
+        for labels, value in samples:
+            lines.append(f"{name}{labels} {value}")
+    return "\n".join(lines) + "\n"
+
+class MetricsServer:
+    """
+    Optional local HTTP endpoint exposing /metrics for Prometheus.
+
+    Scrapes are served from the snapshot returned by `snapshot_provider`.
+    The rendered body is cached per snapshot, so any number of scrapers
+    between two polls cost one render and no extra sampling.
+    """
+    def __init__(self, snapshot_provider: Callable[[], dict], host: str = "127.0.0.1", port: int = 9877):
+        self.snapshot_provider = snapshot_provider
+        self.host = host
+        self.port = port
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._cache_lock = threading.Lock()
+        self._cached_snapshot = None
+        self._cached_body = b""
+
+    def render(self) -> bytes:
+        snapshot = self.snapshot_provider()
+        with self._cache_lock:
+            if snapshot is not self._cached_snapshot:
+                self._cached_body = render_metrics(snapshot).encode('utf-8')
+                self._cached_snapshot = snapshot
+            return self._cached_body
+
+    def _make_handler(self):
+        server = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                try:
+                    body = server.render()
+                except Exception as e:
+                    logger.error(f"Error rendering metrics: {e}")
+                    self.send_error(500)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Keep scrapes out of the LMM log
+
+        return MetricsHandler
+
+    def start(self) -> bool:
+        if self._server:
+            return True
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        except OSError as e:
+            logger.error(f"Failed to start metrics endpoint on {self.host}:{self.port}: {e}")
+            self._server = None
+            return False
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"Metrics endpoint listening on http://{self.host}:{self.port}/metrics")
+        return True
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            logger.info("Metrics endpoint stopped.")
@@ -0,0 +1,197 @@
+# core/model_index.py
+import os
+import json
+import logging
+import threading
+from typing import Optional
+
+import httpx
+
+from core.instrumentation import timings
+from core.sampler import create_http_client
+
+logger = logging.getLogger('LMM')
+
+SHOW_TIMEOUT = 10 # Seconds; /api/show reads the model's GGUF header on the server
+
+SORT_KEYS = {
+    'Name': lambda m: m['name'].lower(),
+    'Size': lambda m: m.get('size') or 0,
+    'Parameters': lambda m: m.get('parameter_count') or 0,
+    'Family': lambda m: (m.get('family') or '', m['name'].lower()),
+    'Modified': lambda m: m.get('modified_at') or '',
+}
+
+class ModelIndex:
+    """
+    Metadata for installed Ollama models, cached on disk by digest.
+
+    `refresh()` costs one /api/tags call plus one /api/show per digest it has
+    never seen; a digest's metadata never changes, so everything else is
+    served from the cache. `models`, `get()` and `query()` never touch the
+    network, which keeps the Model Manager details pane, sorting and
+    filtering instant.
+    """
+    VERSION = 1
+
+    def __init__(self, config, cache_file: Optional[str] = None):
+        self.config = config
+        self.cache_file = cache_file or os.path.join(
+            os.path.dirname(config.settings_file), 'model_index.json'
+        )
+        self._lock = threading.Lock()
+        self._by_digest = {} # digest -> metadata from /api/show
+        self.models = [] # Installed models as of the last refresh (or the cache, before one)
+        self.load()
+
+    # --- Cache file ---
+
+    def load(self):
+        try:
+            with open(self.cache_file, 'r') as f:
+                data = json.load(f)
+            if data.get('version') != self.VERSION:
+                return
+            self._by_digest = data.get('digests', {})
+            self.models = data.get('models', [])
+            logger.info(f"Loaded model index ({len(self._by_digest)} digests).")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.error(f"Ignoring unreadable model index {self.cache_file}: {e}")
+
+    def save(self):
+        data = json.dumps({'version': self.VERSION, 'digests': self._by_digest, 'models': self.models})
+        tmp_file = f"{self.cache_file}.tmp"
+        try:
+            with open(tmp_file, 'w') as f:
+                f.write(data)
+            os.replace(tmp_file, self.cache_file)
+        except OSError as e:
+            logger.error(f"Error saving model index: {e}")
+
+    # --- Fetching ---
+
+    @staticmethod
+    def _parse_show(data: dict) -> dict:
+        details = data.get('details') or {}
+        model_info = data.get('model_info') or {}
+        arch = model_info.get('general.architecture', '')
+        return {
+            'family': details.get('family', ''),
+            'format': details.get('format', ''),
+            'parameter_size': details.get('parameter_size', ''),
+            'parameter_count': model_info.get('general.parameter_count'),
+            'quantization': details.get('quantization_level', ''),
+            'architecture': arch,
+            'context_length': model_info.get(f'{arch}.context_length'),
+            'embedding_length': model_info.get(f'{arch}.embedding_length'),
+            'layers': model_info.get(f'{arch}.block_count'),
+            'template': data.get('template', ''),
+            'parameters': data.get('parameters', ''),
+            'capabilities': data.get('capabilities', []),
+        }
+
+    def _fetch_show(self, client: httpx.Client, api_url: str, name: str) -> Optional[dict]:
+        try:
+            with timings.timed('index.show'):
+                response = client.post(f'{api_url}/api/show', json={'model': name}, timeout=SHOW_TIMEOUT)
+                response.raise_for_status()
+            return self._parse_show(response.json())
+        except (httpx.HTTPError, ValueError) as e:
+            logger.error(f"Error fetching metadata for {name}: {e}")
+            return None
+
+    def refresh(self) -> list[dict]:
+        """
+        Re-lists installed models and fetches metadata for unseen digests.
+        Keeps the cached list when the API is unreachable.
+        """
+        api_url = self.config.get('api_url')
+        with self._lock:
+            try:
+                with create_http_client(api_url) as client:
+                    with timings.timed('index.tags'):
+                        response = client.get(f'{api_url}/api/tags')
+                        response.raise_for_status()
+                    tags = response.json().get('models', [])
+
+                    fetched = 0
+                    for tag in tags:
+                        digest = tag.get('digest', '')
+                        if digest and digest not in self._by_digest:
+                            meta = self._fetch_show(client, api_url, tag['name'])
+                            if meta is not None:
+                                self._by_digest[digest] = meta
+                                fetched += 1
+            except (httpx.HTTPError, ValueError) as e:
+                logger.error(f"Error listing models for the model index: {e}")
+                return self.models
+
+            models = []
+            for tag in tags:
+                record = dict(self._by_digest.get(tag.get('digest', ''), {}))
+                record.update({
+                    'name': tag['name'],
+                    'digest': tag.get('digest', ''),
+                    'size': tag.get('size', 0),
+                    'modified_at': tag.get('modified_at', ''),
+                })
+                models.append(record)
+
+            # Forget digests that are no longer installed
+            installed = {m['digest'] for m in models}
+            stale = [d for d in self._by_digest if d not in installed]
+            for digest in stale:
+                del self._by_digest[digest]
+
+            changed = fetched or stale or models != self.models
+            self.models = models
+            if changed:
+                self.save()
+            logger.info(f"Model index refreshed: {len(models)} models, {fetched} fetched.")
+            return models
+
+    # --- Queries (no network) ---
+
+    def get(self, name: str) -> Optional[dict]:
+        for model in self.models:
+            if model['name'] == name:
+                return model
+        return None
+
+    def query(self, text: str = "", sort_by: str = 'Name', descending: bool = False) -> list[dict]:
+        """Installed models whose name, family or quantization contains `text`, sorted by a SORT_KEYS entry."""
+        text = text.strip().lower()
+        models = self.models
+        if text:
+            models = [
+                m for m in models
+                if text in m['name'].lower()
+                or text in (m.get('family') or '').lower()
+                or text in (m.get('quantization') or '').lower()
+            ]
+        return sorted(models, key=SORT_KEYS.get(sort_by, SORT_KEYS['Name']), reverse=descending)
+
+def format_details(model: dict) -> str:
+    """Multi-line summary for the Model Manager details pane."""
+    def value(key, suffix=""):
+        v = model.get(key)
+        return f"{v:,}{suffix}" if isinstance(v, int) else (v or "?")
+
+    template = (model.get('template') or '').strip()
+    if len(template) > 200:
+        template = template[:200] + "..."
+    lines = [
+        model['name'],
+        f"Family: {value('family')}   Architecture: {value('architecture')}",
+        f"Parameters: {value('parameter_size')}   Quantization: {value('quantization')}",
+        f"Size on disk: {model.get('size', 0) / (1024**3):.2f} GB",
+        f"Context length: {value('context_length')}   Layers: {value('layers')}",
+        f"Digest: {model.get('digest', '')[:12]}",
+    ]
+    if model.get('capabilities'):
+        lines.append(f"Capabilities: {', '.join(model['capabilities'])}")
+    if template:
+        lines.append(f"Template:\n{template}")
+    return "\n".join(lines)
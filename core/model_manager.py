@@ -1,50 +1,80 @@
 # core/model_manager.py
+import os
+import time
 import logging
-import json
-from core.powershell import run_hidden_powershell_cmd
+import threading
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from core.commands import run_command, CommandResult
+from core.model_store import ModelStore, UnreadableManifestsError, blob_digest
 
 logger = logging.getLogger('LMM')
 
+LIST_TIMEOUT = 30 # Seconds; list / rm / stop are quick
+LOAD_TIMEOUT = 600 # Loading a large model from disk can take minutes
+GC_MIN_AGE = 24 * 3600 # Seconds; younger orphans may belong to a pull or import still in progress
+PULL_ACTIVITY_WINDOW = 120 # Seconds; a partial download touched this recently means a pull is running
+
+class GcResult:
+    """Outcome of OllamaManager.collect_garbage()."""
+    def __init__(self, dry_run: bool):
+        self.dry_run = dry_run
+        self.candidates = [] # [(path, bytes, kind)]; kind is 'blob' or 'partial'
+        self.too_recent = 0 # Orphans younger than the age threshold, left alone
+        self.deleted = []
+        self.failed = [] # [(path, error)]
+        self.freed = 0
+        self.blocked = "" # Why nothing was deleted, if deletion was refused
+
+    @property
+    def reclaimable(self) -> int:
+        return sum(size for _, size, _ in self.candidates)
+
+    def __repr__(self):
+        return (f"GcResult(dry_run={self.dry_run}, candidates={len(self.candidates)}, "
+                f"reclaimable={self.reclaimable}, deleted={len(self.deleted)}, freed={self.freed}, "
+                f"blocked={self.blocked!r})")
+
 class OllamaManager:
     """
     Manages interaction with the Ollama CLI for listing, pulling, and deleting models.
+
+    Calls block until the CLI exits; GUI code runs them through
+    core.commands.submit_command or a worker thread.
     """
-    def __init__(self):
+    # Pulls in flight from any OllamaManager in this process; GC refuses to delete while > 0
+    _active_pulls = 0
+    _pulls_lock = threading.Lock()
+
+    def __init__(self, executable: str = "ollama"):
+        self.executable = executable
         logger.info("OllamaManager initialized.")
 
-    def _execute_ollama_command(self, command: str) -> tuple[int, str]:
+    def _execute_ollama_command(self, args: list[str], timeout: Optional[float] = LIST_TIMEOUT,
+                                on_output: Optional[Callable[[str], None]] = None) -> CommandResult:
         """
-        Executes an ollama CLI command and returns its exit code and output.
+        Executes an ollama CLI command (argv list, no shell) and returns the structured result.
         """
-        full_command = f"ollama {command}"
-        logger.debug(f"Executing Ollama command: {full_command}")
-        
-        # run_hidden_powershell_cmd returns only stdout, without exit code or stderr directly.
-        # For better error handling, we might need a more direct subprocess call here,
-        # or enhance run_hidden_powershell_cmd to return exit code and stderr.
-        # For now, we'll assume successful execution if output is not empty for 'list'
-        # and check for specific strings for 'pull'/'rm'.
-        output = run_hidden_powershell_cmd(full_command)
-        
-        # A more robust solution for subprocess.run returning exit code and stderr would be ideal.
-        # For simplicity, we'll assume 0 for success and -1 for generic failure
-        # and rely on parsing output for specific error messages.
-        
-        if "Error" in output or "failed" in output.lower():
-            logger.error(f"Ollama command '{command}' failed: {output}")
-            return -1, output
-        
-        logger.info(f"Ollama command '{command}' executed successfully.")
-        return 0, output
+        argv = [self.executable, *args]
+        logger.debug(f"Executing Ollama command: {argv}")
+        result = run_command(argv, timeout=timeout, on_stdout=on_output, on_stderr=on_output)
+
+        if not result.ok:
+            logger.error(f"Ollama command {args} failed (exit {result.returncode}): {result.output}")
+        else:
+            logger.info(f"Ollama command {args} executed successfully.")
+        return result
 
     def list_models(self) -> list[dict]:
         """
         Lists installed Ollama models.
         Returns a list of dictionaries, each representing a model.
         """
-        exit_code, output = self._execute_ollama_command("list")
+        result = self._execute_ollama_command(["list"])
+        output = result.stdout
         models = []
-        if exit_code == 0 and output:
+        if result.ok and output:
             # Parse the output of 'ollama list'
             # Example output:
             # NAME                     ID             SIZE    MODIFIED
@@ -63,35 +93,141 @@ class OllamaManager:
                         })
         return models
 
-    def pull_model(self, model_name: str) -> bool:
+    def pull_model(self, model_name: str, on_progress: Optional[Callable[[str], None]] = None) -> bool:
         """
         Pulls (downloads and installs) an Ollama model.
+        Blocks until the download finishes; `on_progress` receives each output line.
         """
         logger.info(f"Attempting to pull Ollama model: {model_name}")
-        exit_code, output = self._execute_ollama_command(f"pull {model_name}")
-        if exit_code == 0:
-            logger.info(f"Successfully initiated pull for model: {model_name}. Output: {output}")
+        with self._pull_in_progress():
+            result = self._execute_ollama_command(["pull", model_name], timeout=None, on_output=on_progress)
+        if result.ok:
+            logger.info(f"Successfully pulled model: {model_name}")
             return True
         else:
-            logger.error(f"Failed to pull model: {model_name}. Output: {output}")
+            logger.error(f"Failed to pull model: {model_name}. Output: {result.output}")
             return False
 
+    @classmethod
+    @contextmanager
+    def _pull_in_progress(cls):
+        with cls._pulls_lock:
+            cls._active_pulls += 1
+        try:
+            yield
+        finally:
+            with cls._pulls_lock:
+                cls._active_pulls -= 1
+
     def delete_model(self, model_name: str) -> bool:
         """
         Deletes an Ollama model.
         """
         logger.info(f"Attempting to delete Ollama model: {model_name}")
-        # Ollama rm command requires confirmation.
-        # We need to force it with --force or simulate 'y' input.
-        # For CLI interaction, --force is usually preferred in scripts.
-        exit_code, output = self._execute_ollama_command(f"rm --force {model_name}")
-        if exit_code == 0:
-            logger.info(f"Successfully deleted model: {model_name}. Output: {output}")
+        # 'ollama rm' does not prompt, and stdin is closed anyway
+        result = self._execute_ollama_command(["rm", model_name])
+        if result.ok:
+            logger.info(f"Successfully deleted model: {model_name}. Output: {result.output}")
             return True
         else:
-            logger.error(f"Failed to delete model: {model_name}. Output: {output}")
+            logger.error(f"Failed to delete model: {model_name}. Output: {result.output}")
             return False
 
+    def stop_model(self, model_name: str) -> bool:
+        """
+        Unloads a running model from memory ('ollama stop').
+        """
+        logger.info(f"Attempting to unload Ollama model: {model_name}")
+        return self._execute_ollama_command(["stop", model_name]).ok
+
+    def load_model(self, model_name: str) -> bool:
+        """
+        Loads a model into memory without starting a chat ('ollama run <model> ""').
+        """
+        logger.info(f"Attempting to load Ollama model: {model_name}")
+        return self._execute_ollama_command(["run", model_name, ""], timeout=LOAD_TIMEOUT).ok
+
+    def collect_garbage(self, store: ModelStore, dry_run: bool = True, min_age: float = GC_MIN_AGE) -> GcResult:
+        """
+        Finds blobs no manifest references and leftover partial downloads,
+        and deletes them unless `dry_run`.
+
+        Orphans younger than `min_age` seconds are left alone. Nothing is deleted while
+        a pull is running, whether started here or by anything else writing partial files,
+        or while any manifest cannot be read (its blobs would look orphaned).
+        """
+        result = GcResult(dry_run)
+        try:
+            referenced = store.referenced_digests()
+        except UnreadableManifestsError as e:
+            logger.error(f"Blob GC refused to run: {e}")
+            result.blocked = str(e)
+            return result
+        now = time.time()
+        newest_partial = 0.0
+
+        try:
+            with os.scandir(store.blobs_dir) as it:
+                entries = [e for e in it if e.is_file(follow_symlinks=False)]
+        except OSError as e:
+            logger.error(f"Cannot list blobs in {store.blobs_dir}: {e}")
+            result.blocked = str(e)
+            return result
+
+        for entry in entries:
+            digest = blob_digest(entry.name)
+            if digest:
+                if digest in referenced:
+                    continue
+                kind = 'blob'
+            elif '-partial' in entry.name:
+                kind = 'partial'
+            else:
+                continue
+            try:
+                st = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            if kind == 'partial':
+                newest_partial = max(newest_partial, st.st_mtime)
+            if now - st.st_mtime < min_age:
+                result.too_recent += 1
+                continue
+            result.candidates.append((entry.path, st.st_size, kind))
+
+        logger.info(f"Blob GC found {len(result.candidates)} orphans ({result.reclaimable} bytes), "
+                    f"{result.too_recent} too recent to remove.")
+        if dry_run or not result.candidates:
+            return result
+
+        if OllamaManager._active_pulls:
+            result.blocked = "a pull is in progress"
+        elif now - newest_partial < PULL_ACTIVITY_WINDOW:
+            result.blocked = "a download was written to within the last few minutes"
+        if result.blocked:
+            logger.warning(f"Blob GC did not delete anything: {result.blocked}.")
+            return result
+
+        # Re-check against the manifests right before deleting, in case a pull or create just finished
+        try:
+            referenced = store.referenced_digests()
+        except UnreadableManifestsError as e:
+            logger.error(f"Blob GC did not delete anything: {e}")
+            result.blocked = str(e)
+            return result
+        for path, size, kind in result.candidates:
+            if kind == 'blob' and blob_digest(os.path.basename(path)) in referenced:
+                continue
+            try:
+                os.remove(path)
+                result.deleted.append(path)
+                result.freed += size
+                logger.info(f"Blob GC removed {os.path.basename(path)} ({size} bytes).")
+            except OSError as e:
+                result.failed.append((path, str(e)))
+                logger.error(f"Blob GC could not remove {path}: {e}")
+        return result
+
 if __name__ == "__main__":
     # Basic test for OllamaManager
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -0,0 +1,305 @@
+# core/model_store.py
+import os
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from core.instrumentation import timings
+
+logger = logging.getLogger('LMM')
+
+DEFAULT_REGISTRY = "registry.ollama.ai"
+DEFAULT_NAMESPACE = "library"
+WEIGHTS_MEDIA_TYPE = "application/vnd.ollama.image.model"
+STAT_WORKERS = 8
+
+class UnreadableManifestsError(Exception):
+    """Some manifests could not be read, so the set of referenced blobs is incomplete."""
+    def __init__(self, paths: list[str]):
+        super().__init__(f"{len(paths)} manifests could not be read: {', '.join(paths[:5])}"
+                         + (" ..." if len(paths) > 5 else ""))
+        self.paths = paths
+
+def default_models_dir() -> str:
+    """Ollama's model store: $OLLAMA_MODELS, else ~/.ollama/models."""
+    return os.environ.get('OLLAMA_MODELS') or os.path.join(os.path.expanduser('~'), '.ollama', 'models')
+
+def blob_digest(filename: str) -> Optional[str]:
+    """'sha256-<hex>' blob filename -> 'sha256:<hex>'; None for partial downloads and other files."""
+    algo, sep, rest = filename.partition('-')
+    if not sep or '-' in rest or not rest:
+        return None
+    return f"{algo}:{rest}"
+
+def model_name(parts: list[str]) -> str:
+    """manifests/<host>/<namespace>/<model>/<tag> path parts -> the name `ollama list` shows."""
+    *prefix, model, tag = parts
+    if len(prefix) == 2 and prefix[0] == DEFAULT_REGISTRY:
+        if prefix[1] == DEFAULT_NAMESPACE:
+            return f"{model}:{tag}"
+        return f"{prefix[1]}/{model}:{tag}"
+    return "/".join([*prefix, model]) + f":{tag}"
+
+class StoreUsage:
+    """Disk usage of the model store, with blobs attributed to the models that reference them."""
+    def __init__(self, manifests: dict, blob_sizes: dict, partials: list):
+        self.blob_sizes = blob_sizes # digest -> bytes on disk
+        self.partials = partials # [(path, bytes, mtime)] of interrupted downloads
+        self.refs = {} # digest -> [model names]
+        self.models = {} # name -> {digests, size, unique, shared}
+
+        for name, digests in manifests.items():
+            for digest in digests:
+                self.refs.setdefault(digest, []).append(name)
+
+        for name, digests in manifests.items():
+            unique = shared = 0
+            for digest in digests:
+                size = self.blob_sizes.get(digest, 0)
+                if len(self.refs[digest]) > 1:
+                    shared += size
+                else:
+                    unique += size
+            self.models[name] = {'digests': digests, 'size': unique + shared, 'unique': unique, 'shared': shared}
+
+        self.total_bytes = sum(blob_sizes.values()) + sum(size for _, size, _ in partials)
+        self.unreferenced = {d: size for d, size in blob_sizes.items() if d not in self.refs}
+
+    def reclaimable(self, names) -> int:
+        """Bytes freed by deleting every model in `names`: blobs no other model references."""
+        names = set(names)
+        freed = set()
+        for name in names:
+            for digest in self.models.get(name, {}).get('digests', []):
+                if digest not in freed and all(ref in names for ref in self.refs[digest]):
+                    freed.add(digest)
+        return sum(self.blob_sizes.get(d, 0) for d in freed)
+
+class ModelStore:
+    """
+    Reads Ollama's manifests and blob directory directly, without the API.
+
+    Directory listings are cached by directory mtime and parsed manifests by
+    file (mtime, size), and blobs are immutable, so a repeat scan of an
+    unchanged store is a handful of stat calls regardless of its size. Cold
+    scans stat entries on a thread pool. With `cache_file`, the manifest
+    index and blob sizes are kept on disk so the first scan after a restart
+    is warm too.
+    """
+    def __init__(self, root: Optional[str] = None, cache_file: Optional[str] = None):
+        self.root = root or default_models_dir()
+        self.manifests_dir = os.path.join(self.root, 'manifests')
+        self.blobs_dir = os.path.join(self.root, 'blobs')
+        self.cache_file = cache_file
+        self._lock = threading.RLock()
+        self._dir_cache = {} # dir -> (mtime_ns, [subdirs], [files])
+        self._manifest_cache = {} # path -> (mtime_ns, size, [digests])
+        self._blob_cache = None # (mtime_ns, {digest: size}, [partials])
+        self._manifest_paths = {} # model name -> manifest path, from the last manifests() scan
+        self.unreadable_manifests = [] # Manifest paths the last manifests() scan failed to read
+        self._index_dirty = False # Index changed since the cache file was written
+        self._load_cache()
+
+    def _load_cache(self):
+        if not self.cache_file:
+            return
+        try:
+            with open(self.cache_file, 'r') as f:
+                data = json.load(f)
+            if data.get('root') != self.root:
+                return
+            self._dir_cache = {path: tuple(entry) for path, entry in data.get('dirs', {}).items()}
+            self._manifest_cache = {path: tuple(entry) for path, entry in data.get('manifests', {}).items()}
+            if data.get('blobs'):
+                mtime, sizes, partials = data['blobs']
+                self._blob_cache = (mtime, sizes, [tuple(p) for p in partials])
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, TypeError) as e:
+            logger.error(f"Ignoring unreadable model store cache {self.cache_file}: {e}")
+
+    def _save_cache(self):
+        if not self.cache_file or not self._index_dirty:
+            return
+        data = {'root': self.root, 'dirs': self._dir_cache, 'manifests': self._manifest_cache,
+                'blobs': self._blob_cache}
+        tmp_file = f"{self.cache_file}.tmp"
+        try:
+            with open(tmp_file, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_file, self.cache_file)
+            self._index_dirty = False
+        except OSError as e:
+            logger.error(f"Error saving model store cache: {e}")
+
+    @staticmethod
+    def _mtime(path: str) -> Optional[int]:
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _list_dir(self, path: str):
+        mtime = self._mtime(path)
+        if mtime is None:
+            return [], []
+        cached = self._dir_cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1], cached[2]
+        dirs, files = [], []
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(entry.path)
+                elif entry.is_file():
+                    files.append(entry.path)
+        self._dir_cache[path] = (mtime, dirs, files)
+        self._index_dirty = True
+        return dirs, files
+
+    def _manifest_files(self) -> list[str]:
+        files, pending = [], [self.manifests_dir]
+        while pending:
+            dirs, dir_files = self._list_dir(pending.pop())
+            pending.extend(dirs)
+            files.extend(dir_files)
+        return files
+
+    def _read_manifest(self, path: str, st: os.stat_result) -> Optional[list[str]]:
+        """The blob digests a manifest names; None if it cannot be read right now (not cached, so retried)."""
+        cached = self._manifest_cache.get(path)
+        # An empty entry may be a failed read cached by an older version; read it again
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size and cached[2]:
+            return cached[2]
+        try:
+            with open(path, 'rb') as f:
+                manifest = json.load(f)
+            digests = [layer['digest'] for layer in manifest.get('layers', [])]
+            if manifest.get('config', {}).get('digest'):
+                digests.append(manifest['config']['digest'])
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            # Often temporary (sharing violation, antivirus lock, half-written file)
+            logger.error(f"Skipping unreadable manifest {path}: {e}")
+            self._manifest_cache.pop(path, None)
+            return None
+        self._manifest_cache[path] = (st.st_mtime_ns, st.st_size, digests)
+        self._index_dirty = True
+        return digests
+
+    def manifests(self, pool: Optional[ThreadPoolExecutor] = None) -> dict:
+        """
+        {model name: [blob digests]} for every manifest in the store. Manifests
+        that could not be read are left out and listed in `unreadable_manifests`.
+        """
+        with self._lock, timings.timed('store.manifests'):
+            files = self._manifest_files()
+            stats = list((pool.map if pool else map)(_stat_or_none, files))
+            result, paths, unreadable = {}, {}, []
+            for path, st in zip(files, stats):
+                if st is None:
+                    continue
+                parts = os.path.relpath(path, self.manifests_dir).split(os.sep)
+                if len(parts) < 2:
+                    continue
+                digests = self._read_manifest(path, st)
+                if digests is None:
+                    unreadable.append(path)
+                elif digests:
+                    name = model_name(parts)
+                    result[name] = digests
+                    paths[name] = path
+            self._manifest_paths = paths
+            self.unreadable_manifests = unreadable
+            # Forget manifests that no longer exist
+            stale = set(self._manifest_cache) - set(files)
+            for path in stale:
+                del self._manifest_cache[path]
+            self._index_dirty |= bool(stale)
+            self._save_cache()
+            return result
+
+    def referenced_digests(self) -> set:
+        """
+        Every blob digest named by some manifest (from the cached index).
+        Raises UnreadableManifestsError if any manifest could not be read,
+        since its blobs would otherwise look unreferenced.
+        """
+        with self._lock:
+            manifests = self.manifests()
+            if self.unreadable_manifests:
+                raise UnreadableManifestsError(list(self.unreadable_manifests))
+        return {digest for digests in manifests.values() for digest in digests}
+
+    def weights_path(self, name: str) -> Optional[str]:
+        """Path of the GGUF weights blob of model `name`, or None if it is not in the store."""
+        with self._lock:
+            path = self._manifest_paths.get(name)
+            if path is None:
+                self.manifests()
+                path = self._manifest_paths.get(name)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                manifest = json.load(f)
+            for layer in manifest.get('layers', []):
+                if layer.get('mediaType') == WEIGHTS_MEDIA_TYPE:
+                    blob = os.path.join(self.blobs_dir, layer['digest'].replace(':', '-'))
+                    return blob if os.path.isfile(blob) else None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.error(f"Could not read manifest {path}: {e}")
+        return None
+
+    def blobs(self, pool: Optional[ThreadPoolExecutor] = None):
+        """({digest: bytes}, [(path, bytes, mtime) of partial downloads])."""
+        with self._lock, timings.timed('store.blobs'):
+            mtime = self._mtime(self.blobs_dir)
+            if mtime is None:
+                return {}, []
+            if self._blob_cache and self._blob_cache[0] == mtime:
+                return self._blob_cache[1], self._blob_cache[2]
+
+            with os.scandir(self.blobs_dir) as it:
+                entries = [e for e in it if e.is_file(follow_symlinks=False)]
+            stats = list((pool.map if pool else map)(_entry_stat_or_none, entries))
+            sizes, partials = {}, []
+            for entry, st in zip(entries, stats):
+                if st is None:
+                    continue
+                digest = blob_digest(entry.name)
+                if digest:
+                    sizes[digest] = st.st_size
+                elif '-partial' in entry.name:
+                    partials.append((entry.path, st.st_size, st.st_mtime))
+            self._blob_cache = (mtime, sizes, partials)
+            self._index_dirty = True
+            self._save_cache()
+            return sizes, partials
+
+    def analyze(self) -> StoreUsage:
+        with self._lock, timings.timed('store.analyze'), \
+                ThreadPoolExecutor(max_workers=STAT_WORKERS, thread_name_prefix='lmm-store') as pool:
+            manifests = self.manifests(pool)
+            blob_sizes, partials = self.blobs(pool)
+            # A manifest may name a blob that is missing on disk; count it as zero bytes
+            return StoreUsage(manifests, blob_sizes, partials)
+
+def _stat_or_none(path: str):
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
+def _entry_stat_or_none(entry: os.DirEntry):
+    try:
+        return entry.stat(follow_symlinks=False)
+    except OSError:
+        return None
+
+def format_bytes(size: int) -> str:
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(size) < 1024 or unit == 'GB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.2f} {unit}"
+        size /= 1024
@@ -1,30 +1,25 @@
 # core/powershell.py
-import subprocess
 import logging
 
+from core.commands import get_shell
+
 logger = logging.getLogger('LMM')
 
-def run_hidden_powershell_cmd(command: str):
+def run_hidden_powershell_cmd(command: str, timeout: float = 60):
     """
     Runs a PowerShell command hidden, without a new window.
+
+    Uses the shared long-lived PowerShell session instead of spawning
+    powershell.exe per call. Only for commands that genuinely need a shell;
+    run plain executables with core.commands.run_command(argv) instead.
     """
-    creation_flags = 0x08000000 # CREATE_NO_WINDOW
-    try:
-        # Use subprocess.run for better control and error handling
-        result = subprocess.run(
-            ["powershell.exe", "-NoProfile", "-Command", command],
-            creationflags=creation_flags,
-            capture_output=True,
-            text=True,
-            check=False # Do not raise an exception for non-zero exit codes immediately
-        )
-        if result.returncode != 0:
-            logger.error(f"PowerShell command failed with exit code {result.returncode}: {command}\nError: {result.stderr.strip()}")
-        elif result.stderr:
-            logger.warning(f"PowerShell command had stderr output: {command}\nWarning: {result.stderr.strip()}")
-        else:
-            logger.info(f"PowerShell command executed successfully: {command}")
-        return result.stdout.strip()
-    except Exception as e:
-        logger.error(f"Error executing PowerShell command: {e}")
-        return ""
\ No newline at end of file
+    result = get_shell().run(command, timeout=timeout)
+    if result.error:
+        logger.error(f"Error executing PowerShell command: {result.error}")
+    elif result.timed_out:
+        logger.error(f"PowerShell command timed out after {timeout}s: {command}")
+    elif result.returncode != 0:
+        logger.error(f"PowerShell command failed with exit code {result.returncode}: {command}\nError: {result.stdout}")
+    else:
+        logger.debug(f"PowerShell command executed successfully: {command}")
+    return result.stdout
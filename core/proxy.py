@@ -0,0 +1,584 @@
+# core/proxy.py
+import json
+import time
+import queue
+import socket
+import logging
+import sqlite3
+import threading
+import http.client
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Callable, Optional
+from contextlib import nullcontext
+from urllib.parse import urlparse
+
+from core.sampler import create_raw_connection
+from core.response_cache import ResponseCache, CachedResponse, MAX_ENTRY_BYTES, cache_key, is_deterministic
+from core.embed_batcher import EmbeddingBatcher
+from core.scheduler import ModelScheduler
+
+logger = logging.getLogger('LMM')
+
+# Endpoints whose requests are metered; everything else is forwarded unrecorded
+METERED_PATHS = {
+    '/api/generate', '/api/chat', '/api/embed', '/api/embeddings',
+    '/v1/chat/completions', '/v1/completions', '/v1/embeddings',
+}
+HOP_BY_HOP = {'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+              'te', 'trailer', 'transfer-encoding', 'upgrade', 'host'}
+READ_SIZE = 64 * 1024
+TAIL_SIZE = 16 * 1024 # Bytes of the response kept to find the final stream chunk
+UPSTREAM_TIMEOUT = 600 # Seconds; a cold model load can take minutes
+RETENTION_DAYS = 30
+FLUSH_INTERVAL = 0.5 # Seconds between batched writes to the usage store
+
+class UsageStore:
+    """
+    Per-request records from the metering proxy in a local SQLite file.
+
+    `record()` only appends to a queue; a writer thread inserts in batches,
+    so request threads never wait on the disk. Queries open their own
+    connection and can run from any thread.
+    """
+    COLUMNS = ('ts', 'model', 'client', 'path', 'status', 'latency', 'ttft',
+               'prompt_tokens', 'eval_tokens', 'overhead', 'error', 'cached', 'queue_wait')
+    # Columns added after the first release, created on older files at startup
+    ADDED_COLUMNS = {'cached': "INTEGER DEFAULT 0", 'queue_wait': "REAL"}
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._queue = queue.Queue()
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS requests (ts REAL, model TEXT, client TEXT, path TEXT, status INTEGER, "
+                "latency REAL, ttft REAL, prompt_tokens INTEGER, eval_tokens INTEGER, overhead REAL, error TEXT, "
+                "cached INTEGER DEFAULT 0, queue_wait REAL)"
+            )
+            columns = {row[1] for row in db.execute("PRAGMA table_info(requests)")}
+            for column, definition in self.ADDED_COLUMNS.items():
+                if column not in columns:
+                    db.execute(f"ALTER TABLE requests ADD COLUMN {column} {definition}")
+            db.execute("CREATE INDEX IF NOT EXISTS requests_ts ON requests (ts)")
+            db.execute("DELETE FROM requests WHERE ts < ?", (time.time() - RETENTION_DAYS * 86400,))
+        self._writer = threading.Thread(target=self._write_loop, name='lmm-usage-writer', daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def record(self, row: dict):
+        self._queue.put(tuple(row.get(c) for c in self.COLUMNS))
+
+    def _write_loop(self):
+        db = self._connect()
+        placeholders = ", ".join("?" for _ in self.COLUMNS)
+        running = True
+        while running:
+            batch, waiters = [], []
+            item = self._queue.get()
+            deadline = time.monotonic() + FLUSH_INTERVAL
+            while True:
+                if item is None:
+                    running = False
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if not running or waiters:
+                    break # Write now: shutting down, or a reader is waiting
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if batch:
+                try:
+                    with db:
+                        db.executemany(f"INSERT INTO requests VALUES ({placeholders})", batch)
+                except sqlite3.Error as e:
+                    logger.error(f"Error writing {len(batch)} proxy usage records: {e}")
+            for waiter in waiters:
+                waiter.set()
+        db.close()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Waits until records queued so far are written (for readers that need them immediately)."""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        self._queue.put(None)
+        self._writer.join(timeout=5)
+
+    def summary(self, since: Optional[float] = None, group_by: str = 'model') -> list[dict]:
+        """
+        Aggregates per `group_by` ('model', 'client' or 'model,client') over
+        requests since the unix time `since` (default: all retained).
+        """
+        groups = [g for g in group_by.split(',') if g in ('model', 'client')]
+        if not groups:
+            raise ValueError(f"unsupported grouping {group_by!r}")
+        keys = ", ".join(groups)
+        with self._connect() as db:
+            rows = db.execute(
+                f"SELECT {keys}, COUNT(*), SUM(error != ''), SUM(prompt_tokens), SUM(eval_tokens), "
+                f"AVG(overhead), SUM(cached), AVG(queue_wait), GROUP_CONCAT(latency), GROUP_CONCAT(ttft) "
+                f"FROM requests WHERE ts >= ? GROUP BY {keys} ORDER BY COUNT(*) DESC",
+                (since or 0,)
+            ).fetchall()
+        result = []
+        for row in rows:
+            key_values, (count, errors, prompt_tokens, eval_tokens, overhead, cached, queue_wait, latencies, ttfts) = \
+                row[:len(groups)], row[len(groups):]
+            entry = dict(zip(groups, key_values))
+            latency = sorted(float(v) for v in (latencies or "").split(',') if v)
+            ttft = sorted(float(v) for v in (ttfts or "").split(',') if v)
+            entry.update(
+                requests=count, errors=errors or 0,
+                prompt_tokens=prompt_tokens or 0, eval_tokens=eval_tokens or 0,
+                latency_p50=_pct(latency, 0.5), latency_p95=_pct(latency, 0.95),
+                ttft_p50=_pct(ttft, 0.5), overhead=overhead, cache_hits=cached or 0, queue_wait=queue_wait,
+            )
+            result.append(entry)
+        return result
+
+def _pct(values: list, q: float) -> Optional[float]:
+    return values[int(q * (len(values) - 1))] if values else None
+
+def _final_chunk(tail: bytes) -> dict:
+    """Last JSON object in an NDJSON, SSE or plain JSON response tail."""
+    for line in reversed(tail.splitlines()):
+        line = line.strip()
+        if line.startswith(b"data:"):
+            line = line[5:].strip()
+        if not line or line == b"[DONE]":
+            continue
+        try:
+            value = json.loads(line)
+        except ValueError:
+            return {}
+        return value if isinstance(value, dict) else {}
+    return {}
+
+def _token_counts(final: dict) -> tuple[int, int]:
+    """(prompt tokens, generated tokens) from Ollama or OpenAI-style final chunks."""
+    usage = final.get('usage') or {}
+    prompt = final.get('prompt_eval_count') or usage.get('prompt_tokens') or 0
+    generated = final.get('eval_count') or usage.get('completion_tokens') or 0
+    return prompt, generated
+
+def _loads_model(request: dict) -> bool:
+    """False for unload requests (keep_alive 0 and nothing to process), which must not wait in the scheduler."""
+    return not (request.get('keep_alive') == 0 and not any(request.get(k) for k in ('prompt', 'messages', 'input')))
+
+class _ChunkDecoder:
+    """
+    Incremental decoder of a chunked transfer-encoded body. The proxy relays
+    upstream's chunked bytes as read - one write however many chunks arrived
+    together - and feeds them here only for the payload it meters and caches.
+    """
+    __slots__ = ('_state', '_left', '_pending', 'done')
+
+    def __init__(self):
+        self._state = 'size' # 'size' line, chunk 'data', its trailing 'crlf', or 'trailer' lines after the last chunk
+        self._left = 0 # Payload bytes left in the current chunk
+        self._pending = b"" # Incomplete size or trailer line from the previous feed
+        self.done = False # The last chunk and trailers have been seen
+
+    def feed(self, data: bytes) -> bytes:
+        """Returns the payload bytes in `data`. Raises HTTPException on a malformed size line."""
+        if self._pending:
+            data, self._pending = self._pending + data, b""
+        payload = []
+        pos, end = 0, len(data)
+        while pos < end and not self.done:
+            if self._state == 'data':
+                take = min(self._left, end - pos)
+                payload.append(data[pos:pos + take])
+                pos += take
+                self._left -= take
+                if not self._left:
+                    self._state = 'crlf'
+            elif self._state == 'crlf':
+                if end - pos < 2:
+                    self._pending = data[pos:]
+                    break
+                pos += 2
+                self._state = 'size'
+            else:
+                eol = data.find(b"\r\n", pos)
+                if eol < 0:
+                    self._pending = data[pos:]
+                    break
+                line = data[pos:eol]
+                pos = eol + 2
+                if self._state == 'trailer':
+                    self.done = not line
+                    continue
+                try:
+                    size = int(line.split(b";", 1)[0].strip(), 16)
+                except ValueError:
+                    raise http.client.HTTPException(f"malformed chunk size {line[:20]!r}")
+                self._left = size
+                self._state = 'data' if size else 'trailer'
+        return b"".join(payload)
+
+class _ProxyServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Indexers open dozens of connections at once; the default backlog of 5 resets some of them
+    request_queue_size = 128
+
+class MeteringProxy:
+    """
+    Optional local reverse proxy in front of the Ollama API.
+
+    Requests are forwarded to the upstream returned by `upstream_provider`
+    (the configured api_url) and responses go back chunk by chunk as they
+    arrive, so streaming is unchanged for clients. For generation, chat and
+    embedding requests the proxy notes the model, client address, latency,
+    time to first byte and the token counts of the final stream chunk (only
+    a short tail of each response is kept), plus its own processing time,
+    and hands the record to the UsageStore.
+
+    With a ResponseCache, deterministic requests are answered from the cache
+    when possible and their responses stored when not; non-deterministic
+    requests always go upstream.
+
+    With an EmbeddingBatcher, /api/embed requests that miss the cache are
+    coalesced with concurrent ones into batched upstream calls.
+
+    With a ModelScheduler, requests that go upstream wait for a slot for
+    their model first; clients choose the priority class with an
+    `X-LMM-Priority: interactive|batch` header (default interactive). The
+    time spent queued is recorded with the request.
+    """
+    def __init__(self, upstream_provider: Callable[[], str], store: UsageStore,
+                 host: str = "127.0.0.1", port: int = 11435, cache: Optional[ResponseCache] = None,
+                 batcher: Optional[EmbeddingBatcher] = None, scheduler: Optional[ModelScheduler] = None):
+        self.upstream_provider = upstream_provider
+        self.store = store
+        self.cache = cache
+        self.batcher = batcher
+        self.scheduler = scheduler
+        self.host = host
+        self.port = port
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def _make_handler(self):
+        proxy = self
+
+        class ProxyHandler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            wbufsize = -1
+            disable_nagle_algorithm = True
+            _upstream = None # (api_url, connection, base path, auth headers), reused across keep-alive requests
+
+            def log_message(self, format, *args):
+                pass
+
+            def _connection(self):
+                api_url = proxy.upstream_provider()
+                if self._upstream is None or self._upstream[0] != api_url:
+                    self._close_upstream()
+                    self._upstream = (api_url, *create_raw_connection(api_url, UPSTREAM_TIMEOUT))
+                return self._upstream[1:]
+
+            def _close_upstream(self):
+                if self._upstream:
+                    self._upstream[1].close()
+                    self._upstream = None
+
+            def finish(self):
+                self._close_upstream()
+                super().finish()
+
+            def _read_body(self) -> bytes:
+                if 'chunked' in self.headers.get('Transfer-Encoding', '').lower():
+                    parts = []
+                    while True:
+                        size = int(self.rfile.readline().split(b';', 1)[0].strip() or b'0', 16)
+                        if size == 0:
+                            self.rfile.readline()
+                            return b"".join(parts)
+                        parts.append(self.rfile.read(size))
+                        self.rfile.readline()
+                return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+            def _send_upstream(self, conn, base_path, auth, path, body: Optional[bytes]):
+                conn.putrequest(self.command, base_path + path, skip_host=True, skip_accept_encoding=True)
+                conn.putheader('Host', urlparse(proxy.upstream_provider()).netloc.rpartition('@')[2])
+                for key, value in self.headers.items():
+                    if key.lower() not in HOP_BY_HOP and key.lower() != 'content-length':
+                        conn.putheader(key, value)
+                for key, value in auth.items():
+                    conn.putheader(key, value)
+                if body is not None:
+                    conn.putheader('Content-Length', str(len(body)))
+                    conn.endheaders(body)
+                    return
+                # Large unmetered bodies (blob uploads) are streamed through, not buffered
+                length = int(self.headers.get('Content-Length') or 0)
+                conn.putheader('Content-Length', str(length))
+                conn.endheaders()
+                while length:
+                    data = self.rfile.read(min(length, READ_SIZE))
+                    if not data:
+                        raise ConnectionError("client closed the request body early")
+                    conn.send(data)
+                    length -= len(data)
+
+            def _proxy(self):
+                start = time.perf_counter()
+                path = self.path
+                route = path.split('?', 1)[0]
+                metered = route in METERED_PATHS
+                chunked_request = 'chunked' in self.headers.get('Transfer-Encoding', '').lower()
+                body = self._read_body() if metered or chunked_request or self.command != 'POST' else None
+                request = None
+                if metered and body:
+                    try:
+                        request = json.loads(body)
+                    except ValueError:
+                        pass
+                    if not isinstance(request, dict):
+                        request = None
+                model = request.get('model', '') if request else ""
+
+                record = {'ts': time.time(), 'model': model, 'client': self.client_address[0],
+                          'path': route, 'status': 502, 'ttft': None, 'prompt_tokens': 0, 'eval_tokens': 0,
+                          'error': '', 'cached': 0, 'queue_wait': None}
+                key = None
+                if request and proxy.cache is not None and self.command == 'POST':
+                    if is_deterministic(route, request):
+                        digest = proxy.cache.model_digest(model) if model else None
+                        key = cache_key(route, digest, request) if digest else None
+                    else:
+                        proxy.cache.note_bypass()
+                cached = proxy.cache.get(key) if key else None
+
+                if cached is not None:
+                    tail = self._replay(cached)
+                    record.update(status=cached.status, ttft=time.perf_counter() - start, cached=1)
+                    overhead = time.perf_counter() - start
+                elif route == '/api/embed' and request and proxy.batcher is not None and self.command == 'POST':
+                    tail, overhead, capture = self._embed_batched(request, record, start, key is not None)
+                else:
+                    tail, overhead, capture = b"", 0.0, None
+                    scheduled = proxy.scheduler is not None and model and self.command == 'POST' \
+                        and _loads_model(request)
+                    try:
+                        with proxy.scheduler.slot(model, self._priority()) if scheduled else nullcontext(None) \
+                                as queued:
+                            record['queue_wait'] = queued
+                            tail, overhead, capture = self._forward(path, body, record, start, metered,
+                                                                    key is not None)
+                            overhead -= queued or 0.0 # Waiting for the model is not proxy processing time
+                    except TimeoutError as e:
+                        record['error'] = f"Queue timeout: {e}"
+                        self._send_error_json(503, f"scheduler queue timeout: {e}")
+
+                if metered:
+                    mark = time.perf_counter()
+                    final = _final_chunk(bytes(tail))
+                    record['prompt_tokens'], record['eval_tokens'] = _token_counts(final)
+                    if not record['error'] and (record['status'] >= 400 or final.get('error')):
+                        record['error'] = str(final.get('error') or f"HTTP {record['status']}")
+                    if not record['model']:
+                        record['model'] = final.get('model', '')
+                    if cached is None and capture is not None and not record['error'] \
+                            and record['status'] == 200 and final.get('done', True):
+                        proxy.cache.put(key, capture)
+                    record['latency'] = time.perf_counter() - start
+                    record['overhead'] = overhead + (time.perf_counter() - mark)
+                    proxy.store.record(record)
+
+            def _replay(self, cached: CachedResponse) -> bytes:
+                """Sends a cached response; returns its tail for metering."""
+                self.send_response(cached.status)
+                self.send_header('Content-Type', cached.content_type)
+                self.send_header('X-LMM-Cache', 'hit')
+                if cached.chunked:
+                    # Streamed originally: one chunk per line, so stream readers see the same framing
+                    self.send_header('Transfer-Encoding', 'chunked')
+                    self.end_headers()
+                    for line in cached.body.splitlines(keepends=True):
+                        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+                    self.wfile.write(b"0\r\n\r\n")
+                else:
+                    self.send_header('Content-Length', str(len(cached.body)))
+                    self.end_headers()
+                    self.wfile.write(cached.body)
+                self.wfile.flush()
+                return cached.body[-TAIL_SIZE:]
+
+            def _embed_batched(self, request: dict, record: dict, start: float,
+                               cacheable: bool) -> tuple[bytes, float, Optional[CachedResponse]]:
+                """Answers an /api/embed request through the batcher; returns like _forward()."""
+                overhead = time.perf_counter() - start
+                status, payload, queued = proxy.batcher.embed(request, self._priority())
+                mark = time.perf_counter()
+                body = json.dumps(payload).encode('utf-8')
+                record.update(status=status, ttft=mark - start, queue_wait=queued)
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                if cacheable:
+                    self.send_header('X-LMM-Cache', 'miss')
+                self.end_headers()
+                self.wfile.write(body)
+                self.wfile.flush()
+                # Metering only needs the counters, not the vectors
+                tail = json.dumps({k: v for k, v in payload.items() if k != 'embeddings'}).encode('utf-8')
+                capture = CachedResponse(status, 'application/json; charset=utf-8', False, body) \
+                    if cacheable and len(body) <= MAX_ENTRY_BYTES else None
+                return tail, overhead + time.perf_counter() - mark, capture
+
+            def _forward(self, path: str, body: Optional[bytes], record: dict, start: float, metered: bool,
+                         cacheable: bool) -> tuple[bytearray, float, Optional[CachedResponse]]:
+                """
+                Relays the request upstream and the response back as it arrives.
+                Returns (response tail, proxy overhead in seconds, the full response
+                when `cacheable` and it fit in a cache entry).
+                """
+                overhead = 0.0
+                tail = bytearray()
+                capture = bytearray() if cacheable else None
+                content_type = ''
+                chunked = False
+                try:
+                    for attempt in (1, 2):
+                        conn, base_path, auth = self._connection()
+                        try:
+                            self._send_upstream(conn, base_path, auth, path, body)
+                            overhead += time.perf_counter() - start
+                            response = conn.getresponse()
+                            break
+                        except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                            # A pooled keep-alive connection went stale; retry once on a fresh one
+                            self._close_upstream()
+                            if attempt == 2 or body is None:
+                                raise
+                    mark = time.perf_counter()
+                    record['status'] = response.status
+                    content_type = response.getheader('Content-Type', '')
+                    self.send_response(response.status, response.reason)
+                    length = response.getheader('Content-Length')
+                    for key, value in response.getheaders():
+                        if key.lower() not in HOP_BY_HOP:
+                            self.send_header(key, value)
+                    if cacheable:
+                        self.send_header('X-LMM-Cache', 'miss')
+                    if length is None and self.command != 'HEAD':
+                        self.send_header('Transfer-Encoding', 'chunked')
+                    self.end_headers()
+                    chunked = length is None and self.command != 'HEAD'
+                    # A chunked upstream is relayed as is, straight from the socket buffer, so a burst of
+                    # stream chunks costs one read and one write rather than one of each per chunk
+                    decoder = _ChunkDecoder() if response.chunked and self.command != 'HEAD' else None
+
+                    while True:
+                        overhead += time.perf_counter() - mark
+                        if decoder:
+                            data = response.fp.read1(READ_SIZE)
+                        else:
+                            data = response.read1(READ_SIZE) if self.command != 'HEAD' else b""
+                        mark = time.perf_counter()
+                        if not data:
+                            if decoder:
+                                raise http.client.IncompleteRead(b"") # Upstream closed before the last chunk
+                            break
+                        if decoder:
+                            self.wfile.write(data)
+                            data = decoder.feed(data)
+                        elif chunked:
+                            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                        else:
+                            self.wfile.write(data)
+                        self.wfile.flush()
+                        if data:
+                            if record['ttft'] is None:
+                                record['ttft'] = mark - start
+                            if metered:
+                                tail += data
+                                if len(tail) > TAIL_SIZE:
+                                    del tail[:-TAIL_SIZE]
+                            if capture is not None:
+                                capture += data
+                                if len(capture) > MAX_ENTRY_BYTES:
+                                    capture = None
+                        if decoder and decoder.done:
+                            break
+                    if chunked and not decoder:
+                        self.wfile.write(b"0\r\n\r\n")
+                        self.wfile.flush()
+                    overhead += time.perf_counter() - mark
+                    # read1() leaves a length-delimited response open; close it so the connection is reused
+                    response.close()
+                    if response.will_close:
+                        self._close_upstream()
+                except (OSError, http.client.HTTPException) as e:
+                    self._close_upstream()
+                    capture = None
+                    record['error'] = f"{type(e).__name__}: {e}"
+                    logger.debug(f"Proxy request {self.command} {path} failed: {record['error']}")
+                    if record['status'] == 502:
+                        try:
+                            self._send_error_json(502, f"upstream error: {e}")
+                        except OSError:
+                            pass
+                    else:
+                        self.close_connection = True # Response already started; the client sees a cut stream
+                if capture is not None:
+                    capture = CachedResponse(record['status'], content_type, chunked, bytes(capture))
+                return tail, overhead, capture
+
+            def _priority(self) -> str:
+                return self.headers.get('X-LMM-Priority', 'interactive').strip().lower()
+
+            def _send_error_json(self, status: int, message: str):
+                body = json.dumps({'error': message}).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = do_POST = do_HEAD = do_DELETE = do_PUT = _proxy
+
+        return ProxyHandler
+
+    def start(self) -> bool:
+        if self._server:
+            return True
+        upstream = urlparse(self.upstream_provider())
+        if upstream.hostname in (self.host, 'localhost') and upstream.port == self.port:
+            logger.error(f"Not starting the proxy: api_url {upstream.geturl()} points at the proxy itself.")
+            return False
+        try:
+            self._server = _ProxyServer((self.host, self.port), self._make_handler())
+        except OSError as e:
+            logger.error(f"Failed to start metering proxy on {self.host}:{self.port}: {e}")
+            self._server = None
+            return False
+        self.port = self._server.server_address[1] # Resolves port 0
+        self._server.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._thread = threading.Thread(target=self._server.serve_forever, name='lmm-proxy', daemon=True)
+        self._thread.start()
+        logger.info(f"Metering proxy listening on {self.url}, forwarding to {upstream.geturl()}")
+        return True
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            logger.info("Metering proxy stopped.")
@@ -0,0 +1,276 @@
+# core/response_cache.py
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import httpx
+
+from core.sampler import create_http_client
+
+logger = logging.getLogger('LMM')
+
+EMBEDDING_PATHS = {'/api/embed', '/api/embeddings', '/v1/embeddings'}
+GENERATION_PATHS = {'/api/generate', '/api/chat', '/v1/chat/completions', '/v1/completions'}
+# Request fields that do not change the response
+IGNORED_FIELDS = {'keep_alive'}
+DIGEST_TTL = 30 # Seconds between /api/tags lookups of model digests
+DIGEST_RETRY = 2 # Seconds before an unknown model name triggers another lookup
+MAX_ENTRY_BYTES = 8 * 1024 * 1024
+
+def is_deterministic(path: str, body: dict) -> bool:
+    """
+    True if the request always produces the same response: embeddings, or
+    generation at temperature 0 with a fixed seed (Ollama options or
+    OpenAI-style top-level fields).
+    """
+    if path in EMBEDDING_PATHS:
+        return True
+    if path not in GENERATION_PATHS:
+        return False
+    options = body.get('options') or {}
+    temperature = options.get('temperature', body.get('temperature'))
+    seed = options.get('seed', body.get('seed'))
+    return temperature == 0 and seed is not None
+
+def cache_key(path: str, digest: str, body: dict) -> str:
+    """SHA-256 over the path, model digest and the request in canonical JSON (sorted keys, no spaces)."""
+    request = {k: v for k, v in body.items() if k not in IGNORED_FIELDS and k != 'model'}
+    canonical = json.dumps([path, digest, request], sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def normalize_model_name(name: str) -> str:
+    """'llama3' and 'llama3:latest' name the same model."""
+    return name if ':' in name.rsplit('/', 1)[-1] else f"{name}:latest"
+
+class CachedResponse:
+    __slots__ = ('status', 'content_type', 'chunked', 'body')
+
+    def __init__(self, status: int, content_type: str, chunked: bool, body: bytes):
+        self.status = status
+        self.content_type = content_type
+        self.chunked = chunked # The original was streamed; replay it as a chunked stream
+        self.body = body
+
+    def encode(self) -> bytes:
+        header = json.dumps({'status': self.status, 'content_type': self.content_type, 'chunked': self.chunked})
+        return header.encode('utf-8') + b"\n" + self.body
+
+    @classmethod
+    def decode(cls, data: bytes) -> 'CachedResponse':
+        header, _, body = data.partition(b"\n")
+        meta = json.loads(header)
+        return cls(meta['status'], meta['content_type'], meta['chunked'], body)
+
+class ResponseCache:
+    """
+    Responses to deterministic requests, keyed by model digest and canonical request.
+
+    Recently used entries stay in an in-memory LRU of at most `memory_bytes`;
+    entries evicted from it spill to `cache_dir`, which is itself trimmed to
+    `disk_bytes` by least recent use. Keys include the model digest, so a
+    re-pulled model never serves answers from its previous weights; models
+    whose digest cannot be resolved are not cached.
+    """
+    def __init__(self, api_url_provider: Callable[[], str], cache_dir: str,
+                 memory_bytes: int = 64 * 1024 * 1024, disk_bytes: int = 1024 * 1024 * 1024):
+        self.api_url_provider = api_url_provider
+        self.cache_dir = cache_dir
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._lock = threading.Lock()
+        self._memory = OrderedDict() # key -> CachedResponse, least recently used first
+        self._memory_size = 0
+        self._disk = OrderedDict() # key -> bytes on disk, least recently used first
+        self._disk_size = 0
+        self._spilling = {} # key -> CachedResponse evicted from memory and being written to disk
+        self._digests = {} # model name -> digest
+        self._digests_at = 0.0
+        self._digests_refreshing = False # A caller is fetching /api/tags
+        self._digest_lock = threading.Lock()
+        self.stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'bypassed': 0, 'stored': 0, 'evicted': 0}
+        self._load_disk_index()
+
+    # --- Model digests ---
+
+    def model_digest(self, name: str) -> Optional[str]:
+        """
+        The model's digest from the last /api/tags listing. One caller at a time
+        refreshes a stale listing; the others answer from the current one meanwhile.
+        """
+        name = normalize_model_name(name)
+        with self._digest_lock:
+            age = time.monotonic() - self._digests_at
+            # Refresh when stale, or soon after a miss (the model may have just been pulled)
+            refresh = not self._digests_refreshing and (
+                age > DIGEST_TTL or (name not in self._digests and age > DIGEST_RETRY))
+            if refresh:
+                self._digests_refreshing = True
+        if refresh:
+            self._refresh_digests()
+        return self._digests.get(name) or None
+
+    def _refresh_digests(self):
+        api_url = self.api_url_provider()
+        digests = None
+        try:
+            with create_http_client(api_url) as client:
+                response = client.get(f'{api_url}/api/tags')
+                response.raise_for_status()
+            digests = {m['name']: m.get('digest', '') for m in response.json().get('models', [])}
+        except (httpx.HTTPError, ValueError, KeyError) as e:
+            logger.debug(f"Response cache could not list model digests: {e}")
+        finally:
+            with self._digest_lock:
+                if digests is not None:
+                    self._digests = digests
+                self._digests_at = time.monotonic()
+                self._digests_refreshing = False
+
+    # --- Disk tier ---
+    # File I/O happens outside `_lock`; only the index changes under it.
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.bin")
+
+    def _load_disk_index(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith('.bin'):
+                    st = entry.stat()
+                    entries.append((st.st_mtime, entry.name[:-4], st.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_size += size
+
+    def _spill(self, entries: list[tuple[str, CachedResponse]]):
+        """Writes entries evicted from memory to disk, then trims the disk tier. Call without `_lock`."""
+        for key, response in entries:
+            data = response.encode()
+            tmp_path = f"{self._path(key)}.tmp"
+            try:
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, self._path(key))
+            except OSError as e:
+                logger.error(f"Error writing response cache entry: {e}")
+                with self._lock:
+                    self._spilling.pop(key, None)
+                continue
+            evicted = []
+            with self._lock:
+                self._spilling.pop(key, None)
+                self._disk_size += len(data) - self._disk.pop(key, 0)
+                self._disk[key] = len(data)
+                while self._disk_size > self.disk_bytes and self._disk:
+                    old_key, size = self._disk.popitem(last=False)
+                    self._disk_size -= size
+                    self.stats['evicted'] += 1
+                    evicted.append(old_key)
+            for old_key in evicted:
+                try:
+                    os.remove(self._path(old_key))
+                except OSError:
+                    pass
+
+    def _read_disk(self, key: str) -> Optional[CachedResponse]:
+        """Reads an entry from disk. Call without `_lock`; the caller updates the index."""
+        try:
+            with open(self._path(key), 'rb') as f:
+                response = CachedResponse.decode(f.read())
+            os.utime(self._path(key)) # Keeps LRU order across restarts
+        except (OSError, ValueError, KeyError) as e:
+            logger.debug(f"Dropping unreadable response cache entry {key}: {e}")
+            return None
+        return response
+
+    # --- Memory tier ---
+
+    def _put_memory(self, key: str, response: CachedResponse) -> list[tuple[str, CachedResponse]]:
+        """Adds to the memory LRU (under `_lock`); returns the evicted entries to _spill() once it is released."""
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_size -= len(old.body)
+        self._memory[key] = response
+        self._memory_size += len(response.body)
+        spill = []
+        while self._memory_size > self.memory_bytes and self._memory:
+            old_key, old = self._memory.popitem(last=False)
+            self._memory_size -= len(old.body)
+            if old_key not in self._disk and old_key not in self._spilling:
+                self._spilling[old_key] = old # Still served while it is being written
+                spill.append((old_key, old))
+        return spill
+
+    # --- Public ---
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            response = self._memory.get(key) or self._spilling.get(key)
+            if response is not None:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                self.stats['hits'] += 1
+                return response
+            on_disk = key in self._disk
+            if not on_disk:
+                self.stats['misses'] += 1
+                return None
+        response = self._read_disk(key)
+        spill = []
+        with self._lock:
+            if response is None:
+                if key in self._disk:
+                    self._disk_size -= self._disk.pop(key)
+                self.stats['misses'] += 1
+            else:
+                if key in self._disk:
+                    self._disk.move_to_end(key)
+                self.stats['hits'] += 1
+                self.stats['disk_hits'] += 1
+                spill = self._put_memory(key, response)
+        self._spill(spill)
+        return response
+
+    def put(self, key: str, response: CachedResponse):
+        if len(response.body) > MAX_ENTRY_BYTES:
+            return
+        with self._lock:
+            spill = self._put_memory(key, response)
+            self.stats['stored'] += 1
+        self._spill(spill)
+
+    def note_bypass(self):
+        with self._lock:
+            self.stats['bypassed'] += 1
+
+    def usage(self) -> dict:
+        with self._lock:
+            return dict(self.stats, memory_entries=len(self._memory), memory_bytes=self._memory_size,
+                        disk_entries=len(self._disk), disk_bytes=self._disk_size)
+
+    def persist(self):
+        """Spills memory entries to disk so they survive a restart."""
+        with self._lock:
+            spill = [(key, response) for key, response in self._memory.items()
+                     if key not in self._disk and key not in self._spilling]
+            self._spilling.update(spill)
+        self._spill(spill)
+
+    def clear(self):
+        with self._lock:
+            keys = list(self._disk)
+            self._memory.clear()
+            self._disk.clear()
+            self._memory_size = self._disk_size = 0
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
@@ -0,0 +1,350 @@
+# core/sampler.py
+import re
+import ssl
+import time
+import base64
+import logging
+import threading
+import http.client
+from typing import Optional
+from datetime import datetime
+from urllib.parse import urlparse
+
+import httpx
+
+from core.instrumentation import timings
+from core.matcher import ProcessMatcher
+from core.health import CircuitBreaker, port_open
+
+logger = logging.getLogger('LMM')
+
+POLL_CONNECT_TIMEOUT = 0.5 # Seconds; a local server accepts at once, so waiting longer only stalls the poll
+POLL_READ_TIMEOUT = 2 # Seconds for /api/ps to answer once connected
+UNLOAD_TIMEOUT = 30 # Seconds; unloading frees VRAM, it does not wait for inference
+NEVER_EXPIRES = 365 * 24 * 3600 # keep_alive < 0 shows up as an expiry centuries away
+
+def parse_expiry(text: str) -> Optional[float]:
+    """Epoch seconds of an /api/ps `expires_at` (RFC 3339, nanoseconds), None if absent or never."""
+    if not text:
+        return None
+    # Go prints up to 9 fractional digits and 'Z'; fromisoformat before 3.11 takes at most 6 and no 'Z'
+    text = re.sub(r'(\.\d{6})\d+', r'\1', text.replace('Z', '+00:00'))
+    try:
+        expires_at = datetime.fromisoformat(text).timestamp()
+    except (ValueError, OverflowError, OSError):
+        return None
+    return None if expires_at <= 0 or expires_at - time.time() > NEVER_EXPIRES else expires_at
+
+def loaded_model_record(model: dict) -> dict:
+    """
+    Normalizes one /api/ps entry: sizes in bytes, `cpu_fraction` is the share
+    of the model offloaded to system RAM (0 = fully in VRAM), `expires_at` is
+    epoch seconds or None when the model stays loaded indefinitely.
+    """
+    details = model.get('details') or {}
+    size = model.get('size') or 0
+    size_vram = model.get('size_vram') or 0
+    return {
+        'name': model.get('name') or model.get('model', '?'),
+        'digest': model.get('digest', ''),
+        'parameter_size': details.get('parameter_size', ''),
+        'quantization': details.get('quantization_level', ''),
+        'size': size,
+        'size_vram': size_vram,
+        'cpu_fraction': max(0.0, (size - size_vram) / size) if size else 0.0,
+        'expires_at': parse_expiry(model.get('expires_at', '')),
+    }
+
+def format_loaded_models(models: list[dict]) -> str:
+    """Status text for the loaded models: the largest one, plus how many others are resident."""
+    if not models:
+        return "No Ollama Model Running"
+    largest = max(models, key=lambda m: m['size'])
+    status = f"{largest['name']} ({largest['parameter_size']})" if largest['parameter_size'] else largest['name']
+    if len(models) > 1:
+        status += f" +{len(models) - 1} more"
+    return status
+
+def format_overall_status(snapshot: dict, gpu_available: bool) -> str:
+    """
+    Builds the one-line tray status (e.g. "Ollama: llama3 (8B) (GPU: 5.1 GB / 24 GB (12%))").
+    """
+    ollama_status = snapshot['ollama_status']
+    external_status_list = [ext['name'] for ext in snapshot['external_models'] if ext['running']]
+    gpu_info = snapshot['gpus'][0]
+
+    gpu_status_str = ""
+    if gpu_info["vram_used"] != "N/A":
+        gpu_status_str = f"GPU: {gpu_info['vram_used']} / {gpu_info['vram_total']}"
+        if gpu_info["gpu_utilization"] != "N/A":
+            gpu_status_str += f" ({gpu_info['gpu_utilization']})"
+    elif gpu_available:
+         gpu_status_str = "GPU: No VRAM Info"
+    else:
+        gpu_status_str = "GPU: N/A"
+
+    status_parts = []
+    if external_status_list:
+        status_parts.append(f"Ext: {', '.join(external_status_list)}")
+
+    if "Ollama API Error" in ollama_status:
+        status_parts.append("Ollama: Error")
+    elif "Ollama Not Running" in ollama_status:
+        status_parts.append("Ollama: Offline")
+    elif "No Ollama Model Running" not in ollama_status:
+        status_parts.append(f"Ollama: {ollama_status}")
+
+    if not status_parts:
+         main_status = "Idle"
+    else:
+         main_status = " | ".join(status_parts)
+
+    return f"{main_status} ({gpu_status_str})"
+
+def create_http_client(api_url: str, timeout: float = 2, limits: Optional[httpx.Limits] = None) -> httpx.Client:
+    """An httpx client for the Ollama API, using credentials embedded in `api_url` if any."""
+    parsed_url = urlparse(api_url)
+
+    client_config = {
+        'verify': False,
+        'follow_redirects': True,
+        'timeout': timeout
+    }
+    if limits is not None:
+        client_config['limits'] = limits
+
+    if parsed_url.username and parsed_url.password:
+        auth = (parsed_url.username, parsed_url.password)
+        client_config['auth'] = auth
+        logger.info("Using URL authentication")
+
+    return httpx.Client(**client_config)
+
+def create_raw_connection(api_url: str, timeout: float) -> tuple[http.client.HTTPConnection, str, dict]:
+    """
+    An http.client connection to the Ollama API for callers that need the raw
+    socket (sendfile uploads, the metering proxy). Returns (connection, base
+    path, headers to send), with Basic auth from credentials in `api_url`.
+    """
+    parsed = urlparse(api_url)
+    if parsed.scheme == 'https':
+        conn = http.client.HTTPSConnection(parsed.hostname, parsed.port, timeout=timeout,
+                                           context=ssl._create_unverified_context()) # Matches verify=False above
+    else:
+        conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=timeout)
+    headers = {}
+    if parsed.username and parsed.password:
+        token = base64.b64encode(f"{parsed.username}:{parsed.password}".encode()).decode('ascii')
+        headers['Authorization'] = f"Basic {token}"
+    return conn, parsed.path.rstrip('/'), headers
+
+class StatusSampler:
+    """
+    Polls GPU, Ollama API and external process state once per tick and keeps
+    the most recent results as a snapshot.
+
+    The tray loop drives `poll()`; everything else (dashboard, metrics exporter)
+    reads `snapshot` so that extra readers never add NVML, psutil or HTTP load.
+    """
+    def __init__(self, config, hardware_monitor):
+        self.config = config
+        self.hardware_monitor = hardware_monitor
+        self.http_client: Optional[httpx.Client] = None
+        self.snapshot = self._empty_snapshot()
+        self.matcher = ProcessMatcher(self.config.get('external_models', []))
+        self.ollama_health = CircuitBreaker("Ollama API")
+        self.recorder = None # core.telemetry.TelemetryRecorder, to capture every tick
+        # One tick at a time: the tray loop and a dashboard refresh may both call poll()
+        self._poll_lock = threading.RLock()
+        self.init_http_client()
+        self.config.subscribe(self._on_settings_changed)
+
+    def _empty_snapshot(self) -> dict:
+        return {
+            'timestamp': 0.0,
+            'gpus': [],
+            'ollama_up': False,
+            'ollama_status': "Waiting...",
+            'ollama_health': {'state': 'closed', 'failures': 0, 'last_error': "", 'retry_in': 0.0, 'last_success': 0.0},
+            'ollama_models': [],
+            'loaded_models': [],
+            'external_models': [],
+            'poll_durations': {},
+        }
+
+    def init_http_client(self):
+        """Initialize HTTP client for Ollama API with current settings."""
+        if self.http_client:
+            self.http_client.close()
+
+        try:
+            api_url = self.config.get('api_url')
+            logger.info(f"Initializing HTTP client with URL: {api_url}")
+            self.http_client = create_http_client(
+                api_url, timeout=httpx.Timeout(POLL_READ_TIMEOUT, connect=POLL_CONNECT_TIMEOUT)
+            )
+            self.ollama_health.reset()
+            logger.info("HTTP client initialized successfully")
+
+        except Exception as e:
+            logger.error(f"Error initializing HTTP client: {str(e)}")
+            self.http_client = None
+
+    def _on_settings_changed(self, changed: set):
+        if 'api_url' in changed:
+            self.init_http_client()
+        if 'external_models' in changed:
+            self.matcher.update(self.config.get('external_models', []))
+
+    def close(self):
+        if self.http_client:
+            self.http_client.close()
+            self.http_client = None
+            logger.info("HTTP client closed.")
+
+    def unload_model(self, model_name: str) -> bool:
+        """
+        Unloads one model through the API (keep_alive 0), leaving the other
+        loaded models alone. Blocks; call from a worker thread.
+        """
+        api_url = self.config.get('api_url')
+        logger.info(f"Unloading Ollama model via API: {model_name}")
+        try:
+            with create_http_client(api_url, timeout=UNLOAD_TIMEOUT) as client:
+                response = client.post(f'{api_url}/api/generate', json={'model': model_name, 'keep_alive': 0})
+                if response.status_code == 400:
+                    # Embedding-only models reject /api/generate
+                    response = client.post(f'{api_url}/api/embed',
+                                           json={'model': model_name, 'input': [], 'keep_alive': 0})
+            if response.status_code != 200:
+                logger.error(f"Unloading {model_name} failed: HTTP {response.status_code} {response.text[:200]}")
+                return False
+            return True
+        except httpx.HTTPError as e:
+            logger.error(f"Unloading {model_name} failed: {e}")
+            return False
+
+    # --- Stages ---
+
+    def poll_ollama(self) -> tuple[str, list[dict], bool]:
+        """
+        Queries /api/ps. Returns (status string, raw model list, api reachable).
+        While the API's circuit is open this returns "Ollama Not Running" at
+        once, without a request.
+        """
+        if not self.http_client:
+            return "Ollama API Error", [], False
+        api_url = self.config.get("api_url")
+        health = self.ollama_health
+        if not health.allow(lambda: port_open(api_url)):
+            return "Ollama Not Running", [], False
+
+        try:
+            response = self.http_client.get(
+                f'{api_url}/api/ps'
+            )
+
+            if response.status_code == 200:
+                data = response.json()
+                running_models = data.get('models', [])
+                health.record_success()
+
+                if running_models:
+                    return format_loaded_models([loaded_model_record(m) for m in running_models]), running_models, True
+                else:
+                    return "No Ollama Model Running", [], True
+            else:
+                logger.warning(f"Ollama API returned status code: {response.status_code}")
+                timings.note_error('poll.ollama', f"HTTP {response.status_code}")
+                health.record_failure(f"HTTP {response.status_code}")
+                return "Ollama Not Running", [], False
+
+        except httpx.TimeoutException:
+            logger.error("Ollama API request timed out.")
+            timings.note_error('poll.ollama', "Timeout")
+            health.record_failure("timed out")
+            return "Ollama Not Running", [], False
+
+        except httpx.ConnectError as e:
+            logger.error(f"Connection error to Ollama API: {str(e)}")
+            timings.note_error('poll.ollama', f"ConnectError: {e}")
+            health.record_failure(f"connection failed: {e}", refused=True)
+            return "Ollama Not Running", [], False
+
+        except Exception as e:
+            logger.error(f"Unexpected error in get_ollama_model_status: {str(e)}")
+            timings.note_error('poll.ollama', f"{type(e).__name__}: {e}")
+            health.record_failure(f"{type(e).__name__}: {e}")
+            return "Ollama API Error", [], False
+
+    def scan_processes(self) -> dict:
+        """{lowercase process name: [pids]} for the running process table."""
+        try:
+            return self.matcher.scan()
+        except Exception as e:
+            timings.note_error('poll.external', f"{type(e).__name__}: {e}")
+            return {}
+
+    def poll_external(self, pids_by_name: Optional[dict] = None) -> list[dict]:
+        """
+        Matches configured external models against the running process table
+        (scanned now unless `pids_by_name` is given).
+        Returns one record per configured model with its running PIDs.
+        """
+        if pids_by_name is None:
+            pids_by_name = self.scan_processes()
+        return self.matcher.match(pids_by_name)
+
+    def poll_gpus(self) -> list[dict]:
+        return self.hardware_monitor.get_all_gpu_info()
+
+    # --- Tick ---
+
+    def poll(self) -> dict:
+        """
+        Runs every stage once and publishes a new snapshot. Concurrent calls are
+        serialized, so ticks never interleave (NVML sample timestamps, recordings)
+        and a slower tick cannot publish an older snapshot over a newer one.
+        """
+        with self._poll_lock:
+            return self._poll()
+
+    def _poll(self) -> dict:
+        durations = {}
+        tick_start = time.perf_counter()
+
+        start = time.perf_counter()
+        ollama_status, ollama_models, ollama_up = self.poll_ollama()
+        loaded_models = [loaded_model_record(m) for m in ollama_models]
+        durations['ollama'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        pids_by_name = self.scan_processes()
+        external_models = self.poll_external(pids_by_name)
+        durations['external'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        gpus = self.poll_gpus()
+        durations['gpu'] = time.perf_counter() - start
+
+        durations['total'] = time.perf_counter() - tick_start
+
+        for stage, seconds in durations.items():
+            timings.record(f'poll.{stage}', seconds)
+
+        if self.recorder:
+            self.recorder.record(gpus, pids_by_name, (ollama_status, ollama_models, ollama_up))
+
+        # Swap in a fresh dict so readers on other threads never see a half-built snapshot
+        self.snapshot = {
+            'timestamp': time.time(),
+            'gpus': gpus,
+            'ollama_up': ollama_up,
+            'ollama_status': ollama_status,
+            'ollama_health': self.ollama_health.status(),
+            'ollama_models': ollama_models,
+            'loaded_models': loaded_models,
+            'external_models': external_models,
+            'poll_durations': durations,
+        }
+        return self.snapshot
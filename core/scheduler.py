@@ -0,0 +1,211 @@
+# core/scheduler.py
+import time
+import bisect
+import logging
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Optional
+
+from core.response_cache import normalize_model_name
+
+logger = logging.getLogger('LMM')
+
+PRIORITIES = {'interactive': 0, 'batch': 1}
+QUEUE_TIMEOUT = 600 # Seconds a request may wait for its turn before it is refused
+WAIT_WINDOW = 500 # Queue waits kept per model for percentiles
+IDLE_GRACE = 0.05 # Seconds a loaded model stays reserved after its last request, for the client's next one
+
+class _Waiter:
+    __slots__ = ('model', 'rank', 'arrived', 'ready', 'order', 'due_at')
+
+    def __init__(self, model: str, rank: int, aging: float):
+        self.model = model
+        self.rank = rank
+        self.arrived = time.monotonic()
+        self.ready = False
+        # Effective priority is rank - waited / aging; everyone ages at the same rate, so the order is fixed
+        self.order = (self.arrived + rank * aging, self.arrived)
+        self.due_at = self.arrived + (rank + 1) * aging # Aged past the interactive class
+
+class _ModelStats:
+    __slots__ = ('admitted', 'waits')
+
+    def __init__(self):
+        self.admitted = 0
+        self.waits = deque(maxlen=WAIT_WINDOW)
+
+def _pct(values: list, q: float) -> Optional[float]:
+    return values[int(q * (len(values) - 1))] if values else None
+
+class ModelScheduler:
+    """
+    Admission control that keeps requests for the same model together.
+
+    The scheduler's view of which models are loaded is the `max_models` it
+    most recently admitted requests for (Ollama loads a model on its first
+    request). A request for a loaded model starts at once, up to the
+    model's concurrency limit. A request for another model starts if a model
+    slot is free, or by evicting a loaded model that has had no requests for
+    IDLE_GRACE seconds; that eviction is counted as a swap.
+    Otherwise it waits while the loaded model keeps serving its queue, which
+    is what stops two alternating clients from forcing a reload per request.
+
+    Waiters are ordered by priority class (interactive before batch) minus
+    one class per `aging` seconds waited. Once a waiter for an unloaded
+    model has aged past the interactive class (after `aging` seconds for
+    interactive, twice that for batch), requests ordered behind it stop
+    being admitted, so the loaded models drain and it gets its swap. That
+    bounds starvation at about (rank + 1) * aging plus the time the running
+    requests take to finish.
+
+    Waiters are kept in that order and only block on the condition. Besides
+    arrivals and releases, the policy re-runs from a single timer, armed for
+    the next moment aging or an idle model could change the outcome.
+    """
+    def __init__(self, max_models: int = 1, concurrency: int = 4, model_limits: Optional[dict] = None,
+                 aging: float = 2.0):
+        self.max_models = max(1, max_models)
+        self.concurrency = max(1, concurrency)
+        self.model_limits = {normalize_model_name(k): int(v) for k, v in (model_limits or {}).items()}
+        self.aging = max(0.01, aging)
+        self._cond = threading.Condition()
+        self._waiting: list[_Waiter] = [] # In scheduling order
+        self._timer: Optional[threading.Timer] = None
+        self._timer_at: Optional[float] = None
+        self._running = {} # model -> requests in flight
+        self._resident = OrderedDict() # model -> monotonic time it was last busy, least recent first
+        self._model_stats = {} # model -> _ModelStats
+        self.stats = {'admitted': 0, 'loads': 0, 'swaps': 0, 'timeouts': 0}
+
+    def limit_for(self, model: str) -> int:
+        return self.model_limits.get(model, self.concurrency)
+
+    @contextmanager
+    def slot(self, model: str, priority: str = 'interactive', timeout: float = QUEUE_TIMEOUT):
+        """
+        Holds a slot for one request to `model` for the duration of the block;
+        yields the seconds spent queued. Raises TimeoutError after `timeout`.
+        """
+        model = normalize_model_name(model)
+        waited = self._acquire(model, PRIORITIES.get(priority, 0), timeout)
+        try:
+            yield waited
+        finally:
+            self._release(model)
+
+    def _acquire(self, model: str, rank: int, timeout: float) -> float:
+        waiter = _Waiter(model, rank, self.aging)
+        deadline = waiter.arrived + timeout
+        with self._cond:
+            bisect.insort(self._waiting, waiter, key=lambda w: w.order)
+            self._schedule()
+            while not waiter.ready:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._waiting.remove(waiter)
+                    self.stats['timeouts'] += 1
+                    self._schedule()
+                    raise TimeoutError(f"waited {timeout:.0f} s for {model}")
+                self._cond.wait(remaining)
+        waited = time.monotonic() - waiter.arrived
+        with self._cond:
+            self._model_stats.setdefault(model, _ModelStats()).waits.append(waited)
+        return waited
+
+    def _release(self, model: str):
+        with self._cond:
+            self._running[model] -= 1
+            if not self._running[model]:
+                del self._running[model]
+            if model in self._resident:
+                self._resident[model] = time.monotonic()
+            self._schedule()
+
+    def _admit(self, waiter: _Waiter):
+        waiter.ready = True
+        self._waiting.remove(waiter)
+        self._running[waiter.model] = self._running.get(waiter.model, 0) + 1
+        self._resident[waiter.model] = time.monotonic()
+        self._resident.move_to_end(waiter.model)
+        self._model_stats.setdefault(waiter.model, _ModelStats()).admitted += 1
+        self.stats['admitted'] += 1
+
+    def _schedule(self):
+        """Admits every waiter the policy allows, then arms the timer for the next change. Called with the condition held."""
+        now = time.monotonic()
+        admitted = False
+        holding = False # A due waiter is draining the loaded models; admit nothing behind it
+        for waiter in list(self._waiting):
+            model = waiter.model
+            due = now >= waiter.due_at
+            if model in self._resident:
+                if not holding and self._running.get(model, 0) < self.limit_for(model):
+                    self._admit(waiter)
+                    admitted = True
+                continue
+            if holding:
+                continue
+            if len(self._resident) < self.max_models:
+                self.stats['loads'] += 1
+                self._admit(waiter)
+                admitted = True
+                continue
+            # Least recently busy idle model; evict it if its clients have moved on or this waiter is due
+            idle = next((m for m, busy_at in self._resident.items()
+                         if not self._running.get(m) and (due or now >= busy_at + IDLE_GRACE)), None)
+            if idle is not None:
+                del self._resident[idle]
+                self.stats['loads'] += 1
+                self.stats['swaps'] += 1
+                logger.debug(f"Scheduler swapping {idle} for {model}")
+                self._admit(waiter)
+                admitted = True
+            elif due:
+                holding = True
+        if admitted:
+            self._cond.notify_all()
+        self._arm_timer(now)
+
+    def _arm_timer(self, now: float):
+        """Schedules a re-run for when a waiter becomes due or a loaded model turns idle, if anyone waits."""
+        if not self._waiting:
+            return
+        changes = [w.due_at for w in self._waiting if w.due_at > now]
+        changes += [busy_at + IDLE_GRACE for m, busy_at in self._resident.items()
+                    if not self._running.get(m) and busy_at + IDLE_GRACE > now]
+        if not changes:
+            return
+        at = min(changes)
+        if self._timer_at is not None and self._timer_at <= at:
+            return # An earlier re-run is already due; it arms the next one
+        if self._timer:
+            self._timer.cancel()
+        self._timer_at = at
+        self._timer = threading.Timer(at - now, self._on_timer, args=(at,))
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self, at: float):
+        with self._cond:
+            if self._timer_at != at:
+                return # Replaced by an earlier timer
+            self._timer = self._timer_at = None
+            self._schedule()
+
+    def usage(self) -> dict:
+        """Scheduler counters plus, per model, queued and running requests and queue wait percentiles."""
+        with self._cond:
+            models = {}
+            for model in set(self._model_stats) | set(self._running) | {w.model for w in self._waiting}:
+                stats = self._model_stats.get(model) or _ModelStats()
+                waits = sorted(stats.waits)
+                models[model] = {
+                    'queued': sum(1 for w in self._waiting if w.model == model),
+                    'running': self._running.get(model, 0),
+                    'admitted': stats.admitted,
+                    'wait_p50': _pct(waits, 0.5),
+                    'wait_p95': _pct(waits, 0.95),
+                    'loaded': model in self._resident,
+                }
+            return dict(self.stats, queued=len(self._waiting), models=models)
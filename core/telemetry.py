@@ -0,0 +1,364 @@
+# core/telemetry.py
+import gzip
+import json
+import time
+import queue
+import bisect
+import random
+import hashlib
+import logging
+import argparse
+import threading
+from datetime import datetime, timezone
+from typing import Optional
+
+from core.sampler import StatusSampler, format_loaded_models, loaded_model_record, parse_expiry
+
+logger = logging.getLogger('LMM')
+
+FORMAT = 'lmm-telemetry'
+VERSION = 1
+GB = 1024**3
+
+# A recording is gzip-compressed JSON lines: a header, then one line per tick
+# ({"t": seconds since start, ...}) holding only the stages whose result
+# changed since the previous tick:
+#   gpus   - HardwareMonitor.get_all_gpu_info()
+#   procs  - StatusSampler.scan_processes(), {process name: [pids]}; after the
+#            first tick usually as a delta instead: "procs+" {name: [new pids]}
+#            and "procs-" [exited pids]
+#   ollama - poll_ollama() as {"status", "models" (raw /api/ps entries), "up"}
+
+def _pid_names(procs: dict) -> dict:
+    return {pid: name for name, pids in procs.items() for pid in pids}
+
+class _TickWriter:
+    def __init__(self, path: str, started: float, source: str):
+        self.path = path
+        self.started = started
+        self.ticks = 0
+        self._file = gzip.open(path, 'wt', encoding='utf-8')
+        self._previous = {}
+        self._previous_pids = None # pid -> name of the last written process table
+        self._write({'format': FORMAT, 'version': VERSION, 'started': started, 'source': source})
+
+    def _write(self, entry: dict):
+        self._file.write(json.dumps(entry, separators=(',', ':')) + '\n')
+
+    def write(self, timestamp: float, gpus: list, procs: dict, ollama: dict):
+        entry = {'t': round(timestamp - self.started, 3)}
+        for key, value in (('gpus', gpus), ('ollama', ollama)):
+            if self._previous.get(key) != value:
+                entry[key] = self._previous[key] = value
+        self._write_procs(entry, procs)
+        self._write(entry)
+        self.ticks += 1
+
+    def _write_procs(self, entry: dict, procs: dict):
+        pids = _pid_names(procs)
+        previous = self._previous_pids
+        self._previous_pids = pids
+        if previous is None:
+            entry['procs'] = procs
+            return
+        added = {}
+        for pid, name in pids.items():
+            if previous.get(pid) != name:
+                added.setdefault(name, []).append(pid)
+        removed = [pid for pid in previous if pid not in pids]
+        if len(removed) + sum(map(len, added.values())) > len(pids) // 2:
+            entry['procs'] = procs # Mostly new; the full table is smaller than the delta
+        elif added or removed:
+            entry['procs+'], entry['procs-'] = added, removed
+
+    def close(self):
+        self._file.close()
+
+class TelemetryRecorder:
+    """
+    Writes what the sampler polls on each tick to a recording. record() only
+    queues the tick; encoding and compression happen on a writer thread, so
+    recording adds next to nothing to the poll.
+    """
+    def __init__(self, path: str):
+        self._writer = _TickWriter(path, time.time(), 'recorded')
+        self._queue = queue.Queue(maxsize=1000)
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name='lmm-telemetry-recorder', daemon=True)
+        self._thread.start()
+        logger.info(f"Recording telemetry to {path}")
+
+    def record(self, gpus: list, pids_by_name: dict, ollama: tuple):
+        """Queues one tick; `ollama` is poll_ollama()'s (status, models, up)."""
+        status, models, up = ollama
+        try:
+            self._queue.put_nowait((time.time(), gpus, pids_by_name, {'status': status, 'models': models, 'up': up}))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            tick = self._queue.get()
+            if tick is None:
+                return
+            try:
+                self._writer.write(*tick)
+            except (OSError, TypeError, ValueError) as e:
+                logger.error(f"Telemetry recording to {self._writer.path} failed: {e}")
+                return
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(timeout=10)
+        self._writer.close()
+        logger.info(f"Recorded {self._writer.ticks} ticks to {self._writer.path}"
+                    + (f" ({self.dropped} dropped)" if self.dropped else ""))
+
+def read_recording(path: str) -> tuple[dict, list[dict]]:
+    """Returns (header, ticks) with every tick holding all three stages (unchanged ones carried forward)."""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        header = json.loads(f.readline())
+        if header.get('format') != FORMAT or header.get('version') != VERSION:
+            raise ValueError(f"{path} is not an LMM telemetry recording (version {VERSION})")
+        ticks = []
+        state = {'gpus': [], 'procs': {}, 'ollama': {'status': "Waiting...", 'models': [], 'up': False}}
+        pids = {}
+        for line in f:
+            entry = json.loads(line)
+            added, removed = entry.pop('procs+', None), entry.pop('procs-', None)
+            if 'procs' in entry:
+                # JSON object keys are strings; pids stay ints inside the lists
+                pids = _pid_names(entry['procs'])
+            elif added or removed:
+                pids = dict(pids)
+                for pid in removed or ():
+                    pids.pop(pid, None)
+                for name, new in (added or {}).items():
+                    pids.update((pid, name) for pid in new)
+                procs = {}
+                for pid, name in pids.items():
+                    procs.setdefault(name, []).append(pid)
+                entry['procs'] = procs
+            state = dict(state, **entry)
+            ticks.append(state)
+    return header, ticks
+
+class ReplaySource:
+    """
+    Plays a recording back by wall clock, `speed` times as fast as it was
+    recorded; speed 0 steps one recorded tick per poll instead. Loops at the
+    end unless `loop` is False, in which case the last tick is held. Model
+    expiry times are shifted so countdowns read as they did when recorded.
+    """
+    def __init__(self, path: str, speed: float = 1.0, loop: bool = True):
+        self.header, self.ticks = read_recording(path)
+        if not self.ticks:
+            raise ValueError(f"{path} holds no ticks")
+        self.speed = speed
+        self.loop = loop
+        self._times = [tick['t'] for tick in self.ticks]
+        # One tick interval past the last tick before looping, so the last tick is not skipped
+        self._span = self._times[-1] + (self._times[-1] / (len(self._times) - 1) if len(self._times) > 1 else 1.0)
+        self._started = time.monotonic()
+        self.index = -1
+
+    def advance(self) -> dict:
+        """The tick due now, as the sampler stages would have returned it."""
+        count = len(self.ticks)
+        if self.speed <= 0:
+            self.index = (self.index + 1) % count if self.loop else min(self.index + 1, count - 1)
+        else:
+            elapsed = (time.monotonic() - self._started) * self.speed
+            if self.loop:
+                elapsed %= self._span
+            self.index = max(0, bisect.bisect_right(self._times, elapsed) - 1)
+        tick = self.ticks[self.index]
+        offset = time.time() - (self.header['started'] + tick['t'])
+        ollama = dict(tick['ollama'], models=[_shift_expiry(m, offset) for m in tick['ollama']['models']])
+        return dict(tick, ollama=ollama)
+
+def _shift_expiry(model: dict, offset: float) -> dict:
+    expires_at = parse_expiry(model.get('expires_at', ''))
+    if expires_at is None:
+        return model
+    return dict(model, expires_at=datetime.fromtimestamp(expires_at + offset, timezone.utc).isoformat())
+
+class ReplaySampler(StatusSampler):
+    """
+    A StatusSampler whose stages read a ReplaySource instead of NVML, psutil
+    and the Ollama API. Everything downstream of the snapshot (tray, dashboard,
+    alerts, metrics) runs unchanged. Actions still act on the real machine:
+    unloading goes to the configured API, Game Mode to the real process table.
+    """
+    def __init__(self, config, hardware_monitor, source: ReplaySource):
+        self.source = source
+        self._tick = None
+        super().__init__(config, hardware_monitor)
+
+    def _poll(self) -> dict:
+        self._tick = self.source.advance()
+        return super()._poll()
+
+    def _current(self) -> dict:
+        if self._tick is None:
+            self._tick = self.source.advance()
+        return self._tick
+
+    def poll_ollama(self) -> tuple[str, list[dict], bool]:
+        ollama = self._current()['ollama']
+        if ollama['up']:
+            self.ollama_health.record_success()
+        else:
+            self.ollama_health.record_failure("replayed outage")
+        return ollama['status'], ollama['models'], ollama['up']
+
+    def scan_processes(self) -> dict:
+        return self._current()['procs']
+
+    def poll_gpus(self) -> list[dict]:
+        return self._current()['gpus']
+
+# --- Synthetic scenarios ---
+
+def _gpu_info(index: int, total: int, used: int, utilization: int, temperature: int, processes: list) -> dict:
+    """A device entry shaped like HardwareMonitor.get_gpu_info()."""
+    return {
+        "index": index,
+        "vram_total": f"{total / GB:.2f} GB",
+        "vram_used": f"{used / GB:.2f} GB",
+        "vram_free": f"{(total - used) / GB:.2f} GB",
+        "gpu_utilization": f"{utilization}%",
+        "temperature": f"{temperature} C",
+        "name": f"Synthetic GPU {index}",
+        "vram_total_bytes": total,
+        "vram_used_bytes": used,
+        "gpu_utilization_pct": utilization,
+        "temperature_c": temperature,
+        "processes": processes,
+    }
+
+def _gpu_process(pid: int, name: str, vram: int, sm: int) -> dict:
+    return {"pid": pid, "name": name, "vram_used_mb": vram // 1024**2, "vram_used_bytes": vram,
+            "type": "Compute", "sm_util_pct": sm, "mem_util_pct": sm // 2, "enc_util_pct": 0, "dec_util_pct": 0}
+
+def _synthetic_model(i: int) -> dict:
+    size_gb = (4, 5, 8, 14, 40)[i % 5]
+    name = f"synthetic-{i}:{('3b', '7b', '8b', '13b', '70b')[i % 5]}"
+    return {
+        'name': name, 'model': name, 'size': size_gb * GB, 'size_vram': size_gb * GB,
+        'digest': hashlib.sha256(name.encode()).hexdigest(), 'expires_at': "",
+        'details': {'format': 'gguf', 'family': 'llama', 'parameter_size': name.split(':')[1].upper(),
+                    'quantization_level': 'Q4_K_M'},
+    }
+
+def generate_scenario(path: str, gpus: int = 8, processes: int = 5000, models: int = 20, ticks: int = 300,
+                      interval: float = 1.0, seed: int = 0, vram_gb: int = 24,
+                      external_processes: tuple = ('handy.exe', 'python.exe')) -> int:
+    """
+    Writes a synthetic recording: `gpus` devices with drifting load and
+    temperature, a process table of `processes` entries with some churn, and
+    models from a catalog of `models` being loaded and unloaded (large ones
+    partly on the CPU). Ollama is unreachable for a stretch in the middle,
+    and the external processes come and go, so alerts and the health check
+    have something to react to. Returns the number of ticks written.
+    """
+    rng = random.Random(seed)
+    started = time.time()
+    writer = _TickWriter(path, started, f"synthetic gpus={gpus} processes={processes} models={models} seed={seed}")
+    total = vram_gb * GB
+    common = ['svchost.exe'] * 20 + ['chrome.exe'] * 10 + [f"app{i}.exe" for i in range(200)]
+    next_pid = 1000
+    table = {} # pid -> name
+    for _ in range(processes):
+        table[next_pid] = rng.choice(common)
+        next_pid += 4
+    agent_pids = [next_pid + 4 * n for n in range(len(external_processes))]
+    runner_pids = [next_pid + 4 * (len(external_processes) + n) for n in range(models)] # One runner per model
+    next_pid += 4 * (len(external_processes) + models)
+    catalog = [_synthetic_model(i) for i in range(models)]
+    loaded = {} # model index -> gpu
+    load = [rng.randint(0, 60) for _ in range(gpus)]
+    outage = range(int(ticks * 0.4), int(ticks * 0.45))
+    try:
+        for i in range(ticks):
+            now = started + i * interval
+            # Process churn: about 0.5% of the table exits and is replaced each tick
+            for pid in rng.sample(list(table), max(1, processes // 200)):
+                del table[pid]
+                table[next_pid] = rng.choice(common)
+                next_pid += 4
+            procs = {}
+            for pid, name in table.items():
+                procs.setdefault(name, []).append(pid)
+            for n, name in enumerate(external_processes):
+                if (i // (60 * (n + 1))) % 2 == 0:
+                    procs.setdefault(name, []).append(agent_pids[n])
+
+            # Load or unload a model every 20 ticks or so
+            if models and rng.random() < 0.05:
+                index = rng.randrange(models)
+                if index in loaded:
+                    del loaded[index]
+                elif len(loaded) < gpus * 2:
+                    loaded[index] = rng.randrange(gpus)
+
+            ps_models = []
+            gpu_processes = [[] for _ in range(gpus)]
+            used = [512 * 1024**2] * gpus
+            for index, gpu in sorted(loaded.items()):
+                model = catalog[index]
+                free = total - used[gpu]
+                size_vram = min(model['size'], max(0, int(free * 0.9)))
+                used[gpu] += size_vram
+                expiry = datetime.fromtimestamp(now + 300, timezone.utc).isoformat()
+                ps_models.append(dict(model, size_vram=size_vram, expires_at=expiry))
+                gpu_processes[gpu].append(_gpu_process(runner_pids[index], "ollama_llama_server.exe", size_vram,
+                                                       load[gpu]))
+                procs.setdefault('ollama_llama_server.exe', []).append(runner_pids[index])
+
+            devices = []
+            pids = list(table)
+            for gpu in range(gpus):
+                load[gpu] = max(0, min(100, load[gpu] + rng.randint(-8, 8)))
+                for pid in pids[gpu * 3:gpu * 3 + 3]: # A few desktop processes per GPU
+                    vram = 128 * 1024**2
+                    used[gpu] += vram
+                    gpu_processes[gpu].append(_gpu_process(pid, table[pid], vram, rng.randint(0, 5)))
+                temperature = 35 + load[gpu] // 2 + rng.randint(0, 3)
+                devices.append(_gpu_info(gpu, total, min(used[gpu], total), load[gpu], temperature,
+                                         gpu_processes[gpu]))
+
+            if i in outage:
+                ollama = {'status': "Ollama Not Running", 'models': [], 'up': False}
+            else:
+                status = format_loaded_models([loaded_model_record(m) for m in ps_models])
+                ollama = {'status': status, 'models': ps_models, 'up': True}
+            writer.write(now, devices, procs, ollama)
+    finally:
+        writer.close()
+    return writer.ticks
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LMM telemetry recordings")
+    commands = parser.add_subparsers(dest='command', required=True)
+    generate = commands.add_parser('generate', help="Write a synthetic scenario")
+    generate.add_argument('path')
+    generate.add_argument('--gpus', type=int, default=8)
+    generate.add_argument('--processes', type=int, default=5000)
+    generate.add_argument('--models', type=int, default=20)
+    generate.add_argument('--ticks', type=int, default=300)
+    generate.add_argument('--interval', type=float, default=1.0, help="Seconds between ticks")
+    generate.add_argument('--seed', type=int, default=0)
+    info = commands.add_parser('info', help="Summarize a recording")
+    info.add_argument('path')
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        count = generate_scenario(args.path, args.gpus, args.processes, args.models, args.ticks, args.interval,
+                                  args.seed)
+        print(f"Wrote {count} ticks to {args.path}")
+    else:
+        header, ticks = read_recording(args.path)
+        print(f"{header.get('source')}: {len(ticks)} ticks over {ticks[-1]['t'] if ticks else 0:.0f} s, "
+              f"{len(ticks[-1]['gpus']) if ticks else 0} GPUs, "
+              f"{sum(len(p) for p in ticks[-1]['procs'].values()) if ticks else 0} processes")
@@ -0,0 +1,68 @@
+# gui/dispatcher.py
+import time
+import logging
+import itertools
+import threading
+
+logger = logging.getLogger('LMM')
+
+class UiDispatcher:
+    """
+    Thread-safe queue of UI updates, drained on the Tk thread by a single
+    `after` pump. Any thread may post; only the pump touches Tk.
+
+    - `post(func, *args)` queues a call that always runs, in order.
+    - `post_latest(key, func, *args)` keeps only the newest pending call per
+      key, so a burst (e.g. hundreds of pull-progress events) collapses to
+      one widget update per frame.
+
+    Each frame runs at most `max_per_frame` calls or `frame_budget_ms` of
+    work; the rest waits for the next frame.
+    """
+    def __init__(self, root, interval_ms: int = 50, max_per_frame: int = 50, frame_budget_ms: float = 15.0):
+        self.root = root
+        self.interval_ms = interval_ms
+        self.max_per_frame = max_per_frame
+        self.frame_budget = frame_budget_ms / 1000
+        self._lock = threading.Lock()
+        self._pending = {} # key -> (func, args); dicts keep insertion order
+        self._seq = itertools.count()
+        self._running = False
+        # The pump runs wherever Tk does; that must be the thread that created the root (the main one here)
+        if threading.current_thread() is not threading.main_thread():
+            logger.error(f"UiDispatcher created on {threading.current_thread().name}, not the main (Tk) thread")
+
+    def post(self, func, *args):
+        with self._lock:
+            self._pending[('call', next(self._seq))] = (func, args)
+
+    def post_latest(self, key, func, *args):
+        with self._lock:
+            # Replacing an existing key keeps its place in the queue but updates the payload
+            self._pending[('latest', key)] = (func, args)
+
+    def start(self):
+        if not self._running:
+            self._running = True
+            self.root.after(self.interval_ms, self._pump)
+
+    def stop(self):
+        self._running = False
+
+    def _pump(self):
+        if not self._running:
+            return
+        deadline = time.perf_counter() + self.frame_budget
+        for _ in range(self.max_per_frame):
+            with self._lock:
+                if not self._pending:
+                    break
+                key = next(iter(self._pending))
+                func, args = self._pending.pop(key)
+            try:
+                func(*args)
+            except Exception as e:
+                logger.error(f"Error applying UI update {getattr(func, '__name__', func)}: {e}")
+            if time.perf_counter() >= deadline:
+                break
+        self.root.after(self.interval_ms, self._pump)
@@ -1,6 +1,8 @@
 # gui/main_window.py
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog, simpledialog
+import os
+import time
 import webbrowser
 import logging
 import psutil
@@ -8,10 +10,22 @@ import sv_ttk # Dark mode goodness
 from core.model_manager import OllamaManager
 from core.game_mode import activate_game_mode
 from core.hardware import HardwareMonitor
-from core.powershell import run_hidden_powershell_cmd # For stopping ollama
+from core.commands import submit_task, submit_long_task
+from core.instrumentation import timings
+from core.dashboard import build_process_rows, format_health, OLLAMA_ROW_ID
+from core.model_index import ModelIndex, SORT_KEYS, format_details
+from core.model_store import ModelStore, format_bytes
+from core.blob_verify import BlobVerifier
+from core.gguf_import import GgufImporter
+from core.gguf import GgufError, read_gguf, estimate_vram
+from core.inference_bench import InferenceBenchmark, hardware_key, format_result
+from core.load_test import LoadTester, SWEEP_LEVELS, format_summary, suggest_parallel
+from gui.dispatcher import UiDispatcher
 
 logger = logging.getLogger('LMM')
 
+USAGE_REFRESH = 5 # Seconds between Proxy Usage queries while the dashboard is visible
+
 class MainWindow(tk.Tk):
     """
     Unified Main Window for LMM with Tabs.
@@ -20,6 +34,17 @@ class MainWindow(tk.Tk):
         super().__init__()
         self.app_instance = app_instance
         self.ollama_manager = OllamaManager()
+        self.model_index = ModelIndex(app_instance.config)
+        self.model_store = self._create_model_store()
+        self.store_usage = None # Last StoreUsage; selection stats are computed from it
+        self._verifier = None # Running BlobVerifier, if any
+        self._gguf_headers = {} # weights blob path -> GgufInfo; blobs are immutable
+        self._vram_model = None # (model name, GgufInfo) behind the VRAM estimate
+        self.benchmark = InferenceBenchmark(app_instance.config)
+        self._benchmarking = False
+        self.load_tester = LoadTester(app_instance.config, app_instance.hardware_monitor)
+        self._load_testing = False
+        self._usage_refreshed = 0.0 # monotonic time of the last Proxy Usage query
         
         self.title("Local Model Manager")
         self.geometry("900x650")
@@ -29,13 +54,39 @@ class MainWindow(tk.Tk):
         sv_ttk.set_theme("dark")
 
         self.protocol("WM_DELETE_WINDOW", self.hide_window)
+
+        # All cross-thread UI updates go through here; only its pump touches Tk
+        self.dispatcher = UiDispatcher(self)
+        self.dispatcher.start()
         
         self._create_layout()
         self._center_window()
         
+    def _create_model_store(self) -> ModelStore:
+        config = self.app_instance.config
+        cache_file = os.path.join(os.path.dirname(config.settings_file), 'model_store_index.json')
+        return ModelStore(config.get('ollama_models_dir') or None, cache_file)
+
     def hide_window(self):
         self.withdraw()
 
+    def _run_in_background(self, func, on_done=None, long: bool = False):
+        """
+        Runs func() on the worker pool - or its own thread if `long`, for jobs that
+        can take minutes - and hands its result to on_done() on the Tk thread.
+        """
+        future = (submit_long_task if long else submit_task)(func)
+        if on_done:
+            def done(f):
+                try:
+                    result = f.result()
+                except Exception as e:
+                    logger.error(f"Background task failed: {e}")
+                    result = None
+                self.dispatcher.post(on_done, result)
+            future.add_done_callback(done)
+        return future
+
     def show_window(self):
         self.deiconify()
         self.lift()
@@ -69,6 +120,10 @@ class MainWindow(tk.Tk):
         self.notebook.add(self.tab_profiles, text="Profiles")
         self._build_profiles_tab(self.tab_profiles)
 
+        self.tab_diagnostics = ttk.Frame(self.notebook)
+        self.notebook.add(self.tab_diagnostics, text="Diagnostics")
+        self._build_diagnostics_tab(self.tab_diagnostics)
+
     # --- Tab Builders ---
 
     def _build_dashboard_tab(self, parent):
@@ -90,22 +145,38 @@ class MainWindow(tk.Tk):
         self.lbl_temp = ttk.Label(info_frame, text="Temp: ...")
         self.lbl_temp.grid(row=2, column=0, sticky='w', padx=5)
 
+        self.lbl_alerts = ttk.Label(info_frame, text="Alerts: none", foreground="#cc3333")
+        self.lbl_alerts.grid(row=3, column=0, sticky='w', padx=5)
+
+        self.lbl_ollama_health = ttk.Label(info_frame, text="Ollama API: ...")
+        self.lbl_ollama_health.grid(row=4, column=0, sticky='w', padx=5)
+
         # Middle: Active Processes Treeview
         proc_frame = ttk.LabelFrame(parent, text="Active AI Processes", padding=10)
         proc_frame.pack(fill='both', expand=True, padx=10, pady=5)
         
         # Treeview
-        columns = ('pid', 'name', 'vram', 'type')
+        columns = ('pid', 'name', 'vram', 'sm', 'mem', 'enc', 'cpu', 'expires', 'type')
         self.proc_tree = ttk.Treeview(proc_frame, columns=columns, show='headings')
         self.proc_tree.heading('pid', text='PID')
         self.proc_tree.heading('name', text='Process / Model Name')
         self.proc_tree.heading('vram', text='VRAM (MB)')
+        self.proc_tree.heading('sm', text='SM')
+        self.proc_tree.heading('mem', text='Mem')
+        self.proc_tree.heading('enc', text='Enc')
+        self.proc_tree.heading('cpu', text='On CPU')
+        self.proc_tree.heading('expires', text='Unloads In')
         self.proc_tree.heading('type', text='Type')
         
         self.proc_tree.column('pid', width=60)
         self.proc_tree.column('name', width=300)
         self.proc_tree.column('vram', width=100)
-        self.proc_tree.column('type', width=100)
+        self.proc_tree.column('sm', width=50)
+        self.proc_tree.column('mem', width=50)
+        self.proc_tree.column('enc', width=50)
+        self.proc_tree.column('cpu', width=60)
+        self.proc_tree.column('expires', width=80)
+        self.proc_tree.column('type', width=140)
         
         self.proc_tree.pack(side='left', fill='both', expand=True)
         
@@ -113,6 +184,32 @@ class MainWindow(tk.Tk):
         sb.pack(side='right', fill='y')
         self.proc_tree.config(yscrollcommand=sb.set)
         
+        # Requests metered by the local proxy, when enabled
+        usage_frame = ttk.LabelFrame(parent, text="Proxy Usage (last 24 h)", padding=10)
+        usage_frame.pack(fill='x', padx=10, pady=5)
+        usage_bar = ttk.Frame(usage_frame)
+        usage_bar.pack(fill='x')
+        self.lbl_proxy_status = ttk.Label(usage_bar, text="")
+        self.lbl_proxy_status.pack(side='left')
+        self.combo_usage_group = ttk.Combobox(usage_bar, state='readonly', width=14,
+                                              values=['model', 'client', 'model,client'])
+        self.combo_usage_group.set('model')
+        self.combo_usage_group.pack(side='right')
+        self.combo_usage_group.bind('<<ComboboxSelected>>', lambda e: self._refresh_usage(force=True))
+        ttk.Label(usage_bar, text="Group by:").pack(side='right', padx=2)
+        columns = ('key', 'requests', 'cached', 'errors', 'tokens_in', 'tokens_out', 'latency', 'ttft', 'queue',
+                   'overhead')
+        self.usage_tree = ttk.Treeview(usage_frame, columns=columns, show='headings', height=4)
+        for col, text, width in (
+            ('key', 'Model / Client', 200), ('requests', 'Requests', 70), ('cached', 'Cached', 60),
+            ('errors', 'Errors', 60),
+            ('tokens_in', 'Tokens In', 80), ('tokens_out', 'Tokens Out', 80), ('latency', 'p50 ms', 70),
+            ('ttft', 'TTFT p50 ms', 80), ('queue', 'Queue ms', 70), ('overhead', 'Proxy ms', 70)
+        ):
+            self.usage_tree.heading(col, text=text)
+            self.usage_tree.column(col, width=width)
+        self.usage_tree.pack(fill='x', pady=(5, 0))
+
         # Action Bar below Treeview
         action_frame = ttk.Frame(parent, padding=5)
         action_frame.pack(fill='x', padx=10)
@@ -140,8 +237,6 @@ class MainWindow(tk.Tk):
         # Bottom: Game Mode
         btn_gamemode = ttk.Button(parent, text="ACTIVATE GAME MODE (Kill All AI)", command=self._on_game_mode_click)
         btn_gamemode.pack(fill='x', padx=10, pady=10, ipady=5)
-        
-        self.after(2000, self._update_dashboard)
 
     def _build_model_manager_tab(self, parent):
         # Split: Left (List), Right (Details/Actions)
@@ -153,7 +248,19 @@ class MainWindow(tk.Tk):
         paned.add(left_frame, weight=1)
         
         ttk.Label(left_frame, text="Installed Models").pack(anchor='w', padx=5, pady=2)
-        self.mm_listbox = tk.Listbox(left_frame)
+
+        # Filter / sort run against the cached index, never the API
+        query_frame = ttk.Frame(left_frame)
+        query_frame.pack(fill='x', padx=5)
+        self.var_model_filter = tk.StringVar()
+        self.var_model_filter.trace_add('write', lambda *_: self._apply_model_filter())
+        ttk.Entry(query_frame, textvariable=self.var_model_filter).pack(side='left', fill='x', expand=True)
+        self.combo_model_sort = ttk.Combobox(query_frame, state='readonly', width=10, values=list(SORT_KEYS))
+        self.combo_model_sort.set('Name')
+        self.combo_model_sort.pack(side='left', padx=2)
+        self.combo_model_sort.bind('<<ComboboxSelected>>', lambda e: self._apply_model_filter())
+
+        self.mm_listbox = tk.Listbox(left_frame, selectmode='extended')
         self.mm_listbox.pack(fill='both', expand=True, padx=5, pady=5)
         self.mm_listbox.bind('<<ListboxSelect>>', self._on_model_select)
         
@@ -164,11 +271,43 @@ class MainWindow(tk.Tk):
         paned.add(right_frame, weight=2)
         
         ttk.Label(right_frame, text="Model Details", font=('Segoe UI', 10, 'bold')).pack(anchor='w')
-        self.lbl_model_details = ttk.Label(right_frame, text="Select a model...", wraplength=300)
+        self.lbl_model_details = ttk.Label(right_frame, text="Select a model...", wraplength=300, justify='left')
         self.lbl_model_details.pack(anchor='w', pady=10, fill='x')
+
+        ttk.Label(right_frame, text="VRAM Estimate", font=('Segoe UI', 10, 'bold')).pack(anchor='w')
+        estimate_frame = ttk.Frame(right_frame)
+        estimate_frame.pack(fill='x')
+        ttk.Label(estimate_frame, text="Context:").pack(side='left')
+        self.var_estimate_ctx = tk.StringVar(value="4096")
+        ttk.Entry(estimate_frame, textvariable=self.var_estimate_ctx, width=7).pack(side='left', padx=2)
+        ttk.Label(estimate_frame, text="GPU layers:").pack(side='left')
+        self.var_estimate_layers = tk.StringVar(value="") # Empty offloads every layer
+        ttk.Entry(estimate_frame, textvariable=self.var_estimate_layers, width=4).pack(side='left', padx=2)
+        self.var_estimate_ctx.trace_add('write', lambda *_: self._show_vram_estimate())
+        self.var_estimate_layers.trace_add('write', lambda *_: self._show_vram_estimate())
+        self.lbl_vram_estimate = ttk.Label(right_frame, text="", wraplength=300, justify='left')
+        self.lbl_vram_estimate.pack(anchor='w', fill='x', pady=2)
+
+        ttk.Label(right_frame, text="Inference Benchmark", font=('Segoe UI', 10, 'bold')).pack(anchor='w')
+        self.lbl_benchmark = ttk.Label(right_frame, text="", wraplength=300, justify='left')
+        self.lbl_benchmark.pack(anchor='w', fill='x')
+        self.btn_benchmark = ttk.Button(right_frame, text="Benchmark Selected", command=self._benchmark_models)
+        self.btn_benchmark.pack(fill='x', pady=2)
         
         self.btn_delete_model = ttk.Button(right_frame, text="Delete Model", state='disabled', command=self._delete_model)
         self.btn_delete_model.pack(fill='x', pady=5)
+
+        ttk.Label(right_frame, text="Disk Usage", font=('Segoe UI', 10, 'bold')).pack(anchor='w', pady=(10, 0))
+        self.lbl_store_usage = ttk.Label(right_frame, text="Scanning model store...", wraplength=300, justify='left')
+        self.lbl_store_usage.pack(anchor='w', fill='x')
+        self.lbl_selection_usage = ttk.Label(right_frame, text="", wraplength=300, justify='left')
+        self.lbl_selection_usage.pack(anchor='w', fill='x', pady=2)
+
+        self.btn_verify_blobs = ttk.Button(right_frame, text="Verify Blobs", command=self._verify_blobs)
+        self.btn_verify_blobs.pack(fill='x', pady=2)
+        ttk.Button(right_frame, text="Clean Up Orphaned Blobs", command=self._collect_garbage).pack(fill='x', pady=2)
+        self.lbl_verify_status = ttk.Label(right_frame, text="", wraplength=300, justify='left')
+        self.lbl_verify_status.pack(anchor='w', fill='x')
         
         ttk.Separator(right_frame, orient='horizontal').pack(fill='x', pady=10)
         
@@ -176,7 +315,12 @@ class MainWindow(tk.Tk):
         self.entry_pull_tag = ttk.Entry(right_frame)
         self.entry_pull_tag.pack(fill='x', pady=2)
         ttk.Button(right_frame, text="Pull / Install", command=self._pull_model).pack(fill='x', pady=2)
+        ttk.Button(right_frame, text="Import GGUF File...", command=self._import_gguf).pack(fill='x', pady=2)
+        self.lbl_pull_progress = ttk.Label(right_frame, text="", wraplength=300)
+        self.lbl_pull_progress.pack(anchor='w', pady=2, fill='x')
 
+        # Show the cached list right away; the refresh only fetches new digests
+        self._populate_models(self.model_index.models)
         self._refresh_models()
 
     def _build_settings_tab(self, parent):
@@ -224,6 +368,18 @@ class MainWindow(tk.Tk):
         self.var_api_url = tk.StringVar(value=self.app_instance.settings.get('api_url', 'http://localhost:11434'))
         ttk.Entry(api_frame, textvariable=self.var_api_url).pack(fill='x', pady=5)
         ttk.Button(api_frame, text="Save API URL", command=self._save_api_url).pack(anchor='e')
+        self.var_proxy_enabled = tk.BooleanVar(value=self.app_instance.settings.get('proxy_enabled', False))
+        ttk.Checkbutton(api_frame, text="Meter requests through a local proxy (point clients at the proxy port)",
+                        variable=self.var_proxy_enabled, command=self._toggle_proxy).pack(anchor='w')
+        self.var_proxy_cache = tk.BooleanVar(value=self.app_instance.settings.get('proxy_cache_enabled', False))
+        ttk.Checkbutton(api_frame, text="Cache deterministic responses (temperature 0 with a seed, embeddings)",
+                        variable=self.var_proxy_cache, command=self._toggle_proxy).pack(anchor='w')
+        self.var_proxy_batching = tk.BooleanVar(value=self.app_instance.settings.get('proxy_embed_batching', False))
+        ttk.Checkbutton(api_frame, text="Batch concurrent /api/embed requests",
+                        variable=self.var_proxy_batching, command=self._toggle_proxy).pack(anchor='w')
+        self.var_proxy_scheduler = tk.BooleanVar(value=self.app_instance.settings.get('scheduler_enabled', False))
+        ttk.Checkbutton(api_frame, text="Group requests by model to avoid model swaps",
+                        variable=self.var_proxy_scheduler, command=self._toggle_proxy).pack(anchor='w')
         
         # 4. About
         abt_frame = ttk.LabelFrame(scrollable_frame, text="About", padding=10)
@@ -236,53 +392,167 @@ class MainWindow(tk.Tk):
     def _build_profiles_tab(self, parent):
         ttk.Label(parent, text="Profiles Feature - Coming Soon", font=('Segoe UI', 14)).pack(expand=True)
 
+    def _build_diagnostics_tab(self, parent):
+        # Top: Controls
+        ctrl_frame = ttk.Frame(parent, padding=5)
+        ctrl_frame.pack(fill='x', padx=10, pady=5)
+
+        self.var_timing_enabled = tk.BooleanVar(value=timings.enabled)
+        ttk.Checkbutton(ctrl_frame, text="Enable Timing Instrumentation", variable=self.var_timing_enabled, command=self._toggle_timing).pack(side='left')
+        ttk.Button(ctrl_frame, text="Write to Log", command=timings.log_summary).pack(side='right', padx=5)
+        ttk.Button(ctrl_frame, text="Reset", command=self._reset_timings).pack(side='right', padx=5)
+
+        # Middle: Stage Timings Treeview
+        stats_frame = ttk.LabelFrame(parent, text="Stage Timings (ms, rolling window)", padding=10)
+        stats_frame.pack(fill='both', expand=True, padx=10, pady=5)
+
+        columns = ('stage', 'count', 'last', 'p50', 'p95', 'max', 'errors', 'last_error')
+        self.diag_tree = ttk.Treeview(stats_frame, columns=columns, show='headings')
+        for col, text, width in (
+            ('stage', 'Stage', 140), ('count', 'Count', 60), ('last', 'Last', 70),
+            ('p50', 'p50', 70), ('p95', 'p95', 70), ('max', 'Max', 70),
+            ('errors', 'Errors', 60), ('last_error', 'Last Error', 250)
+        ):
+            self.diag_tree.heading(col, text=text)
+            self.diag_tree.column(col, width=width)
+        self.diag_tree.pack(side='left', fill='both', expand=True)
+
+        sb = ttk.Scrollbar(stats_frame, orient='vertical', command=self.diag_tree.yview)
+        sb.pack(side='right', fill='y')
+        self.diag_tree.config(yscrollcommand=sb.set)
+
+        # Bottom: Load Test against the configured API
+        load_frame = ttk.LabelFrame(parent, text="Load Test", padding=10)
+        load_frame.pack(fill='x', padx=10, pady=5)
+        opts = ttk.Frame(load_frame)
+        opts.pack(fill='x')
+        ttk.Label(opts, text="Models:").pack(side='left')
+        self.var_load_models = tk.StringVar() # Comma-separated; empty uses the loaded models
+        ttk.Entry(opts, textvariable=self.var_load_models, width=28).pack(side='left', padx=2)
+        ttk.Label(opts, text="Clients:").pack(side='left')
+        self.var_load_clients = tk.StringVar(value="4")
+        ttk.Spinbox(opts, from_=1, to=64, textvariable=self.var_load_clients, width=4).pack(side='left', padx=2)
+        ttk.Label(opts, text="Seconds:").pack(side='left')
+        self.var_load_duration = tk.StringVar(value="60")
+        ttk.Entry(opts, textvariable=self.var_load_duration, width=5).pack(side='left', padx=2)
+        self.combo_load_mode = ttk.Combobox(opts, state='readonly', width=7, values=['closed', 'open'])
+        self.combo_load_mode.set('closed')
+        self.combo_load_mode.pack(side='left', padx=2)
+        ttk.Label(opts, text="Req/s:").pack(side='left')
+        self.var_load_rate = tk.StringVar(value="1") # Open loop only
+        ttk.Entry(opts, textvariable=self.var_load_rate, width=5).pack(side='left', padx=2)
+        self.btn_load_sweep = ttk.Button(opts, text="Sweep Clients", command=lambda: self._run_load_test(sweep=True))
+        self.btn_load_sweep.pack(side='right', padx=2)
+        self.btn_load_test = ttk.Button(opts, text="Run", command=self._run_load_test)
+        self.btn_load_test.pack(side='right', padx=2)
+        self.lbl_load_test = ttk.Label(load_frame, text="", justify='left')
+        self.lbl_load_test.pack(anchor='w', fill='x', pady=(5, 0))
+
+        self.after(2000, self._update_diagnostics)
+
     # --- Logic ---
 
     def _update_dashboard(self):
+        """
+        Renders the cached snapshot at once, then polls on a worker and renders
+        the result (Refresh button, after actions). The poll waits for a tray tick
+        in progress; the newest snapshot is rendered, whichever poll produced it.
+        """
+        sampler = self.app_instance.sampler
+        self._render_dashboard(sampler.snapshot)
+        self._run_in_background(sampler.poll, lambda _: self._render_dashboard(sampler.snapshot))
+
+    def on_snapshot(self, snapshot: dict):
+        """Receives each tray-loop snapshot via the dispatcher; coalesced to the newest."""
+        if self.state() == 'normal':
+            self._render_dashboard(snapshot)
+
+    def _render_dashboard(self, snapshot):
+        if not snapshot or not snapshot['gpus']:
+            return
         # GPU Info
-        gpu_info = self.app_instance.hardware_monitor.get_gpu_info()
-        if gpu_info:
-            self.lbl_gpu_name.config(text=f"GPU: {gpu_info.get('name', 'Unknown')}")
-            vram_txt = f"{gpu_info.get('vram_used', '?')} / {gpu_info.get('vram_total', '?')} ({gpu_info.get('gpu_utilization', '?')})"
-            self.lbl_vram_usage.config(text=vram_txt)
-            self.lbl_temp.config(text=f"Temp: {gpu_info.get('temperature', '?')}")
-            
-            # --- Update Active Processes Tree ---
-            # Keep track of what we've seen to avoid dupes (PID based)
-            seen_pids = set()
-            
-            # Clear current
-            for item in self.proc_tree.get_children():
-                self.proc_tree.delete(item)
-                
-            # 1. Add Ollama Active Model (from API)
-            ollama_status = self.app_instance.get_ollama_model_status()
-            if "Running" not in ollama_status and "Error" not in ollama_status and "Idle" not in ollama_status and "No" not in ollama_status:
-                 self.proc_tree.insert('', 'end', values=('API', ollama_status, '-', 'Ollama API'))
-
-            # 2. Add GPU Processes (from Hardware Monitor)
-            for p in gpu_info.get('processes', []):
-                self.proc_tree.insert('', 'end', values=(p['pid'], p['name'], p.get('vram_used_mb', '?'), p['type']))
-                seen_pids.add(p['pid'])
-
-            # 3. Add External Models (from Process Watcher)
-            # This finds things NOT on GPU (or not seen by NVML)
-            # We need the full process info, not just names, so we redo the psutil check here locally or get richer data from main
-            # Let's do a local psutil check against settings
-            ext_models = self.app_instance.settings.get('external_models', [])
-            for em in ext_models:
-                target_exe = em.get('process', '').lower()
-                for proc in psutil.process_iter(['pid', 'name']):
-                    try:
-                        if proc.info['name'].lower() == target_exe:
-                            if proc.info['pid'] not in seen_pids:
-                                self.proc_tree.insert('', 'end', values=(proc.info['pid'], em.get('name', proc.info['name']), '-', 'External (CPU/Other)'))
-                                seen_pids.add(proc.info['pid'])
-                    except: pass
+        gpu_info = snapshot['gpus'][0]
+        self.lbl_gpu_name.config(text=f"GPU: {gpu_info.get('name', 'Unknown')}")
+        vram_txt = f"{gpu_info.get('vram_used', '?')} / {gpu_info.get('vram_total', '?')} ({gpu_info.get('gpu_utilization', '?')})"
+        self.lbl_vram_usage.config(text=vram_txt)
+        self.lbl_temp.config(text=f"Temp: {gpu_info.get('temperature', '?')}")
+        alerts = self.app_instance.alerts
+        active = [event['message'] for event in list(alerts.active.values())] if alerts else []
+        self.lbl_alerts.config(text=f"Alerts: {'; '.join(active)}" if active else "Alerts: none")
+        self.lbl_ollama_health.config(text=format_health(snapshot['ollama_health']))
 
+        # --- Update Active Processes Tree ---
+        rows = build_process_rows(gpu_info, snapshot['loaded_models'], snapshot['external_models'])
 
-        if self.state() == 'normal':
-            self.after(2000, self._update_dashboard)
+        # Clear current
+        for item in self.proc_tree.get_children():
+            self.proc_tree.delete(item)
+
+        for row in rows:
+            self.proc_tree.insert('', 'end', values=row)
+
+        # The selected model may have just been loaded; compare against its real footprint
+        self._show_vram_estimate()
+        self._refresh_usage()
+
+    def _refresh_usage(self, force: bool = False):
+        """Queries the proxy usage store on a worker, at most every USAGE_REFRESH seconds."""
+        store = self.app_instance.usage_store
+        proxy = self.app_instance.proxy
+        status = f"Proxy on {proxy.url}" if proxy else "Proxy disabled (Settings > Ollama API)"
+        if proxy and proxy.cache:
+            c = proxy.cache.usage()
+            status += (f"   Cache: {c['hits']} hits, {c['misses']} misses, {c['bypassed']} not cacheable, "
+                       f"{format_bytes(c['memory_bytes'])} in memory, {format_bytes(c['disk_bytes'])} on disk")
+        if proxy and proxy.batcher:
+            b = proxy.batcher.usage()
+            status += f"   Embedding batches: {b['batches']} for {b['requests']} requests (mean {b['mean_batch']:.1f} inputs)"
+        if proxy and proxy.scheduler:
+            q = proxy.scheduler.usage()
+            status += f"   Scheduler: {q['swaps']} swaps, {q['loads']} loads, {q['queued']} queued"
+        self.lbl_proxy_status.config(text=status)
+        if store is None or (not force and time.monotonic() - self._usage_refreshed < USAGE_REFRESH):
+            return
+        self._usage_refreshed = time.monotonic()
+        group_by = self.combo_usage_group.get()
+        self._run_in_background(lambda: store.summary(time.time() - 86400, group_by), self._show_usage)
+
+    def _show_usage(self, rows):
+        for item in self.usage_tree.get_children():
+            self.usage_tree.delete(item)
+        def ms(value):
+            return f"{value * 1000:.0f}" if value is not None else ""
+        for row in rows or []:
+            key = " @ ".join(str(row[k]) for k in ('model', 'client') if k in row)
+            self.usage_tree.insert('', 'end', values=(
+                key, row['requests'], row['cache_hits'], row['errors'], row['prompt_tokens'], row['eval_tokens'],
+                ms(row['latency_p50']), ms(row['ttft_p50']), ms(row['queue_wait']),
+                f"{row['overhead'] * 1000:.2f}" if row['overhead'] is not None else ""
+            ))
+
+    def _update_diagnostics(self):
+        # Only redraw while the Diagnostics tab is actually visible
+        if self.state() == 'normal' and self.notebook.select() == str(self.tab_diagnostics):
+            for item in self.diag_tree.get_children():
+                self.diag_tree.delete(item)
+            for stage, st in timings.stats().items():
+                self.diag_tree.insert('', 'end', values=(
+                    stage, st['count'],
+                    f"{st['last']*1000:.2f}", f"{st['p50']*1000:.2f}",
+                    f"{st['p95']*1000:.2f}", f"{st['max']*1000:.2f}",
+                    st['errors'], st['last_error']
+                ))
+        self.after(2000, self._update_diagnostics)
+
+    def _toggle_timing(self):
+        timings.enabled = self.var_timing_enabled.get()
+        self.app_instance.settings['diagnostics_enabled'] = timings.enabled
+        self.app_instance.save_settings()
+
+    def _reset_timings(self):
+        timings.reset()
+        for item in self.diag_tree.get_children():
+            self.diag_tree.delete(item)
 
     def _stop_selected_process(self):
         sel = self.proc_tree.selection()
@@ -292,15 +562,17 @@ class MainWindow(tk.Tk):
         pid = item['values'][0]
         name = item['values'][1]
         
-        if str(pid) == "API":
-            # Stop Ollama Model
-            model_name = name.split(' ')[0] # Naive parse
+        if str(pid) == OLLAMA_ROW_ID:
+            model_name = str(name) # Loaded-model rows carry the exact model name
             if messagebox.askyesno("Unload Model", f"Unload model '{model_name}'?"):
-                # Run ollama run model "" to unload? or stop? 'stop' is not always standard in CLI without custom API.
-                # Best way to unload in Ollama is to load an empty model or stop the server, but 'ollama stop' works in newer versions
-                cmd = f"ollama stop {model_name}"
-                run_hidden_powershell_cmd(cmd)
-                messagebox.showinfo("Sent", f"Sent stop command for {model_name}")
+                # keep_alive 0 unloads just this model; the server and other models keep running
+                def on_done(ok):
+                    if ok:
+                        messagebox.showinfo("Unloaded", f"Unloaded {model_name}")
+                        self._update_dashboard()
+                    else:
+                        messagebox.showerror("Error", f"Failed to unload {model_name}. See logs for details.")
+                self._run_in_background(lambda: self.app_instance.sampler.unload_model(model_name), on_done)
         else:
             # Real Process
             if messagebox.askyesno("Kill Process", f"Force kill process {name} (PID: {pid})?"):
@@ -315,10 +587,13 @@ class MainWindow(tk.Tk):
     def _quick_load_model(self):
         model = self.combo_quick_load.get()
         if model:
-            run_hidden_powershell_cmd(f"ollama run {model}") # This might open a shell? 'run' is interactive.
-            # We should probably use 'pull' or just hit the API to 'generate' empty to load it?
-            # For now, just alerting user this is a stub or basic attempt
-            messagebox.showinfo("Load", f"Requesting load for {model} (Feature pending implementation)")
+            def on_done(ok):
+                if ok:
+                    self._update_dashboard()
+                else:
+                    messagebox.showerror("Load", f"Failed to load {model}. See logs for details.")
+            self._run_in_background(lambda: self.ollama_manager.load_model(model), on_done, long=True)
+            messagebox.showinfo("Load", f"Loading {model} in background...")
             
     def _quick_load_profile(self):
         profile = self.combo_profile_load.get()
@@ -331,39 +606,405 @@ class MainWindow(tk.Tk):
 
     # Model Manager Logic
     def _refresh_models(self):
-        self.mm_listbox.delete(0, tk.END)
-        models = self.ollama_manager.list_models()
-        model_names = [m['name'] for m in models]
-        for name in model_names:
-            self.mm_listbox.insert(tk.END, name)
-        
+        self._run_in_background(self.model_index.refresh, self._populate_models)
+        root = self.app_instance.config.get('ollama_models_dir') or None
+        if root and root != self.model_store.root:
+            self.model_store = self._create_model_store()
+        self._run_in_background(self.model_store.analyze, self._show_store_usage)
+
+    def _show_store_usage(self, usage):
+        self.store_usage = usage
+        if usage is None or not usage.models:
+            self.lbl_store_usage.config(text=f"No local model store found at {self.model_store.root}")
+        else:
+            shared = sum(size for d, size in usage.blob_sizes.items() if len(usage.refs.get(d, ())) > 1)
+            unreferenced = sum(usage.unreferenced.values()) + sum(size for _, size, _ in usage.partials)
+            self.lbl_store_usage.config(text=(
+                f"{len(usage.models)} models, {format_bytes(usage.total_bytes)} on disk\n"
+                f"Shared between models: {format_bytes(shared)}\n"
+                f"Unreferenced / partial: {format_bytes(unreferenced)}"
+            ))
+        self._show_selection_usage()
+
+    def _selected_models(self) -> list[str]:
+        return [self.mm_listbox.get(i) for i in self.mm_listbox.curselection()]
+
+    def _show_selection_usage(self):
+        usage = self.store_usage
+        names = self._selected_models()
+        if usage is None or not names:
+            self.lbl_selection_usage.config(text="")
+            return
+        lines = []
+        if len(names) == 1 and names[0] in usage.models:
+            m = usage.models[names[0]]
+            lines.append(f"Unique: {format_bytes(m['unique'])}   Shared: {format_bytes(m['shared'])}")
+        lines.append(f"Deleting {'this model' if len(names) == 1 else f'{len(names)} models'} frees {format_bytes(usage.reclaimable(names))}")
+        self.lbl_selection_usage.config(text="\n".join(lines))
+
+    def _populate_models(self, models):
+        self._apply_model_filter()
+
         # Update quick load combo
-        self.combo_quick_load['values'] = model_names
+        self.combo_quick_load['values'] = sorted(m['name'] for m in models or [])
+
+    def _apply_model_filter(self):
+        models = self.model_index.query(self.var_model_filter.get(), self.combo_model_sort.get(),
+                                        descending=self.combo_model_sort.get() in ('Size', 'Parameters', 'Modified'))
+        self.mm_listbox.delete(0, tk.END)
+        for m in models:
+            self.mm_listbox.insert(tk.END, m['name'])
+        self.btn_delete_model.config(state='disabled')
+        self._show_selection_usage()
 
     def _on_model_select(self, event):
         sel = self.mm_listbox.curselection()
         if sel:
             self.btn_delete_model.config(state='normal')
             model_name = self.mm_listbox.get(sel[0])
-            self.lbl_model_details.config(text=f"Selected: {model_name}")
+            model = self.model_index.get(model_name)
+            self.lbl_model_details.config(text=format_details(model) if model else f"Selected: {model_name}")
+            if self._vram_model is None or self._vram_model[0] != model_name:
+                self._vram_model = None
+                self.lbl_vram_estimate.config(text="Reading model header...")
+                self._run_in_background(lambda: self._read_model_header(model_name), self._on_model_header)
+            if not self._benchmarking:
+                self._show_benchmark_result(model_name)
         else:
             self.btn_delete_model.config(state='disabled')
+        self._show_selection_usage()
+
+    def _read_model_header(self, name: str):
+        """Worker thread: (name, blob path, GgufInfo or None, error message) for the model's weights blob."""
+        path = self.model_store.weights_path(name)
+        if path is None:
+            return name, None, None, ""
+        info = self._gguf_headers.get(path)
+        if info is None:
+            try:
+                with timings.timed('gguf.read_header'):
+                    info = read_gguf(path)
+            except (OSError, ValueError) as e: # GgufError is a ValueError, as is mmap on an empty file
+                logger.error(f"Could not read GGUF header of {name}: {e}")
+                return name, path, None, str(e)
+        return name, path, info, ""
+
+    def _on_model_header(self, result):
+        if not result:
+            self.lbl_vram_estimate.config(text="Could not read the model header.")
+            return
+        name, path, info, error = result
+        if info is not None:
+            self._gguf_headers[path] = info # Only written here, on the Tk thread
+        sel = self.mm_listbox.curselection()
+        if not sel or self.mm_listbox.get(sel[0]) != name:
+            return # Selection moved on while the header was being read
+        if error:
+            self.lbl_vram_estimate.config(text=f"Could not read the model header: {error}")
+            return
+        if info is None:
+            self.lbl_vram_estimate.config(text="No local GGUF weights for this model.")
+            return
+        self._vram_model = (name, info)
+        self._show_vram_estimate()
+
+    def _show_vram_estimate(self):
+        if self._vram_model is None:
+            return
+        name, info = self._vram_model
+        try:
+            num_ctx = int(self.var_estimate_ctx.get())
+            layers_text = self.var_estimate_layers.get().strip()
+            gpu_layers = int(layers_text) if layers_text else None
+        except ValueError:
+            self.lbl_vram_estimate.config(text="Context and GPU layers must be whole numbers.")
+            return
+        # Ollama reads these from its own environment; ours is the best guess for a local server
+        flash_attention = os.environ.get('OLLAMA_FLASH_ATTENTION', '').lower() in ('1', 'true')
+        kv_cache_type = os.environ.get('OLLAMA_KV_CACHE_TYPE', 'f16').lower() if flash_attention else 'f16'
+        estimate = estimate_vram(info, num_ctx, gpu_layers, kv_cache_type, flash_attention=flash_attention)
+
+        lines = [
+            f"{info.architecture}, {info.block_count} layers, {info.head_count} heads "
+            f"({info.head_count_kv} KV), embedding {info.embedding_length}, max context {info.context_length}",
+            "Quantization: " + ", ".join(f"{t} {format_bytes(b)}" for t, b in list(info.quantization().items())[:3]),
+            f"Weights {format_bytes(estimate['weights'])} + KV cache {format_bytes(estimate['kv_cache'])} "
+            f"+ compute {format_bytes(estimate['graph'])} = {format_bytes(estimate['total'])} "
+            f"({estimate['gpu_layers']}/{estimate['layers']} layers on GPU)",
+        ]
+        snapshot = self.app_instance.sampler.snapshot
+        vram_total = sum(g.get('vram_total_bytes') or 0 for g in snapshot.get('gpus', []))
+        if vram_total:
+            verdict = "fits in" if estimate['total'] <= vram_total else "exceeds"
+            lines.append(f"Estimate {verdict} {format_bytes(vram_total)} of VRAM")
+
+        loaded = next((m for m in snapshot.get('ollama_models', []) if m.get('name') == name), None)
+        if loaded and loaded.get('size_vram'):
+            actual = loaded['size_vram']
+            # Compare like with like: re-estimate at the context Ollama actually loaded with
+            ctx = loaded.get('context_length') or num_ctx
+            loaded_layers = None if actual >= loaded.get('size', 0) else gpu_layers # Fully offloaded, or as entered
+            predicted = estimate_vram(info, ctx, loaded_layers, kv_cache_type, flash_attention=flash_attention)['total']
+            lines.append(f"Loaded: {format_bytes(actual)} in VRAM; estimate at context {ctx} was "
+                         f"{format_bytes(predicted)} ({(predicted - actual) / actual:+.0%})")
+        self.lbl_vram_estimate.config(text="\n".join(lines))
+
+    def _show_benchmark_result(self, name: str):
+        model = self.model_index.get(name)
+        results = self.benchmark.results_for(model['digest']) if model else {}
+        hardware = hardware_key(self.app_instance.sampler.snapshot.get('gpus', []))
+        if hardware in results:
+            result = results[hardware]
+            text = f"{format_result(result)}\nMeasured {time.strftime('%Y-%m-%d %H:%M', time.localtime(result['timestamp']))}"
+        elif results:
+            other, result = max(results.items(), key=lambda kv: kv[1]['timestamp'])
+            text = f"{format_result(result)}\nMeasured on other hardware: {other}"
+        else:
+            text = "Not benchmarked on this machine yet."
+        self.lbl_benchmark.config(text=text)
+
+    def _benchmark_models(self):
+        if self._benchmarking:
+            self.benchmark.cancel()
+            return
+        models = [(name, self.model_index.get(name)) for name in self._selected_models()]
+        models = [(name, m['digest']) for name, m in models if m]
+        if not models:
+            messagebox.showinfo("Benchmark", "Select one or more models first.")
+            return
+        if not messagebox.askyesno("Benchmark", f"Benchmark {len(models)} model(s)? Each one is unloaded and "
+                                   "reloaded, which interrupts anything using it."):
+            return
+        config = self.app_instance.config
+        prompts = config.get('benchmark_prompts') or None
+        num_predict = config.get('benchmark_num_predict', 128)
+        hardware = hardware_key(self.app_instance.sampler.snapshot.get('gpus', []))
+        self._benchmarking = True
+        self.btn_benchmark.config(text="Cancel Benchmark")
+
+        def on_progress(name, done, total):
+            self.dispatcher.post_latest('benchmark_progress', self._show_benchmark_status,
+                                        f"Benchmarking {name}: run {done}/{total}...")
+
+        def on_done(results):
+            self._benchmarking = False
+            self.btn_benchmark.config(text="Benchmark Selected")
+            failed = [r for r in results or [] if r['error'] and r['error'] != "Cancelled"]
+            sel = self.mm_listbox.curselection()
+            if sel:
+                self._show_benchmark_result(self.mm_listbox.get(sel[0]))
+            if results is None or failed:
+                detail = "\n".join(f"{r['model']}: {r['error']}" for r in failed)
+                messagebox.showerror("Benchmark", f"Benchmark did not finish.\n{detail}")
+        self._show_benchmark_status("Starting benchmark...")
+        self._run_in_background(lambda: self.benchmark.run_many(models, hardware, prompts, num_predict, on_progress),
+                                on_done, long=True)
+
+    def _run_load_test(self, sweep: bool = False):
+        if self._load_testing:
+            self.load_tester.cancel()
+            return
+        models = [m.strip() for m in self.var_load_models.get().split(',') if m.strip()]
+        if not models:
+            models = [m['name'] for m in self.app_instance.sampler.snapshot.get('ollama_models', [])]
+        if not models:
+            messagebox.showinfo("Load Test", "Enter model names, or load a model first.")
+            return
+        try:
+            clients = int(self.var_load_clients.get())
+            duration = float(self.var_load_duration.get())
+            rate = float(self.var_load_rate.get()) if self.combo_load_mode.get() == 'open' else None
+        except ValueError:
+            messagebox.showerror("Load Test", "Clients, seconds and req/s must be numbers.")
+            return
+        mode = self.combo_load_mode.get()
+        self._load_testing = True
+        self.btn_load_test.config(text="Cancel")
+        self.btn_load_sweep.config(state='disabled')
+        levels = tuple(level for level in SWEEP_LEVELS if level <= max(clients, 1))
+        lines = []
+
+        def on_progress(done, errors, elapsed):
+            self.dispatcher.post_latest('load_progress', self._show_load_status,
+                                        "\n".join(lines + [f"{elapsed:.0f} s: {done} requests, {errors} errors"]))
+
+        def on_level(summary):
+            lines.append(f"{summary['concurrency']} clients: {summary['tokens_per_s']:.1f} tok/s, "
+                         f"TTFT p90 {(summary['ttft']['p90'] or 0) * 1000:.0f} ms, "
+                         f"queue p90 {(summary['queue']['p90'] or 0) * 1000:.0f} ms, {summary['errors']} errors")
+
+        def work():
+            if sweep:
+                return self.load_tester.sweep(models, levels, duration, on_level=on_level, on_progress=on_progress)
+            return self.load_tester.run(models, clients, duration, mode, rate, on_progress=on_progress).summary()
+
+        def on_done(result):
+            if result is None:
+                self._show_load_status("Load test failed. See logs for details.")
+            elif sweep:
+                parallel = suggest_parallel(result)
+                suggestion = (f"Suggested OLLAMA_NUM_PARALLEL: {parallel}" if parallel
+                              else "No error-free level to suggest OLLAMA_NUM_PARALLEL from.")
+                self._show_load_status("\n".join(lines + [suggestion]))
+            else:
+                self._show_load_status(format_summary(result))
+            self._load_testing = False
+            self.btn_load_test.config(text="Run")
+            self.btn_load_sweep.config(state='normal')
+        self._show_load_status(f"Starting load test against {', '.join(models)}...")
+        self._run_in_background(work, on_done, long=True)
+
+    def _show_load_status(self, text: str):
+        self.lbl_load_test.config(text=text)
+
+    def _show_benchmark_status(self, text: str):
+        if self._benchmarking:
+            self.lbl_benchmark.config(text=text)
+
+    def _verify_blobs(self):
+        if self._verifier:
+            self._verifier.cancel()
+            return
+        state_file = os.path.join(os.path.dirname(self.app_instance.config.settings_file), 'blob_verify.json')
+        verifier = self._verifier = BlobVerifier(self.model_store, state_file)
+        self.btn_verify_blobs.config(text="Cancel Verification")
+        start = time.perf_counter()
+
+        def on_progress(done, total, done_bytes, total_bytes):
+            rate = done_bytes / max(time.perf_counter() - start, 1e-6)
+            self.dispatcher.post_latest('verify_progress', self._show_verify_status,
+                                        f"Verified {done}/{total} blobs, {format_bytes(done_bytes)} of "
+                                        f"{format_bytes(total_bytes)} ({format_bytes(rate)}/s)")
+
+        def on_done(report):
+            self._verifier = None
+            self.btn_verify_blobs.config(text="Verify Blobs")
+            if report is None:
+                self._show_verify_status("Verification failed. See logs for details.")
+                return
+            self._show_verify_status(
+                f"{'Cancelled' if report.cancelled else 'Done'}: {report.checked} hashed, "
+                f"{report.skipped} unchanged, {len(report.corrupt)} corrupt "
+                f"({format_bytes(report.throughput)}/s)"
+            )
+            if report.corrupt:
+                names = "\n".join(digest for digest, _, _ in report.corrupt[:10])
+                messagebox.showerror("Verify Blobs", f"{len(report.corrupt)} blobs failed verification:\n{names}\n\n"
+                                     "Re-pull the models that use them.")
+        self._run_in_background(lambda: verifier.verify(on_progress=on_progress), on_done, long=True)
+
+    def _collect_garbage(self):
+        store = self.model_store
+
+        def on_scanned(result):
+            if result is None or result.blocked:
+                messagebox.showerror("Clean Up", f"Could not scan the model store{': ' + result.blocked if result else ''}."
+                                     "\n\nNothing was deleted.")
+                return
+            if not result.candidates:
+                extra = f" ({result.too_recent} recent ones kept)" if result.too_recent else ""
+                messagebox.showinfo("Clean Up", f"No orphaned blobs or partial downloads{extra}.")
+                return
+            partials = sum(1 for _, _, kind in result.candidates if kind == 'partial')
+            if messagebox.askyesno("Clean Up", (
+                f"Found {len(result.candidates) - partials} unreferenced blobs and {partials} partial downloads "
+                f"using {format_bytes(result.reclaimable)}.\n\nDelete them?"
+            )):
+                self._run_in_background(lambda: self.ollama_manager.collect_garbage(store, dry_run=False), on_deleted,
+                                        long=True)
+
+        def on_deleted(result):
+            if result is None:
+                messagebox.showerror("Clean Up", "Clean up failed. See logs for details.")
+            elif result.blocked:
+                messagebox.showwarning("Clean Up", f"Nothing was deleted: {result.blocked}. Try again later.")
+            else:
+                msg = f"Freed {format_bytes(result.freed)} ({len(result.deleted)} files)."
+                if result.failed:
+                    msg += f"\n{len(result.failed)} files could not be removed. See logs for details."
+                messagebox.showinfo("Clean Up", msg)
+            self._run_in_background(self.model_store.analyze, self._show_store_usage)
+
+        self._run_in_background(lambda: self.ollama_manager.collect_garbage(store, dry_run=True), on_scanned, long=True)
+
+    def _show_verify_status(self, text: str):
+        self.lbl_verify_status.config(text=text)
 
     def _pull_model(self):
         tag = self.entry_pull_tag.get()
         if tag:
-            self.ollama_manager.pull_model(tag) 
+            def on_progress(line):
+                # Runs on the pull's reader thread, once per output line; only the newest line is drawn
+                self.dispatcher.post_latest('pull_progress', self._show_pull_progress, f"{tag}: {line}")
+
+            def on_done(ok):
+                self._show_pull_progress("")
+                if ok:
+                    messagebox.showinfo("Pull", f"Pulled {tag}")
+                    self._refresh_models()
+                else:
+                    messagebox.showerror("Pull", f"Failed to pull {tag}. See logs for details.")
+            self._run_in_background(lambda: self.ollama_manager.pull_model(tag, on_progress), on_done, long=True)
             messagebox.showinfo("Pull", f"Pulling {tag} in background...")
 
-    def _delete_model(self):
-        sel = self.mm_listbox.curselection()
-        if sel:
-            model = self.mm_listbox.get(sel[0])
-            if messagebox.askyesno("Delete", f"Delete {model}?"):
-                self.ollama_manager.delete_model(model)
+    def _import_gguf(self):
+        path = filedialog.askopenfilename(title="Import GGUF", filetypes=[("GGUF models", "*.gguf"), ("All files", "*.*")])
+        if not path:
+            return
+        default_name = os.path.splitext(os.path.basename(path))[0].lower()
+        name = simpledialog.askstring("Import GGUF", "Model name:", initialvalue=default_name, parent=self)
+        if not name:
+            return
+        state_file = os.path.join(os.path.dirname(self.app_instance.config.settings_file), 'import_digests.json')
+        importer = GgufImporter(self.app_instance.config, state_file)
+
+        def on_progress(phase, done, total):
+            if phase == 'hash':
+                text = f"{name}: hashing {format_bytes(done)} / {format_bytes(total)}"
+            elif phase == 'upload':
+                text = f"{name}: uploading {format_bytes(done)} / {format_bytes(total)}"
+            else:
+                text = f"{name}: {phase}"
+            self.dispatcher.post_latest('pull_progress', self._show_pull_progress, text)
+
+        def on_done(result):
+            self._show_pull_progress("")
+            if result and result.ok:
+                messagebox.showinfo("Import", f"Imported {name} in {result.duration:.0f}s")
                 self._refresh_models()
+            else:
+                messagebox.showerror("Import", f"Failed to import {name}: {result.error if result else 'see logs'}")
+        self._run_in_background(lambda: importer.import_file(path, name, on_progress=on_progress), on_done, long=True)
+
+    def _show_pull_progress(self, text: str):
+        self.lbl_pull_progress.config(text=text)
+
+    def _delete_model(self):
+        models = self._selected_models()
+        if models:
+            label = models[0] if len(models) == 1 else f"{len(models)} models"
+            if messagebox.askyesno("Delete", f"Delete {label}?"):
+                def on_done(failed):
+                    if failed:
+                        messagebox.showerror("Delete", f"Failed to delete {', '.join(failed)}. See logs for details.")
+                    self._refresh_models()
+                self._run_in_background(
+                    lambda: [m for m in models if not self.ollama_manager.delete_model(m)], on_done, long=True
+                )
 
     # Settings Logic
+    def refresh_settings_views(self):
+        """Re-reads settings into the Settings / Diagnostics widgets (after a hot reload)."""
+        settings = self.app_instance.settings
+        self._refresh_ext_models_list()
+        self.var_startup.set(settings.get('startup', False))
+        self.var_api_url.set(settings.get('api_url', 'http://localhost:11434'))
+        self.var_timing_enabled.set(settings.get('diagnostics_enabled', False))
+        self.var_proxy_enabled.set(settings.get('proxy_enabled', False))
+        self.var_proxy_cache.set(settings.get('proxy_cache_enabled', False))
+        self.var_proxy_batching.set(settings.get('proxy_embed_batching', False))
+        self.var_proxy_scheduler.set(settings.get('scheduler_enabled', False))
+
     def _refresh_ext_models_list(self):
         self.list_ext_models.delete(0, tk.END)
         for m in self.app_instance.settings.get('external_models', []):
@@ -396,6 +1037,13 @@ class MainWindow(tk.Tk):
     def _toggle_startup(self):
         pass 
 
+    def _toggle_proxy(self):
+        self.app_instance.settings['proxy_enabled'] = self.var_proxy_enabled.get()
+        self.app_instance.settings['proxy_cache_enabled'] = self.var_proxy_cache.get()
+        self.app_instance.settings['proxy_embed_batching'] = self.var_proxy_batching.get()
+        self.app_instance.settings['scheduler_enabled'] = self.var_proxy_scheduler.get()
+        self.app_instance.save_settings()
+
     def _save_api_url(self):
         url = self.var_api_url.get()
         self.app_instance.settings['api_url'] = url
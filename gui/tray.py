@@ -20,7 +20,6 @@ class TrayIcon:
         self.icon: Optional[pystray.Icon] = None
         self.should_run = True
         self.current_status_message = "Initializing..."
-        self.last_status_message = None 
 
         # Icon paths
         self.icons_dir = os.path.join(
@@ -64,7 +63,8 @@ class TrayIcon:
     def _on_open_dashboard(self, icon=None, item=None):
         """Opens the Unified Main Window."""
         logger.info("Open Dashboard selected from tray menu.")
-        self.app_instance.main_window.after(0, self.app_instance.show_main_window)
+        # Runs on the pystray thread; Tk must only be touched from its own loop
+        self.app_instance.main_window.dispatcher.post(self.app_instance.show_main_window)
 
     def _on_game_mode(self, icon=None, item=None):
         logger.info("Game Mode selected from tray menu.")
@@ -72,27 +72,14 @@ class TrayIcon:
 
     def _on_exit(self, icon=None, item=None):
         logger.info("Exit selected from tray menu.")
-        self.app_instance.stop() 
+        self.app_instance.main_window.dispatcher.post(self.app_instance.stop)
 
     def update_status_loop(self):
         while self.should_run:
             new_status_message = self.app_instance.get_overall_status() 
             
-            if new_status_message != self.current_status_message:
-                self.current_status_message = new_status_message
-                
-                should_notify = False
-                if self.last_status_message is None:
-                    should_notify = True
-                elif "Idle" in self.last_status_message and "Idle" not in new_status_message:
-                    should_notify = True 
-                elif "Error" in new_status_message and "Error" not in self.last_status_message:
-                    should_notify = True
-                
-                if should_notify:
-                    self.icon.notify(new_status_message)
-                
-                self.last_status_message = new_status_message
+            # Notifications come from the alert rules (core/alerts.py), evaluated on the same poll
+            self.current_status_message = new_status_message
 
             if self.icon:
                 # Update icon visual and tooltip
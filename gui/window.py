@@ -1,6 +1,7 @@
 # gui/window.py
 import os
 import sys
+import threading
 import webbrowser
 import tkinter as tk
 from tkinter import ttk, messagebox
@@ -17,6 +18,7 @@ import logging
 logger = logging.getLogger('LMM')
 
 from core.model_manager import OllamaManager # Import OllamaManager
+from gui.dispatcher import UiDispatcher
 
 class SettingsWindow:
     """Settings window for LMM configuration."""
@@ -351,6 +353,8 @@ class ModelManagerWindow:
         self.window.title("LMM - Model Manager")
         self.window.geometry("600x500")
         self.window.resizable(False, False)
+        self.dispatcher = UiDispatcher(self.window)
+        self.dispatcher.start()
 
         self.style = ttk.Style()
         self.style.theme_use('vista')
@@ -474,7 +478,7 @@ class ModelManagerWindow:
         def pull_thread():
             logger.info(f"Initiating pull for model: {model_tag}")
             success = self.ollama_manager.pull_model(model_tag)
-            self.window.after(0, lambda: self._pull_complete(success, model_tag)) # Update GUI on main thread
+            self.dispatcher.post(self._pull_complete, success, model_tag) # Update GUI on main thread
 
         threading.Thread(target=pull_thread, daemon=True).start()
 
@@ -513,7 +517,7 @@ class ModelManagerWindow:
         def delete_thread():
             logger.info(f"Initiating delete for model: {model_name}")
             success = self.ollama_manager.delete_model(model_name)
-            self.window.after(0, lambda: self._delete_complete(success, model_name)) # Update GUI on main thread
+            self.dispatcher.post(self._delete_complete, success, model_name) # Update GUI on main thread
 
         threading.Thread(target=delete_thread, daemon=True).start()
 
@@ -4,24 +4,39 @@ import sys
 import threading
 import time
 import logging
-import psutil
+import argparse
+import multiprocessing
 from datetime import datetime
 from logging.handlers import RotatingFileHandler
 from typing import Optional, List
-from urllib.parse import urlparse
-
-import httpx 
 
 # Local imports
 from __version__ import __version__, __author__, __copyright__
 from utils.config import ConfigManager
+from utils.log import JsonLinesFormatter, start_queue_logging
 from core.hardware import HardwareMonitor
 from core.model_manager import OllamaManager
+from core.sampler import StatusSampler, format_overall_status
+from core.metrics import MetricsServer
+from core.proxy import MeteringProxy, UsageStore
+from core.response_cache import ResponseCache
+from core.embed_batcher import EmbeddingBatcher
+from core.scheduler import ModelScheduler
+from core.alerts import AlertEngine, WebhookSink, merge_rules
+from core.telemetry import TelemetryRecorder, ReplaySource, ReplaySampler
+from core.instrumentation import timings
+from core import commands
 from gui.tray import TrayIcon
 from gui.main_window import MainWindow # Use the new Main Window
 
+TEXT_LOG_FORMAT = '%(asctime)s [%(levelname)s] %(message)s'
+
 def setup_logging():
-    """Setup logging configuration for LMM."""
+    """
+    Setup logging configuration for LMM. Records are queued and written by a
+    listener thread; returns (logger, listener), the listener's first handler
+    being the log file.
+    """
     log_dir = os.path.join(os.getenv('APPDATA'), 'LMM', 'logs')
     os.makedirs(log_dir, exist_ok=True)
     
@@ -39,9 +54,7 @@ def setup_logging():
     
     console_handler = logging.StreamHandler()
     
-    file_formatter = logging.Formatter(
-        '%(asctime)s [%(levelname)s] %(message)s'
-    )
+    file_formatter = logging.Formatter(TEXT_LOG_FORMAT)
     console_formatter = logging.Formatter(
         '[%(levelname)s] %(message)s'
     )
@@ -51,27 +64,48 @@ def setup_logging():
     logger = logging.getLogger('LMM')
     logger.setLevel(logging.INFO)
     
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    # File and console I/O happen on the listener thread, off the polling threads
+    listener = start_queue_logging(logger, [file_handler, console_handler])
     
-    return logger
+    return logger, listener
 
 class LMMApp:
     """Main application class for Local Model Manager."""
     
-    def __init__(self):
-        self.logger = setup_logging()
+    def __init__(self, record: Optional[str] = None, replay: Optional[str] = None, replay_speed: float = 1.0):
+        """
+        Args:
+            record: Write every polled tick to this telemetry recording.
+            replay: Poll this recording (see core/telemetry.py) instead of the GPU, processes and API.
+            replay_speed: Replay speed multiplier; 0 steps one recorded tick per poll.
+        """
+        self.logger, self.log_listener = setup_logging()
         self.logger.info(f"Starting Local Model Manager v{__version__}")
         
         self.config = ConfigManager()
         self.settings = self.config.settings 
+        self._apply_log_settings()
         self.polling_interval = self.config.get('polling_interval', 1)
+        timings.enabled = self.config.get('diagnostics_enabled', False)
         
-        self.hardware_monitor = HardwareMonitor()
+        self.hardware_monitor = HardwareMonitor('none' if replay else self.config.get('gpu_backend', 'auto'))
         self.ollama_manager = OllamaManager()
         
-        self.http_client: Optional[httpx.Client] = None
-        self._init_http_client()
+        # Single poller for GPU / Ollama / external processes; readers use its snapshot
+        if replay:
+            self.logger.info(f"Replaying telemetry from {replay} at {replay_speed}x")
+            self.sampler = ReplaySampler(self.config, self.hardware_monitor, ReplaySource(replay, replay_speed))
+        else:
+            self.sampler = StatusSampler(self.config, self.hardware_monitor)
+        if record:
+            self.sampler.recorder = TelemetryRecorder(record)
+
+        self.metrics_server: Optional[MetricsServer] = None
+        self._start_metrics_server()
+
+        self.usage_store: Optional[UsageStore] = None
+        self.proxy: Optional[MeteringProxy] = None
+        self._start_proxy()
 
         # Initialize the GUI (Main Window)
         # We pass 'self' so the GUI can access logic
@@ -79,6 +113,10 @@ class LMMApp:
         self.main_window.withdraw() # Start hidden
 
         self.tray_icon = TrayIcon(self) 
+
+        self.alerts: Optional[AlertEngine] = None
+        self.alert_webhook: Optional[WebhookSink] = None
+        self._start_alerts()
         
         self.overall_status = "Initializing..."
         self.current_ollama_model = "Waiting..."
@@ -88,128 +126,141 @@ class LMMApp:
         self.should_run = True
         self.update_status_immediately = False 
 
+        # Hot-reload settings.json edits (e.g. pushed by config management)
+        self.config.subscribe(self._on_settings_changed)
+        self.config.start_watching()
+
+    def _apply_log_settings(self):
+        file_handler = self.log_listener.handlers[0]
+        if self.config.get('log_json', False):
+            file_handler.setFormatter(JsonLinesFormatter())
+        else:
+            file_handler.setFormatter(logging.Formatter(TEXT_LOG_FORMAT))
+        self.log_listener.suppressor.window = float(self.config.get('log_repeat_window_s', 60))
+
+    def _start_metrics_server(self):
+        if self.metrics_server:
+            self.metrics_server.stop()
+            self.metrics_server = None
+        if self.config.get('metrics_enabled', False):
+            self.metrics_server = MetricsServer(
+                lambda: self.sampler.snapshot,
+                host=self.config.get('metrics_host', '127.0.0.1'),
+                port=int(self.config.get('metrics_port', 9877))
+            )
+            self.metrics_server.start()
+
+    def _start_proxy(self):
+        self._stop_proxy()
+        if self.config.get('proxy_enabled', False):
+            data_dir = os.path.dirname(self.config.settings_file)
+            if self.usage_store is None:
+                self.usage_store = UsageStore(os.path.join(data_dir, 'proxy_usage.db'))
+            cache = None
+            if self.config.get('proxy_cache_enabled', False):
+                cache = ResponseCache(
+                    lambda: self.config.get('api_url'),
+                    os.path.join(data_dir, 'response_cache'),
+                    memory_bytes=int(self.config.get('proxy_cache_memory_mb', 64)) * 1024 * 1024,
+                    disk_bytes=int(self.config.get('proxy_cache_disk_mb', 1024)) * 1024 * 1024
+                )
+            scheduler = None
+            if self.config.get('scheduler_enabled', False):
+                scheduler = ModelScheduler(
+                    max_models=int(self.config.get('scheduler_max_models', 1)),
+                    concurrency=int(self.config.get('scheduler_concurrency', 4)),
+                    model_limits=self.config.get('scheduler_model_limits', {}),
+                    aging=float(self.config.get('scheduler_aging_s', 2.0))
+                )
+            batcher = None
+            if self.config.get('proxy_embed_batching', False):
+                batcher = EmbeddingBatcher(
+                    lambda: self.config.get('api_url'),
+                    max_batch=int(self.config.get('proxy_embed_max_batch', 32)),
+                    max_wait=float(self.config.get('proxy_embed_max_wait_ms', 5)) / 1000,
+                    scheduler=scheduler
+                )
+            self.proxy = MeteringProxy(
+                lambda: self.config.get('api_url'),
+                self.usage_store,
+                host=self.config.get('proxy_host', '127.0.0.1'),
+                port=int(self.config.get('proxy_port', 11435)),
+                cache=cache,
+                batcher=batcher,
+                scheduler=scheduler
+            )
+            self.proxy.start()
+
+    def _stop_proxy(self):
+        if self.proxy:
+            self.proxy.stop()
+            if self.proxy.cache:
+                self.proxy.cache.persist()
+            if self.proxy.batcher:
+                self.proxy.batcher.close()
+            self.proxy = None
+
+    def _start_alerts(self):
+        if self.alert_webhook:
+            self.alert_webhook.close()
+            self.alert_webhook = None
+        sinks = [self._notify_tray]
+        webhook_url = self.config.get('alert_webhook_url', '')
+        if webhook_url:
+            self.alert_webhook = WebhookSink(webhook_url)
+            sinks.append(self.alert_webhook)
+        self.alerts = AlertEngine(
+            merge_rules(self.config.get('alert_rules', [])),
+            sinks,
+            max_per_minute=int(self.config.get('alert_max_per_minute', 6))
+        )
+
+    def _notify_tray(self, event: dict):
+        if self.tray_icon.icon:
+            self.tray_icon.icon.notify(event['message'], "LMM")
+
+    def _on_settings_changed(self, changed: set):
+        """Applies saved or hot-reloaded settings. Runs on the writer / watcher thread."""
+        if 'polling_interval' in changed:
+            self.polling_interval = self.config.get('polling_interval', 1)
+        if 'diagnostics_enabled' in changed:
+            timings.enabled = self.config.get('diagnostics_enabled', False)
+        if changed & {'log_json', 'log_repeat_window_s'}:
+            self._apply_log_settings()
+        if changed & {'metrics_enabled', 'metrics_host', 'metrics_port'}:
+            self._start_metrics_server()
+        if changed & {'proxy_enabled', 'proxy_host', 'proxy_port',
+                      'proxy_cache_enabled', 'proxy_cache_memory_mb', 'proxy_cache_disk_mb',
+                      'proxy_embed_batching', 'proxy_embed_max_batch', 'proxy_embed_max_wait_ms',
+                      'scheduler_enabled', 'scheduler_max_models', 'scheduler_concurrency',
+                      'scheduler_model_limits', 'scheduler_aging_s'}:
+            self._start_proxy()
+        if changed & {'alert_rules', 'alert_webhook_url', 'alert_max_per_minute'}:
+            self._start_alerts()
+        self.main_window.dispatcher.post_latest('settings', self.main_window.refresh_settings_views)
+
     def _init_http_client(self):
         """Initialize HTTP client for Ollama API with current settings."""
-        if self.http_client:
-            self.http_client.close() 
-        
-        try:
-            api_url = self.config.get('api_url')
-            parsed_url = urlparse(api_url)
-            
-            self.logger.info(f"Initializing HTTP client with URL: {api_url}")
-            
-            client_config = {
-                'verify': False,
-                'follow_redirects': True,
-                'timeout': 2 
-            }
-
-            if parsed_url.username and parsed_url.password:
-                auth = (parsed_url.username, parsed_url.password)
-                client_config['auth'] = auth
-                self.logger.info("Using URL authentication")
-
-            self.http_client = httpx.Client(**client_config)
-            self.logger.info("HTTP client initialized successfully")
-            
-        except Exception as e:
-            self.logger.error(f"Error initializing HTTP client: {str(e)}")
-            self.http_client = None 
+        self.sampler.init_http_client()
 
     def get_ollama_model_status(self) -> str:
-        if not self.http_client:
-            return "Ollama API Error"
-
-        try:
-            response = self.http_client.get(
-                f'{self.config.get("api_url")}/api/ps'
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                running_models = data.get('models', [])
-                
-                if running_models:
-                    model = running_models[0]
-                    model_info = (
-                        f"{model['name']} "
-                        f"({model['details']['parameter_size']})"
-                    )
-                    return model_info
-                else:
-                    return "No Ollama Model Running"
-            else:
-                self.logger.warning(f"Ollama API returned status code: {response.status_code}")
-                return "Ollama Not Running"
-            
-        except httpx.TimeoutException:
-            self.logger.error("Ollama API request timed out.")
-            return "Ollama Not Running"
-            
-        except httpx.ConnectError as e:
-            self.logger.error(f"Connection error to Ollama API: {str(e)}")
-            return "Ollama Not Running"
-            
-        except Exception as e:
-            self.logger.error(f"Unexpected error in get_ollama_model_status: {str(e)}")
-            return "Ollama API Error"
+        status, _, _ = self.sampler.poll_ollama()
+        return status
 
     def get_external_model_status(self) -> List[str]:
-        running_external_models = []
-        external_models_config = self.settings.get('external_models', [])
-        
-        try:
-            running_process_names = {p.info['name'].lower() for p in psutil.process_iter(['name'])}
-        except Exception:
-            running_process_names = set()
-
-        for ext_model in external_models_config:
-            proc_name = ext_model.get('process', '').lower()
-            model_name = ext_model.get('name', 'Unknown')
-            
-            if proc_name in running_process_names:
-                running_external_models.append(model_name)
-                
-        return running_external_models
+        return [ext['name'] for ext in self.sampler.poll_external() if ext['running']]
 
     def get_overall_status(self) -> str:
-        ollama_status = self.get_ollama_model_status()
-        self.current_ollama_model = ollama_status 
+        snapshot = self.sampler.poll()
 
-        external_status_list = self.get_external_model_status()
-        self.active_external_models = external_status_list
-        
-        gpu_info = self.hardware_monitor.get_gpu_info()
-        self.gpu_info = gpu_info
-        
-        gpu_status_str = ""
-        if gpu_info["vram_used"] != "N/A":
-            gpu_status_str = f"GPU: {gpu_info['vram_used']} / {gpu_info['vram_total']}"
-            if gpu_info["gpu_utilization"] != "N/A":
-                gpu_status_str += f" ({gpu_info['gpu_utilization']})"
-        elif self.hardware_monitor.nvml_initialized:
-             gpu_status_str = "GPU: No VRAM Info"
-        else:
-            gpu_status_str = "GPU: N/A"
-
-        status_parts = []
-        if external_status_list:
-            status_parts.append(f"Ext: {', '.join(external_status_list)}")
-
-        if "Ollama API Error" in ollama_status:
-            status_parts.append("Ollama: Error")
-        elif "Ollama Not Running" in ollama_status:
-            status_parts.append("Ollama: Offline")
-        elif "No Ollama Model Running" not in ollama_status:
-            status_parts.append(f"Ollama: {ollama_status}")
-        
-        if not status_parts:
-             main_status = "Idle"
-        else:
-             main_status = " | ".join(status_parts)
+        self.current_ollama_model = snapshot['ollama_status']
+        self.active_external_models = [ext['name'] for ext in snapshot['external_models'] if ext['running']]
+        self.gpu_info = snapshot['gpus'][0]
+        self.alerts.evaluate(snapshot)
+        # Called from the tray thread: hand the snapshot to Tk rather than touching widgets here
+        self.main_window.dispatcher.post_latest('snapshot', self.main_window.on_snapshot, snapshot)
 
-        return f"{main_status} ({gpu_status_str})"
+        return format_overall_status(snapshot, self.hardware_monitor.gpu_available)
 
     def run(self):
         """Starts the main application loop."""
@@ -240,7 +291,7 @@ class LMMApp:
         # TrayIcon uses pystray, which has its own loop.
         
         # Since we moved to main_window.mainloop(), the tray thread is fine as long as it doesn't touch Tkinter widgets directly.
-        # The main_window updates ITSELF using its own .after() loop.
+        # Other threads hand updates to main_window.dispatcher, which applies them on this loop.
         
         if self.update_status_immediately:
              # We can't force the tray thread easily, but we can set flags
@@ -253,12 +304,22 @@ class LMMApp:
         """Stops the application and cleans up resources."""
         self.logger.info("Stopping Local Model Manager...")
         self.should_run = False
-        if self.http_client:
-            self.http_client.close()
-            self.logger.info("HTTP client closed.")
+        if self.metrics_server:
+            self.metrics_server.stop()
+        self._stop_proxy()
+        if self.alert_webhook:
+            self.alert_webhook.close()
+        if self.usage_store:
+            self.usage_store.close()
+        if self.sampler.recorder:
+            self.sampler.recorder.close()
+        self.sampler.close()
+        self.config.close()
+        commands.shutdown()
         self.tray_icon.stop()
         self.hardware_monitor.__del__() 
         self.logger.info("Local Model Manager stopped.")
+        self.log_listener.stop() # Writes out what is still queued
         
         # Stop GUI
         self.main_window.quit()
@@ -275,5 +336,14 @@ class LMMApp:
         self.config.save_settings()
 
 if __name__ == "__main__":
-    app = LMMApp()
+    # Blob verification uses a process pool; frozen (PyInstaller) builds need this to start workers
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(description="Local Model Manager")
+    parser.add_argument('--record', metavar='FILE', help="Record every poll to a telemetry file (.jsonl.gz)")
+    parser.add_argument('--replay', metavar='FILE',
+                        help="Show a telemetry recording instead of this machine's GPU, processes and Ollama")
+    parser.add_argument('--replay-speed', type=float, default=1.0,
+                        help="Replay speed multiplier; 0 advances one recorded tick per poll (default 1)")
+    args = parser.parse_args()
+    app = LMMApp(record=args.record, replay=args.replay, replay_speed=args.replay_speed)
     app.run()
\ No newline at end of file
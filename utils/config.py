@@ -1,18 +1,30 @@
 # utils/config.py
 import os
 import json
+import time
 import logging
+import threading
 
 logger = logging.getLogger('LMM')
 
 class ConfigManager:
     """
     Manages application settings, including loading from and saving to a JSON file.
+
+    Saves are coalesced: `save_settings()` only schedules a write, and every
+    change made within SAVE_DELAY seconds lands in a single background write.
+    Writes go to a temp file that is renamed over settings.json, so a crash
+    never leaves a truncated file. `start_watching()` polls the file's
+    mtime/size and hot-reloads external edits. Subscribers are called with
+    the set of changed keys after each save or reload.
     """
 
     DEFAULT_API_HOST = "localhost"
     DEFAULT_API_PORT = "11434"
 
+    SAVE_DELAY = 0.5 # Seconds to coalesce saves before writing
+    WATCH_INTERVAL = 2.0 # Seconds between settings.json change checks
+
     def __init__(self, app_name: str = "LMM"):
         self.app_name = app_name
         self.settings_file = os.path.join(
@@ -22,16 +34,43 @@ class ConfigManager:
         )
         os.makedirs(os.path.dirname(self.settings_file), exist_ok=True)
         self.settings = {}
+
+        self._lock = threading.RLock()
+        self._save_timer = None
+        self._persisted = {} # What is on disk, for change detection
+        self._file_stat = None # (mtime_ns, size) of our last read or write
+        self._subscribers = []
+        self._watch_thread = None
+        self._stop_event = threading.Event()
+
         self.load_settings()
 
+    # --- Load ---
+
+    def _stat(self):
+        try:
+            st = os.stat(self.settings_file)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def _replace_settings(self, new_settings: dict):
+        # Update in place: LMMApp and the GUI hold references to this dict
+        self.settings.clear()
+        self.settings.update(new_settings)
+
     def load_settings(self):
         """Load application settings from JSON file."""
-        try:
-            if os.path.exists(self.settings_file):
-                with open(self.settings_file, 'r') as f:
-                    self.settings = json.load(f)
+        with self._lock:
+            try:
+                if os.path.exists(self.settings_file):
+                    self._file_stat = self._stat()
+                    with open(self.settings_file, 'r') as f:
+                        loaded = json.load(f)
+                    self._replace_settings(loaded)
+                    self._persisted = json.loads(json.dumps(loaded))
                     logger.info("Settings loaded successfully")
-                    
+
                     # Ensure default values are present for new settings
                     self._apply_defaults()
 
@@ -42,24 +81,150 @@ class ConfigManager:
                         self.settings['api_url'] = f'http://{host}:{port}'
                         self.save_settings()
                         logger.info("Converted old settings format to new URL format")
-            else:
-                # Default settings
+                else:
+                    # Default settings
+                    self._create_default_settings()
+                    # Save default settings
+                    self.flush()
+                    logger.info("Created default settings")
+            except ValueError as e:
+                # Keep the unreadable file for inspection instead of silently overwriting it
+                backup = f"{self.settings_file}.corrupt-{time.strftime('%Y%m%d-%H%M%S')}"
+                try:
+                    os.replace(self.settings_file, backup)
+                    logger.error(f"Settings file is not valid JSON ({e}). Moved it to {backup} and using defaults.")
+                except OSError:
+                    logger.error(f"Settings file is not valid JSON ({e}). Using defaults.")
                 self._create_default_settings()
-                # Save default settings
-                self.save_settings()
-                logger.info("Created default settings")
-        except Exception as e:
-            logger.error(f"Error loading settings: {str(e)}")
-            self._create_default_settings() # Fallback to defaults on error
+            except Exception as e:
+                logger.error(f"Error loading settings: {str(e)}")
+                self._create_default_settings() # Fallback to defaults on error
+
+    # --- Save ---
 
     def save_settings(self):
-        """Save application settings to JSON file."""
-        try:
-            with open(self.settings_file, 'w') as f:
-                json.dump(self.settings, f, indent=4)
-            logger.info("Settings saved successfully")
-        except Exception as e:
-            logger.error(f"Error saving settings: {str(e)}")
+        """Schedule a coalesced background write of the current settings."""
+        with self._lock:
+            if self._save_timer is None:
+                self._save_timer = threading.Timer(self.SAVE_DELAY, self._scheduled_write)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+
+    def flush(self):
+        """Write any pending changes now, on the calling thread."""
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+        self._write()
+
+    def _scheduled_write(self):
+        with self._lock:
+            self._save_timer = None
+        self._write()
+
+    def _write(self):
+        with self._lock:
+            try:
+                data = json.dumps(self.settings, indent=4)
+            except RuntimeError:
+                # Another thread changed the dict mid-serialization; try again shortly
+                self.save_settings()
+                return
+
+            tmp_file = f"{self.settings_file}.tmp"
+            try:
+                with open(tmp_file, 'w') as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_file, self.settings_file)
+            except Exception as e:
+                logger.error(f"Error saving settings: {str(e)}")
+                return
+
+            self._file_stat = self._stat()
+            new_persisted = json.loads(data)
+            changed = self._changed_keys(self._persisted, new_persisted)
+            self._persisted = new_persisted
+        logger.info("Settings saved successfully")
+        self._notify(changed)
+
+    # --- Hot Reload ---
+
+    def start_watching(self, interval: float = None):
+        """Start the background thread that hot-reloads external edits to settings.json."""
+        if self._watch_thread:
+            return
+        interval = interval or self.WATCH_INTERVAL
+        self._stop_event.clear()
+        self._watch_thread = threading.Thread(target=self._watch_loop, args=(interval,), daemon=True)
+        self._watch_thread.start()
+
+    def _watch_loop(self, interval: float):
+        while not self._stop_event.wait(interval):
+            try:
+                self.check_for_changes()
+            except Exception as e:
+                logger.error(f"Error watching settings file: {e}")
+
+    def check_for_changes(self) -> bool:
+        """Reload settings.json if it changed on disk since our last read/write."""
+        with self._lock:
+            stat = self._stat()
+            if stat is None or stat == self._file_stat:
+                return False
+            self._file_stat = stat
+            try:
+                with open(self.settings_file, 'r') as f:
+                    loaded = json.load(f)
+            except (OSError, ValueError) as e:
+                # Possibly caught mid-write by an external tool; the next change will retry
+                logger.warning(f"Ignoring unreadable settings.json change: {e}")
+                return False
+
+            if self._save_timer is not None:
+                logger.warning("settings.json changed externally; discarding unsaved local changes.")
+                self._save_timer.cancel()
+                self._save_timer = None
+
+            changed = self._changed_keys(self._persisted, loaded)
+            self._replace_settings(loaded)
+            self._persisted = json.loads(json.dumps(loaded))
+            self._apply_defaults()
+        logger.info(f"Settings reloaded from disk. Changed: {', '.join(sorted(changed)) or 'nothing'}")
+        self._notify(changed)
+        return True
+
+    def close(self):
+        """Stop watching and write any pending changes."""
+        self._stop_event.set()
+        if self._watch_thread:
+            self._watch_thread.join(timeout=2)
+            self._watch_thread = None
+        with self._lock:
+            pending = self._save_timer is not None
+        if pending:
+            self.flush()
+
+    # --- Subscribers ---
+
+    def subscribe(self, callback):
+        """Register callback(changed_keys: set) for saves and reloads. May run on any thread."""
+        self._subscribers.append(callback)
+
+    def _notify(self, changed: set):
+        if not changed:
+            return
+        for callback in list(self._subscribers):
+            try:
+                callback(changed)
+            except Exception as e:
+                logger.error(f"Error in settings subscriber: {e}")
+
+    @staticmethod
+    def _changed_keys(old: dict, new: dict) -> set:
+        return {k for k in set(old) | set(new) if old.get(k) != new.get(k)}
 
     def get(self, key: str, default=None):
         """Get a setting value, with an optional default."""
@@ -76,6 +241,33 @@ class ConfigManager:
             'startup': False,
             'api_url': f'http://{self.DEFAULT_API_HOST}:{self.DEFAULT_API_PORT}',
             'polling_interval': 1, # Default polling interval in seconds
+            'gpu_backend': 'auto', # 'auto', 'nvml' (NVIDIA), 'sysfs' (AMD/Intel on Linux) or 'none'
+            'metrics_enabled': False, # Serve Prometheus /metrics locally
+            'metrics_host': '127.0.0.1',
+            'metrics_port': 9877,
+            'diagnostics_enabled': False, # Per-stage timing instrumentation
+            'log_json': False, # Write the log file as JSON lines instead of text
+            'log_repeat_window_s': 60, # Identical log lines within this window are collapsed into a count
+            'proxy_enabled': False, # Metering reverse proxy in front of api_url
+            'proxy_host': '127.0.0.1',
+            'proxy_port': 11435, # Point clients here instead of Ollama's 11434 to meter them
+            'proxy_cache_enabled': False, # Serve repeated deterministic requests from a response cache
+            'proxy_cache_memory_mb': 64,
+            'proxy_cache_disk_mb': 1024,
+            'proxy_embed_batching': False, # Coalesce concurrent /api/embed calls into batched requests
+            'proxy_embed_max_batch': 32, # Inputs per batched request
+            'proxy_embed_max_wait_ms': 5, # How long the first request of a batch waits for others
+            'scheduler_enabled': False, # Queue proxied requests per model to avoid swap thrashing
+            'scheduler_max_models': 1, # Models that fit in VRAM together
+            'scheduler_concurrency': 4, # Requests in flight per model (match OLLAMA_NUM_PARALLEL)
+            'scheduler_model_limits': {}, # Per-model overrides of scheduler_concurrency
+            'scheduler_aging_s': 2.0, # Waiting this long raises a request one priority class
+            'alert_rules': [], # Changes to the built-in alert rules (matched by name) and extra rules
+            'alert_webhook_url': '', # Optional local endpoint that receives alerts as JSON
+            'alert_max_per_minute': 6, # Notifications beyond this are only logged
+            'ollama_models_dir': '', # Local model store; '' uses $OLLAMA_MODELS or ~/.ollama/models
+            'benchmark_prompts': [], # Prompts for the inference benchmark; empty uses the built-in set
+            'benchmark_num_predict': 128, # Tokens generated per benchmark prompt
             'external_models': [ # List of external models to monitor
                 {"name": "Handy AI", "process": "handy.exe", "type": "local_gpu"},
                 {"name": "Python Script", "process": "python.exe", "type": "local_cpu"}
@@ -88,6 +280,33 @@ class ConfigManager:
             'startup': False,
             'api_url': f'http://{self.DEFAULT_API_HOST}:{self.DEFAULT_API_PORT}',
             'polling_interval': 1,
+            'gpu_backend': 'auto',
+            'metrics_enabled': False,
+            'metrics_host': '127.0.0.1',
+            'metrics_port': 9877,
+            'diagnostics_enabled': False,
+            'log_json': False,
+            'log_repeat_window_s': 60,
+            'proxy_enabled': False,
+            'proxy_host': '127.0.0.1',
+            'proxy_port': 11435,
+            'proxy_cache_enabled': False,
+            'proxy_cache_memory_mb': 64,
+            'proxy_cache_disk_mb': 1024,
+            'proxy_embed_batching': False,
+            'proxy_embed_max_batch': 32,
+            'proxy_embed_max_wait_ms': 5,
+            'scheduler_enabled': False,
+            'scheduler_max_models': 1,
+            'scheduler_concurrency': 4,
+            'scheduler_model_limits': {},
+            'scheduler_aging_s': 2.0,
+            'alert_rules': [],
+            'alert_webhook_url': '',
+            'alert_max_per_minute': 6,
+            'ollama_models_dir': '',
+            'benchmark_prompts': [],
+            'benchmark_num_predict': 128,
             'external_models': [
                 {"name": "Handy AI", "process": "handy.exe", "type": "local_gpu"},
                 {"name": "Python Script", "process": "python.exe", "type": "local_cpu"}
@@ -113,6 +332,7 @@ if __name__ == "__main__":
     
     # Test setting a value
     config.set('startup', True)
+    config.flush() # Writes are coalesced; force it before re-reading
     print(f"Settings after change: {config.settings}")
     
     # Re-load to ensure persistence
@@ -124,8 +344,17 @@ if __name__ == "__main__":
     api_url = new_config.get('api_url')
     print(f"API URL: {api_url}")
     new_config.set('api_url', 'http://192.168.1.1:8080')
+    new_config.flush()
     print(f"Settings after API URL change: {new_config.settings}")
 
+    # Test hot reload of an external edit
+    changes = []
+    config.subscribe(changes.append)
+    time.sleep(0.01) # Ensure a distinct mtime
+    config.check_for_changes()
+    print(f"Hot-reloaded changes: {changes}")
+    assert config.get('api_url') == 'http://192.168.1.1:8080'
+
     # Clean up test file (optional)
     # os.remove(new_config.settings_file)
     # print(f"Cleaned up {new_config.settings_file}")
\ No newline at end of file
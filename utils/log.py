@@ -0,0 +1,142 @@
+# utils/log.py
+import json
+import time
+import queue
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, Optional
+from logging.handlers import QueueHandler, QueueListener
+
+FLUSH_INTERVAL = 1.0 # Seconds between checks for repeat summaries that are due
+MAX_TRACKED = 1000 # Distinct messages tracked per window; beyond that new ones pass unsuppressed
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, thread, message (and exception text, if any)."""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created).astimezone().isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        if getattr(record, 'repeated', None):
+            entry['repeated'] = record.repeated
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+class RepeatSuppressor(logging.Filter):
+    """
+    Drops a record identical (logger, level, message) to one passed within the
+    last `window` seconds and counts it instead. Once the window is over, the
+    suppressed count becomes one "repeated N times" record - handed to `emit`
+    as soon as the next occurrence arrives, or returned by `due_summaries()`
+    if none does - and the next occurrence is logged normally again. So an
+    error raised every poll while Ollama is down costs two lines per window,
+    not one per second.
+    """
+    SUMMARY_FIELDS = ('name', 'levelno', 'levelname', 'pathname', 'filename', 'module', 'lineno', 'funcName',
+                      'threadName')
+
+    def __init__(self, window: float = 60, emit: Optional[Callable[[logging.LogRecord], None]] = None):
+        super().__init__()
+        self.window = window
+        self.emit = emit
+        self._lock = threading.Lock()
+        self._seen = {} # (logger, level, message) -> [first logged at, suppressed count, record fields]
+        self._ready = [] # Summaries of ended windows not yet emitted (when there is no `emit`)
+
+    def _summary(self, key, first: float, count: int, fields: dict, now: float) -> logging.LogRecord:
+        return logging.makeLogRecord(dict(
+            fields, msg=f"{key[2]} (repeated {count} more times in {now - first:.0f} s)", repeated=count
+        ))
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.window <= 0:
+            return True
+        key = (record.name, record.levelno, record.getMessage())
+        now = time.monotonic()
+        summary = None
+        with self._lock:
+            seen = self._seen.get(key)
+            if seen is not None and now - seen[0] < self.window:
+                seen[1] += 1
+                return False
+            if seen is not None and seen[1]:
+                # Window over: report it before this occurrence resets the count
+                summary = self._summary(key, *seen, now)
+                if self.emit is None:
+                    self._ready.append(summary)
+                    summary = None
+            if seen is None and len(self._seen) >= MAX_TRACKED:
+                return True
+            # Keep only what the summary needs, not the args or a traceback holding frames alive
+            self._seen[key] = [now, 0, {k: getattr(record, k) for k in self.SUMMARY_FIELDS}]
+        if summary is not None:
+            self.emit(summary)
+        return True
+
+    def due_summaries(self, force: bool = False) -> list[logging.LogRecord]:
+        """Summary records for windows that have ended (all pending ones with `force`); forgets them."""
+        now = time.monotonic()
+        with self._lock:
+            summaries, self._ready = self._ready, []
+            for key, (first, count, fields) in list(self._seen.items()):
+                if not force and now - first < self.window:
+                    continue
+                del self._seen[key]
+                if count:
+                    summaries.append(self._summary(key, first, count, fields, now))
+        return summaries
+
+class SuppressingQueueListener(QueueListener):
+    """
+    A QueueListener that also writes the RepeatSuppressor's summaries as they
+    come due. A timer thread queues them every FLUSH_INTERVAL, so they are not
+    held back by steady log traffic.
+    """
+    def __init__(self, log_queue: queue.Queue, *handlers, suppressor: RepeatSuppressor):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.suppressor = suppressor
+        self._stop_flush = threading.Event()
+        self._flush_thread = None
+
+    def _flush_loop(self):
+        while not self._stop_flush.wait(FLUSH_INTERVAL):
+            for summary in self.suppressor.due_summaries():
+                self.queue.put_nowait(summary)
+
+    def start(self):
+        super().start()
+        self._stop_flush.clear()
+        self._flush_thread = threading.Thread(target=self._flush_loop, name="LogSummaryFlush", daemon=True)
+        self._flush_thread.start()
+
+    def stop(self):
+        self._stop_flush.set()
+        if self._flush_thread:
+            self._flush_thread.join()
+            self._flush_thread = None
+        # Queued ahead of the sentinel, so the listener writes them before it exits
+        for summary in self.suppressor.due_summaries(force=True):
+            self.queue.put_nowait(summary)
+        super().stop()
+
+def start_queue_logging(logger: logging.Logger, handlers: list[logging.Handler],
+                        repeat_window: float = 60) -> SuppressingQueueListener:
+    """
+    Routes `logger` through a queue: callers only enqueue the record, and a
+    listener thread does the formatting and file / console I/O. Repeated
+    identical records are collapsed by a RepeatSuppressor before they are
+    queued. Call stop() on the returned listener at exit to flush the queue.
+    """
+    log_queue = queue.Queue(-1)
+    suppressor = RepeatSuppressor(repeat_window, emit=log_queue.put_nowait)
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(suppressor)
+    logger.addHandler(queue_handler)
+    listener = SuppressingQueueListener(log_queue, *handlers, suppressor=suppressor)
+    listener.start()
+    return listener